@@ -67,10 +67,13 @@ _ensure_dependency_available_at_version('tensorflow_probability', '0.4.0')
 from sonnet.python import custom_getters
 # Stripped internal import.
 from sonnet.python.modules import nets
+from sonnet.python.modules.async_saver import AsyncSaver
+from sonnet.python.modules.async_saver import AsyncSaverStats
 from sonnet.python.modules.attention import AttentiveRead
 from sonnet.python.modules.base import AbstractModule
 from sonnet.python.modules.base import Module
 from sonnet.python.modules.base import observe_connections
+from sonnet.python.modules.base import track_connections
 from sonnet.python.modules.base import Transposable
 from sonnet.python.modules.base_errors import DifferentGraphError
 from sonnet.python.modules.base_errors import Error
@@ -119,6 +122,7 @@ from sonnet.python.modules.conv import SAME
 from sonnet.python.modules.conv import SeparableConv1D
 from sonnet.python.modules.conv import SeparableConv2D
 from sonnet.python.modules.conv import VALID
+from sonnet.python.modules.embed import CachedEmbed
 from sonnet.python.modules.embed import Embed
 from sonnet.python.modules.gated_rnn import BatchNormLSTM
 from sonnet.python.modules.gated_rnn import Conv1DLSTM
@@ -131,8 +135,19 @@ from sonnet.python.modules.gated_rnn import lstm_with_recurrent_dropout
 from sonnet.python.modules.gated_rnn import lstm_with_zoneout
 from sonnet.python.modules.gated_rnn import LSTMBlockCell
 from sonnet.python.modules.gated_rnn import LSTMState
+from sonnet.python.modules.hashed_embed import HashEmbed
+from sonnet.python.modules.hashed_embed import QuotientRemainderEmbed
 from sonnet.python.modules.layer_norm import LayerNorm
+from sonnet.python.modules.parallel import DataParallel
 from sonnet.python.modules.pondering_rnn import ACTCore
+from sonnet.python.modules.profiling import CostEstimate
+from sonnet.python.modules.profiling import estimate_module_costs
+from sonnet.python.modules.profiling import format_cost_estimates
+from sonnet.python.modules.profiling import format_module_profiles
+from sonnet.python.modules.profiling import module_profiles_to_json
+from sonnet.python.modules.profiling import ModuleProfile
+from sonnet.python.modules.profiling import profile_modules
+from sonnet.python.modules.profiling import profile_step_stats
 from sonnet.python.modules.relational_memory import RelationalMemory
 from sonnet.python.modules.residual import Residual
 from sonnet.python.modules.residual import ResidualCore
@@ -142,6 +157,10 @@ from sonnet.python.modules.rnn_core import RNNCore
 from sonnet.python.modules.rnn_core import trainable_initial_state
 from sonnet.python.modules.rnn_core import TrainableInitialState
 from sonnet.python.modules.rnn_core import wrap_rnn_cell_class
+from sonnet.python.modules.sampling import BeamSearch
+from sonnet.python.modules.sampling import BeamSearchOutput
+from sonnet.python.modules.sampling import Sampler
+from sonnet.python.modules.sampling import SampleOutput
 from sonnet.python.modules.scale_gradient import scale_gradient
 from sonnet.python.modules.sequential import Sequential
 from sonnet.python.modules.spatial_transformer import AffineGridWarper
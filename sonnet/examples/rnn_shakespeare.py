@@ -53,12 +53,17 @@ tf.flags.DEFINE_integer("checkpoint_interval", 500,
 
 
 def _configure_saver(checkpoint_dir, checkpoint_interval):
-  """Returns a tf.train.CheckpointSaverHook for autosaving checkpoints."""
-  saver = tf.train.Saver()
-  return tf.train.CheckpointSaverHook(
+  """Returns a tf.train.CheckpointSaverHook for autosaving checkpoints.
+
+  The checkpoints are written from a background thread by a `snt.AsyncSaver`,
+  which is also returned, and should be closed once training is done.
+  """
+  saver = snt.AsyncSaver("")
+  saver_hook = tf.train.CheckpointSaverHook(
       checkpoint_dir=checkpoint_dir,
       save_steps=checkpoint_interval,
       saver=saver)
+  return saver_hook, saver
 
 
 def build_graph(lstm_depth=3, batch_size=32, num_embedding=32, num_hidden=128,
@@ -183,8 +188,8 @@ def train(num_training_iterations, report_interval,
       optimizer_epsilon=FLAGS.optimizer_epsilon)
 
   # Configure a checkpoint saver.
-  saver_hook = _configure_saver(FLAGS.checkpoint_dir,
-                                FLAGS.checkpoint_interval)
+  saver_hook, saver = _configure_saver(FLAGS.checkpoint_dir,
+                                       FLAGS.checkpoint_interval)
 
   # Train the network.
   with tf.train.SingularMonitoredSession(
@@ -222,6 +227,12 @@ def train(num_training_iterations, report_interval,
     test_loss = sess.run(graph_tensors["test_loss"])
     tf.logging.info("Test loss %f", test_loss)
 
+  # Wait for the last checkpoint to be written.
+  saver.close()
+  tf.logging.info("Checkpoint stall time %fs, write throughput %f MB/s.",
+                  saver.stats.stall_time_secs,
+                  saver.stats.write_bytes_per_sec / 1e6)
+
 
 class TextModel(snt.AbstractModule):
   """A deep LSTM model, for use on the Tiny Shakespeare dataset."""
@@ -300,19 +311,9 @@ class TextModel(snt.AbstractModule):
 
     initial_state = self._core.initial_state(batch_size)
 
-    if self._use_dynamic_rnn:
-      output_sequence, final_state = tf.nn.dynamic_rnn(
-          cell=self._core,
-          inputs=input_sequence,
-          time_major=True,
-          initial_state=initial_state)
-    else:
-      rnn_input_sequence = tf.unstack(input_sequence)
-      output, final_state = tf.contrib.rnn.static_rnn(
-          cell=self._core,
-          inputs=rnn_input_sequence,
-          initial_state=initial_state)
-      output_sequence = tf.stack(output)
+    output_sequence, final_state = self._core.unroll(
+        input_sequence, initial_state,
+        mode="dynamic" if self._use_dynamic_rnn else "static")
 
     batch_output_module = snt.BatchApply(self._output_module)
     output_sequence_logits = batch_output_module(output_sequence)
@@ -333,23 +334,14 @@ class TextModel(snt.AbstractModule):
       output_size]`.
     """
 
-    current_logits = initial_logits
-    current_state = initial_state
-
-    generated_letters = []
-    for _ in range(sequence_length):
-      # Sample a character index from distribution.
-      char_index = tf.squeeze(tf.multinomial(current_logits, 1))
+    def embed(char_index):
       char_one_hot = tf.one_hot(char_index, self._output_size, 1.0, 0.0)
-      generated_letters.append(char_one_hot)
-
-      # Feed character back into the deep_lstm.
-      gen_out_seq, current_state = self._core(
-          tf.nn.relu(self._embed_module(char_one_hot)),
-          current_state)
-      current_logits = self._output_module(gen_out_seq)
+      return tf.nn.relu(self._embed_module(char_one_hot))
 
-    generated_string = tf.stack(generated_letters)
+    # Sample characters and feed them back into the deep_lstm in a while loop.
+    sampler = snt.Sampler(self._core, embed, self._output_module)
+    samples = sampler(initial_logits, initial_state, sequence_length)
+    generated_string = tf.one_hot(samples.tokens, self._output_size, 1.0, 0.0)
 
     return generated_string
 
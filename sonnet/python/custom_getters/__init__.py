@@ -23,5 +23,7 @@ from sonnet.python.custom_getters.context import Context
 from sonnet.python.custom_getters.non_trainable import non_trainable
 from sonnet.python.custom_getters.override_args import override_args
 from sonnet.python.custom_getters.override_args import override_default_args
+from sonnet.python.custom_getters.restore_initializer import bulk_restore_initializer
+from sonnet.python.custom_getters.restore_initializer import BulkRestore
 from sonnet.python.custom_getters.restore_initializer import restore_initializer
 from sonnet.python.custom_getters.stop_gradient import stop_gradient
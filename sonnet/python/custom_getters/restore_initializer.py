@@ -12,16 +12,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ============================================================================
-"""Custom getter which uses snt.restore_initializer to restore all variables.
+"""Custom getters which restore all variables from a checkpoint.
 """
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections as collections_lib
+
 import sonnet as snt
 import tensorflow as tf
 
+from tensorflow.python.ops import io_ops
+from tensorflow.python.ops import variables
+
+
+def _should_restore(collection, kwargs):
+  """Returns whether the variable requested with `kwargs` is in `collection`."""
+  if collection is None:
+    return True
+
+  # Work out what collections this variable will go in.
+  collections = kwargs["collections"]
+  if collections is None:
+    collections = [tf.GraphKeys.GLOBAL_VARIABLES]
+
+  if (kwargs["trainable"]
+      and tf.GraphKeys.TRAINABLE_VARIABLES not in collections):
+    collections += [tf.GraphKeys.TRAINABLE_VARIABLES]
+
+  return collection in collections
+
 
 def restore_initializer(filename, name_fn=None,
                         collection=tf.GraphKeys.GLOBAL_VARIABLES):
@@ -44,16 +66,7 @@ def restore_initializer(filename, name_fn=None,
   def _restore_initializer(getter, name, *args, **kwargs):
     """Gets variable with restore initializer."""
 
-    # Work out what collections this variable will go in.
-    collections = kwargs["collections"]
-    if collections is None:
-      collections = [tf.GraphKeys.GLOBAL_VARIABLES]
-
-    if (kwargs["trainable"]
-        and tf.GraphKeys.TRAINABLE_VARIABLES not in collections):
-      collections += [tf.GraphKeys.TRAINABLE_VARIABLES]
-
-    if collection is None or collection in collections:
+    if _should_restore(collection, kwargs):
       # We don't make use of the 'scope' argument for restore_initializer as we
       # might want to change the name in more complex ways, such as removing the
       # scope prefix as well.
@@ -73,3 +86,138 @@ def restore_initializer(filename, name_fn=None,
     return getter(name, *args, **kwargs)
 
   return _restore_initializer
+
+
+class BulkRestore(object):
+  """Custom getter restoring all variables with a few `RestoreV2` ops.
+
+  Unlike `restore_initializer`, which creates a `RestoreV2` op reading the
+  checkpoint for every variable (and every partition), this custom getter only
+  records the checkpoint tensor names and slices of the variables it gets. The
+  `initializer` op then restores all of them with a single `RestoreV2` op, or
+  one per `max_tensors_per_op` variables:
+
+  ```python
+  restore = snt.custom_getters.bulk_restore_initializer(checkpoint_path)
+  with tf.variable_scope("", custom_getter=restore):
+    outputs = model(inputs)
+  ...
+  sess.run(tf.global_variables_initializer())
+  sess.run(restore.initializer)
+  ```
+
+  The variables keep their own initializers, so `restore.initializer` must be
+  run after them.
+  """
+
+  def __init__(self, filename, name_fn=None,
+               collection=tf.GraphKeys.GLOBAL_VARIABLES,
+               max_tensors_per_op=None):
+    """Constructs a BulkRestore custom getter.
+
+    Args:
+      filename: The filename of the checkpoint.
+      name_fn: A function which can map the name of the variable requested.
+        This allows restoring variables with values having different names in
+        the checkpoint.
+      collection: Only restore variables in this collection. If `None`, it will
+        attempt to restore all variables. By default
+        `tf.GraphKeys.GLOBAL_VARIABLES`.
+      max_tensors_per_op: Optional maximum number of tensors read by each
+        `RestoreV2` op. By default a single op reads all the tensors.
+
+    Raises:
+      ValueError: If `max_tensors_per_op` is not positive.
+    """
+    if max_tensors_per_op is not None and max_tensors_per_op < 1:
+      raise ValueError("max_tensors_per_op must be positive, got {}.".format(
+          max_tensors_per_op))
+    self._filename = filename
+    self._name_fn = name_fn
+    self._collection = collection
+    self._max_tensors_per_op = max_tensors_per_op
+    # Maps variable names to their name in the checkpoint and their variable.
+    self._requests = collections_lib.OrderedDict()
+    self._initializer = None
+
+  def __call__(self, getter, name, *args, **kwargs):
+    variable = getter(name, *args, **kwargs)
+    if name not in self._requests and _should_restore(self._collection,
+                                                      kwargs):
+      if self._name_fn is not None:
+        var_name_in_checkpoint = self._name_fn(name)
+      else:
+        var_name_in_checkpoint = name
+      tf.logging.info("Restoring '%s' from '%s' into variable '%s'",
+                      var_name_in_checkpoint, self._filename, name)
+      self._requests[name] = (var_name_in_checkpoint, variable)
+      self._initializer = None
+    return variable
+
+  def _tensors_to_restore(self):
+    """Returns a list of (tensor name, slice spec, variable) triples."""
+    tensors = []
+    for var_name_in_checkpoint, variable in self._requests.values():
+      if isinstance(variable, variables.PartitionedVariable):
+        for partition in variable:
+          slice_spec = partition._get_save_slice_info().spec  # pylint: disable=protected-access
+          tensors.append((var_name_in_checkpoint, slice_spec, partition))
+      else:
+        tensors.append((var_name_in_checkpoint, "", variable))
+    return tensors
+
+  @property
+  def initializer(self):
+    """Op restoring all the variables requested so far."""
+    if self._initializer is None:
+      tensors = self._tensors_to_restore()
+      chunk_size = self._max_tensors_per_op or max(len(tensors), 1)
+      assign_ops = []
+      with tf.name_scope("bulk_restore"):
+        for start in range(0, len(tensors), chunk_size):
+          chunk = tensors[start:start + chunk_size]
+          restored = io_ops.restore_v2(
+              self._filename,
+              [tensor_name for tensor_name, _, _ in chunk],
+              [slice_spec for _, slice_spec, _ in chunk],
+              [variable.dtype.base_dtype for _, _, variable in chunk])
+          for value, (_, _, variable) in zip(restored, chunk):
+            value.set_shape(variable.get_shape())
+            assign_ops.append(variable.assign(value).op)
+        self._initializer = tf.group(*assign_ops, name="initializer")
+    return self._initializer
+
+  @property
+  def num_restore_ops(self):
+    """Number of `RestoreV2` ops of `initializer`."""
+    num_tensors = len(self._tensors_to_restore())
+    if not num_tensors:
+      return 0
+    chunk_size = self._max_tensors_per_op or num_tensors
+    return -(-num_tensors // chunk_size)
+
+
+def bulk_restore_initializer(filename, name_fn=None,
+                             collection=tf.GraphKeys.GLOBAL_VARIABLES,
+                             max_tensors_per_op=None):
+  """Custom getter to restore all variables with a few `RestoreV2` ops.
+
+  See `BulkRestore`.
+
+  Args:
+    filename: The filename of the checkpoint.
+    name_fn: A function which can map the name of the variable requested. This
+      allows restoring variables with values having different names in the
+      checkpoint.
+    collection: Only restore variables in this collection. If `None`, it will
+      attempt to restore all variables. By default
+      `tf.GraphKeys.GLOBAL_VARIABLES`.
+    max_tensors_per_op: Optional maximum number of tensors read by each
+      `RestoreV2` op. By default a single op reads all the tensors.
+
+  Returns:
+    A `BulkRestore` custom getter, whose `initializer` op restores the
+    variables it got.
+  """
+  return BulkRestore(filename, name_fn=name_fn, collection=collection,
+                     max_tensors_per_op=max_tensors_per_op)
@@ -0,0 +1,97 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for restoring the variables of a model from a checkpoint.
+
+Run with:
+
+  python restore_initializer_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+NUM_LAYERS = 2000
+LAYER_SIZE = 8
+
+
+def _build_model(custom_getter=None):
+  with tf.variable_scope("", custom_getter=custom_getter):
+    net = tf.zeros([1, LAYER_SIZE])
+    for i in range(NUM_LAYERS):
+      net = snt.Linear(LAYER_SIZE, name="linear_{}".format(i))(net)
+  return net
+
+
+class RestoreInitializerBenchmark(tf.test.Benchmark):
+  """Compares per-variable and bulk restoring of several thousand variables."""
+
+  def _save_checkpoint(self):
+    checkpoint_path = os.path.join(tf.test.get_temp_dir(), "model")
+    with tf.Graph().as_default():
+      _build_model()
+      saver = tf.train.Saver()
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        return saver.save(sess, checkpoint_path)
+
+  def _benchmark_restore(self, name, checkpoint_path, bulk,
+                         max_tensors_per_op=None):
+    with tf.Graph().as_default() as graph:
+      if bulk:
+        custom_getter = snt.custom_getters.bulk_restore_initializer(
+            checkpoint_path, max_tensors_per_op=max_tensors_per_op)
+      else:
+        custom_getter = snt.custom_getters.restore_initializer(
+            checkpoint_path)
+      start_time = time.time()
+      _build_model(custom_getter)
+      init_ops = [tf.global_variables_initializer()]
+      if bulk:
+        init_ops.append(custom_getter.initializer)
+      build_time = time.time() - start_time
+      num_restore_ops = sum(op.type == "RestoreV2"
+                            for op in graph.get_operations())
+
+      with tf.Session() as sess:
+        start_time = time.time()
+        for init_op in init_ops:
+          sess.run(init_op)
+        init_time = time.time() - start_time
+
+    self.report_benchmark(
+        name=name,
+        wall_time=init_time,
+        extras={"build_time": build_time,
+                "num_restore_ops": num_restore_ops})
+
+  def benchmarkRestore(self):
+    checkpoint_path = self._save_checkpoint()
+    self._benchmark_restore("per_variable", checkpoint_path, bulk=False)
+    self._benchmark_restore("bulk", checkpoint_path, bulk=True)
+    self._benchmark_restore("bulk_sharded", checkpoint_path, bulk=True,
+                            max_tensors_per_op=500)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -26,7 +26,7 @@ import sonnet as snt
 import tensorflow as tf
 
 
-class RestoreInitializerTest(tf.test.TestCase):
+class CheckpointTestCase(tf.test.TestCase):
 
   def _save_test_checkpoint(self):
 
@@ -51,6 +51,9 @@ class RestoreInitializerTest(tf.test.TestCase):
 
     return checkpoint_dir, expected_values
 
+
+class RestoreInitializerTest(CheckpointTestCase):
+
   def testSimpleUsage(self):
     checkpoint_path, expected_values = self._save_test_checkpoint()
     checkpoint_path = tf.train.latest_checkpoint(checkpoint_path)
@@ -128,5 +131,71 @@ class RestoreInitializerTest(tf.test.TestCase):
     # b is initialized to zero always.
 
 
+class BulkRestoreInitializerTest(CheckpointTestCase):
+
+  def _restore_linear(self, name, partitioned=False, **kwargs):
+    checkpoint_path, expected_values = self._save_test_checkpoint()
+    checkpoint_path = tf.train.latest_checkpoint(checkpoint_path)
+
+    g = tf.Graph()
+    with g.as_default():
+      custom_getter = snt.custom_getters.bulk_restore_initializer(
+          filename=checkpoint_path, **kwargs)
+
+      partitioners = None
+      if partitioned:
+        partitioners = {"w": tf.fixed_size_partitioner(num_shards=2)}
+      with tf.variable_scope("", custom_getter=custom_getter):
+        inputs = tf.placeholder(tf.float32, [10, 10])
+        lin1 = snt.Linear(10, partitioners=partitioners, name=name)
+        lin1(inputs)
+
+      init = tf.global_variables_initializer()
+      restore_ops = [op for op in g.get_operations()
+                     if op.type == "RestoreV2"]
+      self.assertEmpty(restore_ops)
+      restore = custom_getter.initializer
+      restore_ops = [op for op in g.get_operations()
+                     if op.type == "RestoreV2"]
+
+    with self.test_session(graph=g) as sess:
+      sess.run(init)
+      sess.run(restore)
+      w_value, b_value = sess.run([lin1.w, lin1.b])
+    return restore_ops, expected_values, w_value, b_value
+
+  def testBulkRestore(self):
+    restore_ops, expected_values, w_value, b_value = self._restore_linear(
+        "linear1")
+    self.assertLen(restore_ops, 1)
+    self.assertAllClose(expected_values["w"], w_value)
+    self.assertAllClose(expected_values["b"], b_value)
+
+  def testBulkRestoreMaxTensorsPerOp(self):
+    restore_ops, expected_values, w_value, b_value = self._restore_linear(
+        "linear1", max_tensors_per_op=1)
+    self.assertLen(restore_ops, 2)
+    self.assertAllClose(expected_values["w"], w_value)
+    self.assertAllClose(expected_values["b"], b_value)
+
+  def testBulkRestorePartitioned(self):
+    restore_ops, expected_values, w_value, b_value = self._restore_linear(
+        "linear1", partitioned=True)
+    self.assertLen(restore_ops, 1)
+    self.assertAllClose(expected_values["w"], w_value)
+    self.assertAllClose(expected_values["b"], b_value)
+
+  def testBulkRestoreNameFn(self):
+    _, expected_values, w_value, b_value = self._restore_linear(
+        "linear2", name_fn=lambda name: name.replace("linear2", "linear1"))
+    self.assertAllClose(expected_values["w"], w_value)
+    self.assertAllClose(expected_values["b"], b_value)
+
+  def testInvalidMaxTensorsPerOp(self):
+    with self.assertRaisesRegexp(ValueError, "max_tensors_per_op"):
+      snt.custom_getters.bulk_restore_initializer("checkpoint",
+                                                  max_tensors_per_op=0)
+
+
 if __name__ == "__main__":
   tf.test.main()
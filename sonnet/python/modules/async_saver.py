@@ -0,0 +1,325 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Saver writing checkpoints from a background thread.
+
+`tf.train.Saver.save` blocks the caller until every variable is serialized
+and written. An `AsyncSaver` only blocks while the values of the variables are
+copied to host memory, in a single `session.run`, and writes the checkpoint
+from a background thread, in a separate graph and session.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+import threading
+import time
+
+# Dependency imports
+import numpy as np
+import six
+from sonnet.python.modules import util
+import tensorflow as tf
+
+from tensorflow.python.ops import io_ops  # pylint: disable=g-direct-tensorflow-import
+
+
+AsyncSaverStats = collections.namedtuple(
+    "AsyncSaverStats",
+    ("num_saves", "num_written", "stall_time_secs", "write_time_secs",
+     "bytes_written", "write_bytes_per_sec"))
+
+
+_Snapshot = collections.namedtuple(
+    "_Snapshot", ("save_path", "values", "meta_graph_def"))
+
+
+class AsyncSaver(object):
+  """Saves the variables of a scope or module from a background thread.
+
+  The variables are saved under the same normalized names as with
+  `snt.get_saver`, so the checkpoints can be restored with either saver:
+
+  ```python
+  saver = snt.AsyncSaver(model, max_in_flight=2)
+  for step in range(num_steps):
+    sess.run(train_op)
+    if step % 1000 == 0:
+      saver.save(sess, "/tmp/model.ckpt", global_step=step)
+  saver.close()
+  ```
+
+  `save` returns once the values of the variables are copied to host memory,
+  and the copies are written by a background thread. At most `max_in_flight`
+  copies exist at a time: `save` blocks until one of them is written if
+  needed, which bounds the host memory used to `max_in_flight` times the size
+  of the variables.
+
+  The saver can be used in place of a `tf.train.Saver`, e.g. by a
+  `tf.train.CheckpointSaverHook` or in a `tf.train.Scaffold`, in which case
+  `close` should be called after the session is closed to wait for the last
+  checkpoint.
+  """
+
+  def __init__(self, scope, collections=(tf.GraphKeys.GLOBAL_VARIABLES,),  # pylint: disable=redefined-outer-name
+               context=None, max_in_flight=1, max_to_keep=5):
+    """Constructs an AsyncSaver.
+
+    Args:
+      scope: Scope or module. Variables within will be saved or restored.
+      collections: Sequence of collections of variables to restrict the saver
+          to. By default this is `tf.GraphKeys.GLOBAL_VARIABLES` which includes
+          moving averages variables as well as trainable variables.
+      context: Scope or module, identical to or parent of `scope`. If given,
+          this will be used as the stripped prefix.
+      max_in_flight: Maximum number of checkpoints copied to host memory and
+          not yet written.
+      max_to_keep: Maximum number of recent checkpoints to keep, or `None` or
+          0 to keep all of them.
+
+    Raises:
+      ValueError: If `max_in_flight` is not positive.
+    """
+    if max_in_flight < 1:
+      raise ValueError("max_in_flight must be positive, got {}.".format(
+          max_in_flight))
+
+    variable_map = {}
+    for collection in collections:
+      variable_map.update(
+          util.get_normalized_variable_map(scope, collection, context))
+    # Restores the checkpoints, and describes them in exported meta graphs.
+    self._saver = util.get_saver(scope, collections, context,
+                                 max_to_keep=max_to_keep)
+    self._max_to_keep = max_to_keep
+
+    names = []
+    specs = []
+    self._variable_values = []
+    # pylint: disable=protected-access
+    with tf.name_scope("async_saver"):
+      for name, variable in sorted(util.variable_map_items(variable_map),
+                                   key=lambda item: item[0]):
+        save_slice_info = variable._get_save_slice_info()
+        names.append(name)
+        specs.append(save_slice_info.spec if save_slice_info else "")
+        self._variable_values.append(variable.value())
+    # pylint: enable=protected-access
+    self._graph = tf.get_default_graph()
+
+    # The checkpoints are written by a graph of their own, so writing them
+    # does not contend with the graph of the saved variables.
+    self._write_graph = tf.Graph()
+    with self._write_graph.as_default():
+      self._save_path = tf.placeholder(tf.string, [])
+      self._placeholders = [
+          tf.placeholder(value.dtype.base_dtype, value.get_shape())
+          for value in self._variable_values]
+      self._write = io_ops.save_v2(self._save_path, names, specs,
+                                   self._placeholders)
+    self._write_session = None
+
+    self._in_flight = threading.BoundedSemaphore(max_in_flight)
+    self._queue = six.moves.queue.Queue()
+    self._thread = None
+    self._error = None
+    self._last_checkpoints = []
+    self._meta_graph_def = None
+    self._meta_graph_version = None
+
+    self._num_saves = 0
+    self._num_written = 0
+    self._stall_time_secs = 0.
+    self._write_time_secs = 0.
+    self._bytes_written = 0
+
+  def _start(self):
+    if self._thread is None:
+      self._write_session = tf.Session(graph=self._write_graph)
+      self._thread = threading.Thread(target=self._run)
+      self._thread.daemon = True
+      self._thread.start()
+
+  def _run(self):
+    """Writes the snapshots of the queue until it receives `None`."""
+    while True:
+      snapshot = self._queue.get()
+      try:
+        if snapshot is None:
+          return
+        if self._error is None:
+          self._write_snapshot(snapshot)
+      except Exception as e:  # pylint: disable=broad-except
+        self._error = e
+      finally:
+        if snapshot is not None:
+          self._in_flight.release()
+        self._queue.task_done()
+
+  def _write_snapshot(self, snapshot):
+    """Writes a snapshot and updates the checkpoint state."""
+    start_time = time.time()
+    feed_dict = dict(zip(self._placeholders, snapshot.values))
+    feed_dict[self._save_path] = snapshot.save_path
+    self._write_session.run(self._write, feed_dict=feed_dict)
+    if snapshot.meta_graph_def is not None:
+      with tf.gfile.GFile(snapshot.save_path + ".meta", "wb") as f:
+        f.write(snapshot.meta_graph_def.SerializeToString())
+
+    if snapshot.save_path in self._last_checkpoints:
+      self._last_checkpoints.remove(snapshot.save_path)
+    self._last_checkpoints.append(snapshot.save_path)
+    if self._max_to_keep:
+      while len(self._last_checkpoints) > self._max_to_keep:
+        for filename in tf.gfile.Glob(self._last_checkpoints.pop(0) + ".*"):
+          tf.gfile.Remove(filename)
+    tf.train.update_checkpoint_state(
+        os.path.dirname(snapshot.save_path), snapshot.save_path,
+        all_model_checkpoint_paths=self._last_checkpoints)
+
+    self._write_time_secs += time.time() - start_time
+    self._bytes_written += sum(value.nbytes for value in snapshot.values)
+    self._num_written += 1
+
+  def _raise_error(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def _get_meta_graph_def(self):
+    """Returns a `MetaGraphDef` of the graph, exported once per version."""
+    if self._meta_graph_version != self._graph.version:
+      self._meta_graph_def = tf.train.export_meta_graph(
+          graph=self._graph, saver_def=self.saver_def)
+      self._meta_graph_version = self._graph.version
+    return self._meta_graph_def
+
+  def save(self, sess, save_path, global_step=None, write_meta_graph=True):
+    """Copies the variables to host memory, to be written asynchronously.
+
+    Args:
+      sess: A `tf.Session` of the graph of the variables.
+      save_path: Prefix of the checkpoint files.
+      global_step: If given, an integer, `Tensor` or `Variable` whose value is
+          appended to `save_path`.
+      write_meta_graph: Whether to write a `MetaGraphDef` of the graph along
+          with the checkpoint.
+
+    Returns:
+      The prefix of the checkpoint files, which are written once `wait`
+      returns.
+
+    Raises:
+      Exception: Any error raised while writing a previous checkpoint.
+    """
+    self._raise_error()
+    self._start()
+
+    start_time = time.time()
+    self._in_flight.acquire()
+    queued = False
+    try:
+      fetches = [self._variable_values]
+      if global_step is not None and not isinstance(
+          global_step, six.integer_types + (np.integer,)):
+        fetches.append(global_step)
+      results = sess.run(fetches)
+      if global_step is not None:
+        if len(results) > 1:
+          global_step = results[1]
+        save_path = "{}-{}".format(save_path, int(global_step))
+      meta_graph_def = self._get_meta_graph_def() if write_meta_graph else None
+      self._queue.put(_Snapshot(save_path, results[0], meta_graph_def))
+      queued = True
+    finally:
+      if not queued:
+        self._in_flight.release()
+    self._stall_time_secs += time.time() - start_time
+    self._num_saves += 1
+    return save_path
+
+  def wait(self):
+    """Blocks until all the checkpoints are written.
+
+    Raises:
+      Exception: Any error raised while writing a checkpoint.
+    """
+    if self._thread is not None:
+      self._queue.join()
+    self._raise_error()
+
+  def close(self):
+    """Waits for all the checkpoints to be written and stops the thread."""
+    if self._thread is not None:
+      self._queue.put(None)
+      self._thread.join()
+      self._thread = None
+      self._write_session.close()
+      self._write_session = None
+    self._raise_error()
+
+  def restore(self, sess, save_path):
+    """Restores the variables from a checkpoint, once all are written."""
+    self.wait()
+    self._saver.restore(sess, save_path)
+
+  def recover_last_checkpoints(self, checkpoint_paths):
+    """Recovers the checkpoints to keep, e.g. after restarting training.
+
+    Like `tf.train.Saver.recover_last_checkpoints`, this is called by
+    `tf.train.SessionManager` when restoring from an existing checkpoint, so
+    that the older checkpoints are deleted as new ones are written.
+
+    Args:
+      checkpoint_paths: List of checkpoint prefixes, oldest first. Those which
+        no longer exist are ignored.
+    """
+    self.wait()
+    self._last_checkpoints = [path for path in checkpoint_paths
+                              if tf.train.checkpoint_exists(path)]
+
+  @property
+  def saver_def(self):
+    """The `SaverDef` of a `tf.train.Saver` restoring the same variables."""
+    return self._saver.saver_def
+
+  @property
+  def last_checkpoints(self):
+    """The prefixes of the checkpoints written and not yet deleted."""
+    return list(self._last_checkpoints)
+
+  @property
+  def stats(self):
+    """Statistics of the checkpoints saved so far.
+
+    Returns:
+      An `AsyncSaverStats` with the number of calls to `save` and of written
+      checkpoints, the time spent blocked in `save` (`stall_time_secs`) and in
+      writing checkpoints in the background, the number of bytes of the
+      written values and the resulting write throughput.
+    """
+    write_time_secs = self._write_time_secs
+    bytes_written = self._bytes_written
+    return AsyncSaverStats(
+        num_saves=self._num_saves,
+        num_written=self._num_written,
+        stall_time_secs=self._stall_time_secs,
+        write_time_secs=write_time_secs,
+        bytes_written=bytes_written,
+        write_bytes_per_sec=(bytes_written / write_time_secs
+                             if write_time_secs else 0.))
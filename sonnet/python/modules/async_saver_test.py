@@ -0,0 +1,143 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.async_saver."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+class AsyncSaverTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(AsyncSaverTest, self).setUp()
+    self._save_path = os.path.join(self.get_temp_dir(), "model.ckpt")
+
+  def testSaveAndRestore(self):
+    with tf.variable_scope("model"):
+      w = tf.get_variable("w", initializer=np.arange(6.).reshape([2, 3]))
+      b = tf.get_variable(
+          "b", shape=[4, 2], initializer=tf.ones_initializer(),
+          partitioner=tf.fixed_size_partitioner(2))
+    global_step = tf.train.get_or_create_global_step()
+    saver = snt.AsyncSaver("model", max_in_flight=2)
+    update = tf.group(tf.assign_add(w, tf.ones_like(w)),
+                      tf.assign_add(global_step, 1))
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      save_path = saver.save(sess, self._save_path, global_step=global_step)
+      # The values are copied when `save` returns.
+      sess.run(update)
+      saver.wait()
+      self.assertEqual(save_path, self._save_path + "-0")
+      self.assertEqual(tf.train.latest_checkpoint(self.get_temp_dir()),
+                       save_path)
+
+      sess.run(tf.global_variables_initializer())
+      sess.run(update)
+      snt.get_saver("model").restore(sess, save_path)
+      self.assertAllClose(sess.run(w), np.arange(6.).reshape([2, 3]))
+      self.assertAllClose(sess.run(b.as_tensor()), np.ones([4, 2]))
+      saver.close()
+
+    stats = saver.stats
+    self.assertEqual(stats.num_saves, 1)
+    self.assertEqual(stats.num_written, 1)
+    self.assertEqual(stats.bytes_written, 6 * 8 + 8 * 4)
+    self.assertGreater(stats.write_bytes_per_sec, 0)
+
+  def testMaxToKeep(self):
+    with tf.variable_scope("model"):
+      tf.get_variable("w", shape=[3])
+    saver = snt.AsyncSaver("model", max_to_keep=2)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      for step in range(4):
+        saver.save(sess, self._save_path, global_step=step)
+      saver.close()
+
+    expected_checkpoints = [self._save_path + "-2", self._save_path + "-3"]
+    self.assertEqual(saver.last_checkpoints, expected_checkpoints)
+    self.assertFalse(tf.gfile.Glob(self._save_path + "-0.*"))
+    self.assertTrue(tf.gfile.Glob(self._save_path + "-3.*"))
+    state = tf.train.get_checkpoint_state(self.get_temp_dir())
+    self.assertEqual(list(state.all_model_checkpoint_paths),
+                     expected_checkpoints)
+
+  def testCheckpointSaverHook(self):
+    with tf.variable_scope("model"):
+      w = tf.get_variable("w", shape=[3])
+    global_step = tf.train.get_or_create_global_step()
+    train_op = tf.assign_add(global_step, 1)
+    saver = snt.AsyncSaver("")
+    hook = tf.train.CheckpointSaverHook(
+        self.get_temp_dir(), save_steps=2, saver=saver)
+
+    with tf.train.SingularMonitoredSession(hooks=[hook]) as sess:
+      for _ in range(3):
+        sess.run(train_op)
+      expected_w = sess.run(w)
+    saver.close()
+
+    checkpoint = tf.train.latest_checkpoint(self.get_temp_dir())
+    self.assertEqual(checkpoint, self._save_path + "-3")
+    self.assertTrue(tf.gfile.Exists(checkpoint + ".meta"))
+    reader = tf.train.NewCheckpointReader(checkpoint)
+    self.assertAllClose(reader.get_tensor("model/w"), expected_w)
+
+  def testRestartTraining(self):
+    def train(num_steps):
+      with tf.Graph().as_default():
+        tf.get_variable("w", shape=[3])
+        global_step = tf.train.get_or_create_global_step()
+        train_op = tf.assign_add(global_step, 1)
+        saver = snt.AsyncSaver("", max_to_keep=2)
+        with tf.train.MonitoredTrainingSession(
+            checkpoint_dir=self.get_temp_dir(),
+            scaffold=tf.train.Scaffold(saver=saver),
+            save_checkpoint_steps=1) as sess:
+          for _ in range(num_steps):
+            step = sess.run(train_op)
+        saver.close()
+        return step, saver.last_checkpoints
+
+    self.assertEqual(train(3)[0], 3)
+    # Training resumes from the last checkpoint, and the checkpoints of the
+    # first run are deleted as new ones are written.
+    step, last_checkpoints = train(2)
+    self.assertEqual(step, 5)
+    self.assertEqual(last_checkpoints,
+                     [self._save_path + "-4", self._save_path + "-5"])
+    self.assertFalse(tf.gfile.Glob(self._save_path + "-3.*"))
+
+  def testInvalidMaxInFlight(self):
+    with tf.variable_scope("model"):
+      tf.get_variable("w", shape=[3])
+    with self.assertRaisesRegexp(ValueError, "max_in_flight must be positive"):
+      snt.AsyncSaver("model", max_in_flight=0)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -29,14 +29,18 @@ import collections
 import contextlib
 import inspect
 import threading
+import time
 import types
+import weakref
 
 # Dependency imports
 import contextlib2
+import numpy as np
 import six
 from sonnet.python.modules import base_info
 from sonnet.python.modules import util
 import tensorflow as tf
+from tensorflow.python.ops import variable_scope as variable_scope_ops
 import wrapt
 
 # Import error class from base_errors for backward compatibility.
@@ -53,6 +57,7 @@ from sonnet.python.modules.base_errors import ModuleInfoError
 # pylint: enable=g-bad-import-order
 # pylint: enable=unused-import
 
+nest = tf.contrib.framework.nest
 
 _LOCAL_STACKS = threading.local()
 
@@ -67,6 +72,242 @@ def _get_or_create_stack(name):
 
 get_module_stack = lambda: _get_or_create_stack("modules")
 get_connection_stack = lambda: _get_or_create_stack("connections")
+get_track_connections_stack = lambda: _get_or_create_stack("track_connections")
+
+# Policies for recording the `ConnectedSubGraph`s of a module.
+TRACK_ALL_CONNECTIONS = "all"
+TRACK_LAST_CONNECTION = "last"
+TRACK_NO_CONNECTIONS = "none"
+_TRACK_CONNECTIONS_POLICIES = (TRACK_ALL_CONNECTIONS, TRACK_LAST_CONNECTION,
+                               TRACK_NO_CONNECTIONS)
+
+
+def _check_track_connections_policy(policy):
+  if policy not in _TRACK_CONNECTIONS_POLICIES:
+    raise ValueError("track_connections must be one of {}, not {!r}.".format(
+        ", ".join(_TRACK_CONNECTIONS_POLICIES), policy))
+
+
+@contextlib.contextmanager
+def track_connections(policy):
+  """Sets which connected subgraphs modules record while in this context.
+
+  Every time a module is connected in graph mode, the inputs and outputs of
+  the connection are recorded in its `connected_subgraphs`. For modules which
+  are connected many times, e.g. recurrent cores in a long static unroll, this
+  keeps references to many tensors and slows down graph construction:
+
+  ```python
+  with snt.track_connections("last"):
+    outputs, _ = tf.nn.static_rnn(core, inputs, initial_state)
+  ```
+
+  The policy of a module can also be set with its `track_connections`
+  property, which takes precedence over this context.
+
+  Args:
+    policy: One of "all" (the default), to record all the connections, "last",
+      to only keep the last connection, or "none", to not record connections
+      at all. Connections are always recorded while observers registered with
+      `observe_connections` are active.
+
+  Yields:
+    None: just yields control to the inner context.
+
+  Raises:
+    ValueError: If `policy` is not a valid policy.
+  """
+  _check_track_connections_policy(policy)
+  track_connections_stack = get_track_connections_stack()
+  track_connections_stack.append(policy)
+  try:
+    yield
+  finally:
+    track_connections_stack.pop()
+
+
+# Statistics of a `_CompiledCallCache`. `first_call_time_secs` is the total
+# time of the calls which traced a graph function, including running the traced
+# function once, not only tracing it.
+CompiledCallStats = collections.namedtuple(
+    "CompiledCallStats",
+    ("hits", "misses", "evictions", "first_call_time_secs", "num_functions"))
+
+
+# Signature of a `Tensor` where `tf.TensorSpec` is not available.
+_TensorSignature = collections.namedtuple(
+    "_TensorSignature", ("shape", "dtype"))
+
+
+class _CompiledCallCache(object):
+  """Cache of graph functions of a call method, keyed by input signature.
+
+  The signature of a call is made of the structure of its arguments, the
+  values of its non-`Tensor` arguments and the dtypes and shapes of its
+  `Tensor` arguments, in which the dimensions `relaxed_dims` are replaced by
+  `None`. A graph function is traced for each signature, with the relaxed
+  `Tensor` specs as its `input_signature`, so e.g. relaxing the batch
+  dimension only traces the method once for all batch sizes.
+
+  `np.ndarray` arguments are converted to `Tensor`s. Calls with other
+  unhashable non-`Tensor` arguments are traced without being cached.
+
+  With versions of TensorFlow whose `defun` does not take an
+  `input_signature`, the graph function of a signature is traced again by
+  `defun` for each shape of its relaxed dimensions.
+  """
+
+  def __init__(self, call_method, relaxed_dims=None, max_size=None):
+    self._call_method = call_method
+    self._relaxed_dims = frozenset(relaxed_dims or ())
+    self._max_size = max_size
+    self._functions = collections.OrderedDict()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+    self._first_call_time_secs = 0.
+
+  def _tensor_spec(self, tensor):
+    """Returns the `TensorSpec` of `tensor`, with the relaxed dims unknown."""
+    shape = tensor.get_shape()
+    if shape.ndims is not None:
+      dims = shape.as_list()
+      for dim in self._relaxed_dims:
+        if -len(dims) <= dim < len(dims):
+          dims[dim] = None
+      shape = tf.TensorShape(dims)
+    if not hasattr(tf, "TensorSpec"):
+      return _TensorSignature(shape, tensor.dtype)
+    return tf.TensorSpec(shape, tensor.dtype)
+
+  def _compile(self, structure, flat_inputs, tensor_indices, specs):
+    """Returns a graph function calling the method with the given `Tensor`s."""
+    def call_with_tensors(*tensors):
+      flat_args = list(flat_inputs)
+      for index, tensor in zip(tensor_indices, tensors):
+        flat_args[index] = tensor
+      args, kwargs = nest.pack_sequence_as(structure, flat_args)
+      return self._call_method(*args, **kwargs)
+    defun = tf.contrib.eager.defun
+    if not hasattr(tf, "TensorSpec"):
+      return defun(call_with_tensors)
+    try:
+      return defun(call_with_tensors, input_signature=specs)
+    except TypeError:
+      # `defun` does not take an `input_signature`.
+      return defun(call_with_tensors)
+
+  def __call__(self, *args, **kwargs):
+    flat_inputs = [tf.convert_to_tensor(x) if isinstance(x, np.ndarray) else x
+                   for x in nest.flatten((args, kwargs))]
+    tensor_indices = tuple(i for i, x in enumerate(flat_inputs)
+                           if isinstance(x, tf.Tensor))
+    specs = tuple(self._tensor_spec(flat_inputs[i]) for i in tensor_indices)
+    tensors = [flat_inputs[i] for i in tensor_indices]
+    for i in tensor_indices:
+      flat_inputs[i] = None
+    structure = nest.map_structure(lambda _: None, (args, kwargs))
+    key = (repr(structure), tuple(flat_inputs),
+           tuple((spec.dtype, tuple(spec.shape.as_list())
+                  if spec.shape.ndims is not None else None)
+                 for spec in specs))
+    try:
+      hash(key)
+    except TypeError:
+      self._misses += 1
+      function = self._compile(structure, flat_inputs, tensor_indices, specs)
+      return function(*tensors)
+
+    function = self._functions.get(key)
+    if function is not None:
+      self._hits += 1
+      self._functions.pop(key)
+      self._functions[key] = function
+      return function(*tensors)
+
+    self._misses += 1
+    function = self._compile(structure, flat_inputs, tensor_indices, specs)
+    self._functions[key] = function
+    if self._max_size is not None and len(self._functions) > self._max_size:
+      self._functions.popitem(last=False)
+      self._evictions += 1
+    start_time = time.time()
+    outputs = function(*tensors)
+    self._first_call_time_secs += time.time() - start_time
+    return outputs
+
+  @property
+  def stats(self):
+    return CompiledCallStats(
+        hits=self._hits,
+        misses=self._misses,
+        evictions=self._evictions,
+        first_call_time_secs=self._first_call_time_secs,
+        num_functions=len(self._functions))
+
+
+# `__call__` functions with the signature of a `_build` function, keyed by it.
+_CALL_ADAPTERS = weakref.WeakKeyDictionary()
+
+
+def _get_call_adapter(build_fn):
+  """Returns a `__call__` function with the signature and docs of `build_fn`.
+
+  Creating the `wrapt` adapter is a significant part of the cost of
+  constructing a module, so adapters are cached per `_build` function, i.e. per
+  module class.
+
+  Args:
+    build_fn: The (unbound) `_build` function of a module.
+
+  Returns:
+    A function calling `AbstractModule.__call__`, to be bound to the module.
+  """
+  try:
+    return _CALL_ADAPTERS[build_fn]
+  except (KeyError, TypeError):
+    pass
+
+  @wrapt.decorator(adapter=build_fn)
+  def copy_signature(method, unused_instance, args, kwargs):
+    return method(*args, **kwargs)
+  @copy_signature
+  def __call__(instance, *args, **kwargs):  # pylint: disable=invalid-name
+    return AbstractModule.__call__(instance, *args, **kwargs)
+  __call__.__doc__ = build_fn.__doc__
+
+  try:
+    _CALL_ADAPTERS[build_fn] = __call__
+  except TypeError:
+    # `build_fn` cannot be weakly referenced, e.g. a builtin.
+    pass
+  return __call__
+
+
+def _reserve_variable_scope(name):
+  """Uniquifies `name` in the current variable scope, without entering it.
+
+  This does the same bookkeeping as `tf.make_template(name, ...,
+  create_scope_now_=True)`, so that the template can be created later on with
+  the same name as if it had been created now.
+
+  Args:
+    name: Name of the variable scope.
+
+  Returns:
+    The current variable scope, the unique name and the full name of the
+    reserved variable scope.
+  """
+  outer_variable_scope = tf.get_variable_scope()
+  unique_name = variable_scope_ops._get_unique_variable_scope(name)  # pylint: disable=protected-access
+  if outer_variable_scope.name:
+    scope_name = outer_variable_scope.name + "/" + unique_name
+  else:
+    scope_name = unique_name
+  variable_scope_store = variable_scope_ops.get_variable_scope_store()
+  variable_scope_store.open_variable_scope(scope_name)
+  variable_scope_store.close_variable_subscopes(scope_name)
+  return outer_variable_scope, unique_name, scope_name
 
 
 @contextlib.contextmanager
@@ -119,6 +360,11 @@ class AbstractModule(object):
   Every subclass must call this class' `__init__` at the start of their
   `__init__`, passing the relevant name. If this step is omitted variable
   sharing will not work.
+
+  The name of the module is uniquified in the variable scope it is constructed
+  in, but the template itself is only created the first time it is needed,
+  e.g. when the module is connected or its variable scope is entered. This
+  keeps the construction of many small modules cheap.
   """
 
   def __init__(self, _sentinel=None, custom_getter=None,
@@ -162,6 +408,7 @@ class AbstractModule(object):
 
     self._is_connected = False
     self._connected_subgraphs = []
+    self._track_connections = None
 
     # If the given custom getter is a dictionary with a per-variable custom
     # getter, wrap it into a single custom getter.
@@ -174,41 +421,53 @@ class AbstractModule(object):
     else:
       self._custom_getter = custom_getter
 
-    self._template = tf.make_template(name,
-                                      self._build_wrapper,
-                                      create_scope_now_=True,
-                                      custom_getter_=self._custom_getter)
-
+    # The template is created lazily by the `_template` property.
+    self._lazy_template = None
+    (self._outer_variable_scope, self._unique_name,
+     self._scope_name) = _reserve_variable_scope(name)
     self._original_name = name
-    self._unique_name = self._template.variable_scope.name.split("/")[-1]
 
     # Copy signature of _build to __call__.
     adapter_fn = getattr(self._build, "__func__", self._build)
-    @wrapt.decorator(adapter=adapter_fn)
-    def copy_signature(method, unused_instance, args, kwargs):
-      return method(*args, **kwargs)
-    @copy_signature
-    def __call__(instance, *args, **kwargs):  # pylint: disable=invalid-name
-      return AbstractModule.__call__(instance, *args, **kwargs)
     # use __dict__ instead of setting directly to avoid a Callable pytype error
-    self.__dict__["__call__"] = types.MethodType(__call__, self)
+    self.__dict__["__call__"] = types.MethodType(
+        _get_call_adapter(adapter_fn), self)
 
-    # Update __call__ and the object docstrings to enable better introspection.
+    # Update the object docstring to enable better introspection.
     self.__doc__ = self._build.__doc__
-    self.__call__.__func__.__doc__ = self._build.__doc__
 
     # Keep track of which graph this module has been connected to. Sonnet
     # modules cannot be connected to multiple graphs, as transparent variable
     # sharing is impossible in that case.
     self._graph = None
 
-    # Container for all variables created in this module and its sub-modules.
-    self._all_variables = set([])
+    # Variables used by this module, recorded once when they are created, and
+    # the sub-modules connected inside it, keyed by scope name. All the
+    # variables of the module are resolved from these by `_all_variables`.
+    self._captured_variables = set([])
+    self._submodules = {}
 
     # Calling `.defun()` causes the module's call method to become wrapped as
     # a graph function.
     self._defun_wrapped = False
 
+  @property
+  def _template(self):
+    """The `tf.Template` wrapping `_build_wrapper`, created on first access."""
+    if self._lazy_template is None:
+      # Re-enter the variable scope the module was constructed in, so that the
+      # template scope reserved in `__init__` is created with the same name
+      # and defaults as if it had been created then.
+      with variable_scope_ops._pure_variable_scope(  # pylint: disable=protected-access
+          self._outer_variable_scope):
+        self._lazy_template = tf.make_template(
+            self._original_name,
+            self._build_wrapper,
+            create_scope_now_=True,
+            unique_name_=self._unique_name,
+            custom_getter_=self._custom_getter)
+    return self._lazy_template
+
   def _build_wrapper(self, *args, **kwargs):
     """Function which will be wrapped in a Template to do variable sharing.
 
@@ -305,16 +564,20 @@ class AbstractModule(object):
 
   @contextlib.contextmanager
   def _capture_variables(self):
-    """Adds variables used by this module to self._all_variables.
+    """Records the variables used by this module.
 
     Upon entering this context manager the module adds itself onto the top
     of the module call stack. Any variables created with `tf.get_variable()`
-    inside `_build()` or `_enter_variable_scope()` while this module is on top
-    of the call stack will be added to `self._all_variables`.
+    inside `_build()` or `_enter_variable_scope()` while this module is in the
+    call stack will be added to `self._captured_variables`. Until the module is
+    connected, the variables of its template which it did not create (e.g.
+    because they are reused from a previous module with the same scope) are
+    also added.
 
     Before exiting the context the module removes itself from the top of the
-    call stack, and adds all of the variables in `self._all_variables` to its
-    parent module (the new top) of the call stack.
+    call stack, and registers itself as a sub-module of its parent module (the
+    new top) of the call stack. The variables of sub-modules are only collected
+    when they are requested, see `_all_variables`.
 
     Yields:
       Nothing, the yield just transfers focus back to the inner context.
@@ -334,12 +597,15 @@ class AbstractModule(object):
           stack.enter_context(template_store.as_default())
 
         stack.enter_context(
-            util.notify_about_new_variables(self._all_variables.add))
+            util.notify_about_new_variables(self._captured_variables.add))
 
         yield
 
-        if self._original_name:
-          self._all_variables.update(self._template.variables)
+        # Looking up the variables of the template is linear in the number of
+        # variables of the graph, and after the first connection the module
+        # does not use variables it did not create.
+        if self._original_name and not self._is_connected:
+          self._captured_variables.update(self._template.variables)
 
     finally:
       # Remove `self` from `module_stack`, this happens as part of cleanup
@@ -347,9 +613,36 @@ class AbstractModule(object):
       module_stack.pop()
 
     if module_stack:
-      # Peek into the stack to add created variables to the parent
+      # Peek into the stack to register this module in the parent
       parent_module = module_stack[-1]
-      parent_module._all_variables.update(self._all_variables)  # pylint: disable=protected-access
+      parent_module._add_submodule(self)  # pylint: disable=protected-access
+
+  def _add_submodule(self, submodule):
+    """Registers `submodule` as connected inside this module."""
+    registered = self._submodules.get(submodule.scope_name)
+    if registered is submodule:
+      return
+    if registered is not None:
+      # A new module with the same scope, e.g. one constructed in `_build`.
+      # Keep the variables of the previous one, so they are not lost if they
+      # differ.
+      self._captured_variables.update(registered._all_variables)  # pylint: disable=protected-access
+    self._submodules[submodule.scope_name] = submodule
+
+  @property
+  def _all_variables(self):
+    """Set of the variables used by this module and its sub-modules."""
+    all_variables = set(self._captured_variables)
+    visited = set([id(self)])
+    to_visit = list(self._submodules.values())
+    while to_visit:
+      module = to_visit.pop()
+      if id(module) in visited:
+        continue
+      visited.add(id(module))
+      all_variables.update(module._captured_variables)  # pylint: disable=protected-access
+      to_visit.extend(module._submodules.values())  # pylint: disable=protected-access
+    return all_variables
 
   def _add_connected_subgraph(self, call_method, outputs, subgraph_name_scope,
                               *inputs_args, **inputs_kwargs):
@@ -362,6 +655,11 @@ class AbstractModule(object):
       *inputs_args: `self._build` inputs `*args`.
       **inputs_kwargs: `self._build` inputs `*kwargs`.
     """
+    policy = self.track_connections
+    observers = get_connection_stack()
+    if policy == TRACK_NO_CONNECTIONS and not observers:
+      return
+
     build_inputs = inspect.getcallargs(call_method,
                                        *inputs_args, **inputs_kwargs)
 
@@ -376,21 +674,84 @@ class AbstractModule(object):
         module=self, name_scope=subgraph_name_scope,
         inputs=build_inputs,
         outputs=outputs)
-    self._connected_subgraphs.append(connected_subgraph)
+    if policy == TRACK_ALL_CONNECTIONS:
+      self._connected_subgraphs.append(connected_subgraph)
+    elif policy == TRACK_LAST_CONNECTION:
+      # Modify the list in place, as it is shared with the `ModuleInfo`.
+      self._connected_subgraphs[:] = [connected_subgraph]
 
-    for observer in get_connection_stack():
+    for observer in observers:
       observer(connected_subgraph)
 
+  @property
+  def track_connections(self):
+    """Which connected subgraphs are recorded: "all", "last" or "none".
+
+    Unless set explicitly, this is the policy of the innermost
+    `snt.track_connections` context, or "all".
+    """
+    if self._track_connections is not None:
+      return self._track_connections
+    track_connections_stack = get_track_connections_stack()
+    if track_connections_stack:
+      return track_connections_stack[-1]
+    return TRACK_ALL_CONNECTIONS
+
+  @track_connections.setter
+  def track_connections(self, policy):
+    if policy is not None:
+      _check_track_connections_policy(policy)
+    self._track_connections = policy
+
   @property
   def defun_wrapped(self):
     """Returns boolean indicating whether this module is defun wrapped."""
     return self._defun_wrapped
 
-  def defun(self):
-    """Wraps this modules call method in a callable graph function."""
+  def defun(self, relaxed_dims=None, max_cached_functions=None):
+    """Wraps this modules call method in a callable graph function.
+
+    A graph function is traced for each input signature the module is called
+    with, i.e. for each structure of the arguments, values of the non-`Tensor`
+    arguments and dtypes and shapes of the `Tensor` arguments. For example,
+    to trace the module once for all batch sizes:
+
+    ```python
+    module.defun(relaxed_dims=[0])
+    ```
+
+    Only the first call of `defun` has an effect.
+
+    Args:
+      relaxed_dims: Optional iterable of dimensions, e.g. `[0]` for the batch
+        dimension, which are not part of the signature. Negative dimensions
+        are counted from the last one. Versions of TensorFlow whose
+        `tf.contrib.eager.defun` does not take an `input_signature` still
+        trace the module once per shape.
+      max_cached_functions: Optional maximum number of graph functions to keep.
+        The least recently used function is discarded when it is exceeded, and
+        traced again if it is needed.
+    """
     if not self._defun_wrapped:
       self._defun_wrapped = True
-      self._call = tf.contrib.eager.defun(self._call)
+      self._call = _CompiledCallCache(self._call, relaxed_dims=relaxed_dims,
+                                      max_size=max_cached_functions)
+
+  @property
+  def defun_stats(self):
+    """Statistics of the graph functions traced since calling `defun`.
+
+    Returns:
+      A `CompiledCallStats` with the number of calls which did (`hits`) or did
+      not (`misses`) find a graph function for their signature, the number of
+      discarded functions (`evictions`), the total time in seconds of the calls
+      which traced a function (`first_call_time_secs`), which includes
+      running the function once in eager mode, and the number of cached
+      functions (`num_functions`), or `None` if `defun` was not called.
+    """
+    if not self._defun_wrapped:
+      return None
+    return self._call.stats
 
   def __call__(self, *args, **kwargs):
     return self._call(*args, **kwargs)
@@ -457,7 +818,7 @@ class AbstractModule(object):
   @property
   def scope_name(self):
     """Returns the full name of the Module's variable scope."""
-    return self._template.variable_scope.name
+    return self._scope_name
 
   @property
   def module_name(self):
@@ -476,7 +837,10 @@ class AbstractModule(object):
 
   @property
   def connected_subgraphs(self):
-    """Returns the subgraphs created by this module so far."""
+    """Returns the subgraphs created by this module so far.
+
+    Only the subgraphs recorded according to `track_connections` are returned.
+    """
     if tf.executing_eagerly():
       raise NotSupportedError(
           "Connected sub-graphs are not tracked in eager mode.")
@@ -491,11 +855,16 @@ class AbstractModule(object):
 
     Raises:
       NotConnectedError: If the module is not connected to the Graph.
+      NotSupportedError: If the connections of the module are not tracked.
     """
     if tf.executing_eagerly():
       raise NotSupportedError(
           "Connected sub-graphs are not tracked in eager mode.")
     self._ensure_is_connected()
+    if not self._connected_subgraphs:
+      raise NotSupportedError(
+          "Connected sub-graphs of {} are not tracked, see "
+          "`track_connections`.".format(self.scope_name))
     return self._connected_subgraphs[-1]
 
   @classmethod
@@ -0,0 +1,113 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for the construction and connection of modules.
+
+Run with:
+
+  python base_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+NUM_MODULES = 1000
+BATCH_SIZE = 8
+INPUT_SIZE = 16
+NUM_LAYERS = 4
+
+
+class ConstructionBenchmark(tf.test.Benchmark):
+  """Measures the per-module cost of constructing and connecting modules."""
+
+  def _benchmark_construction(self, name, module_fn, inputs_fn):
+    with tf.Graph().as_default():
+      start_time = time.time()
+      modules = [module_fn(i) for i in range(NUM_MODULES)]
+      construction_time = (time.time() - start_time) / NUM_MODULES
+
+      inputs = inputs_fn()
+      start_time = time.time()
+      for module in modules:
+        module(inputs)
+      first_call_time = (time.time() - start_time) / NUM_MODULES
+
+    self.report_benchmark(
+        name=name,
+        iters=NUM_MODULES,
+        wall_time=construction_time,
+        extras={"construction_time": construction_time,
+                "first_call_time": first_call_time})
+
+  def benchmarkLinear(self):
+    self._benchmark_construction(
+        "linear",
+        lambda i: snt.Linear(INPUT_SIZE, name="linear"),
+        lambda: tf.ones([BATCH_SIZE, INPUT_SIZE]))
+
+  def benchmarkMLP(self):
+    self._benchmark_construction(
+        "mlp",
+        lambda i: snt.nets.MLP([INPUT_SIZE] * 3, name="mlp"),
+        lambda: tf.ones([BATCH_SIZE, INPUT_SIZE]))
+
+  def benchmarkConvNet2D(self):
+    self._benchmark_construction(
+        "conv_net_2d",
+        lambda i: snt.nets.ConvNet2D(  # pylint: disable=g-long-lambda
+            output_channels=[4] * 3, kernel_shapes=[3], strides=[1],
+            paddings=[snt.SAME], name="conv_net_2d"),
+        lambda: tf.ones([BATCH_SIZE, 8, 8, 4]))
+
+
+class DeepHierarchyBenchmark(tf.test.Benchmark):
+  """Measures the build time of a deep hierarchy connected many times."""
+
+  def _benchmark_static_unroll(self, num_steps):
+    with tf.Graph().as_default():
+      deep_rnn = snt.DeepRNN(
+          [snt.LSTM(INPUT_SIZE, name="lstm_%d" % i) for i in range(NUM_LAYERS)],
+          name="deep_rnn")
+      model = snt.Module(build=deep_rnn, name="model")
+      inputs = tf.ones([BATCH_SIZE, INPUT_SIZE])
+      state = deep_rnn.initial_state(BATCH_SIZE)
+
+      start_time = time.time()
+      for _ in range(num_steps):
+        inputs, state = model(inputs, state)
+      build_time = time.time() - start_time
+      num_variables = len(model.variables)
+
+    self.report_benchmark(
+        name="static_unroll_{}_steps".format(num_steps),
+        iters=num_steps,
+        wall_time=build_time / num_steps,
+        extras={"build_time": build_time,
+                "num_variables": num_variables})
+
+  def benchmarkStaticUnroll(self):
+    for num_steps in (10, 100, 1000):
+      self._benchmark_static_unroll(num_steps)
+
+
+if __name__ == "__main__":
+  tf.test.main()
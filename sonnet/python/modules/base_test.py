@@ -28,6 +28,7 @@ from absl.testing import parameterized
 import numpy as np
 import six
 from sonnet.python.modules import base
+from sonnet.python.modules import base_info
 from sonnet.python.modules.base_errors import NotSupportedError
 import tensorflow as tf
 
@@ -230,6 +231,48 @@ class AbstractModuleTest(parameterized.TestCase, tf.test.TestCase):
     self.assertIs(subgraphs[1].outputs, blah_outputs)
     self.assertIs(subgraphs[2].outputs, baz_outputs)
 
+  def testTrackConnections(self):
+    if tf.executing_eagerly():
+      self.skipTest("Subgraphs are not recorded in eager mode.")
+
+    id_mod = IdentityModule(name="foo")
+    observed = []
+    # pylint: disable=not-callable
+    with base.track_connections("last"):
+      self.assertEqual(id_mod.track_connections, "last")
+      id_mod(tf.ones([21]))
+      last_inputs = tf.ones([22])
+      id_mod(last_inputs)
+    self.assertLen(id_mod.connected_subgraphs, 1)
+    self.assertIs(id_mod.last_connected_subgraph.inputs["inputs"], last_inputs)
+    module_info, = tf.get_collection(base_info.SONNET_COLLECTION_NAME)
+    self.assertLen(module_info.connected_subgraphs, 1)
+
+    id_mod.track_connections = "none"
+    with base.track_connections("all"):
+      id_mod(tf.ones([23]))
+    self.assertLen(id_mod.connected_subgraphs, 1)
+    # Observers are still notified.
+    with base.observe_connections(observed.append):
+      id_mod(tf.ones([24]))
+    self.assertLen(observed, 1)
+    self.assertLen(id_mod.connected_subgraphs, 1)
+
+    other_mod = IdentityModule(name="bar")
+    other_mod.track_connections = "none"
+    other_mod(tf.ones([25]))
+    # pylint: enable=not-callable
+    with self.assertRaisesRegexp(base.NotSupportedError, "track_connections"):
+      other_mod.last_connected_subgraph  # pylint: disable=pointless-statement
+
+  def testTrackConnectionsInvalidPolicy(self):
+    id_mod = IdentityModule(name="foo")
+    with self.assertRaisesRegexp(ValueError, "track_connections"):
+      id_mod.track_connections = "first"
+    with self.assertRaisesRegexp(ValueError, "track_connections"):
+      with base.track_connections(1):
+        pass
+
   def testSubgraphsNotRecordedEager(self):
     if not tf.executing_eagerly():
       self.skipTest("Subgraphs are recorded in graph mode")
@@ -530,6 +573,24 @@ class AbstractModuleTest(parameterized.TestCase, tf.test.TestCase):
     for v1, v2 in zip(inner1.variables, inner2.variables):
       self.assertIs(v1, v2)
 
+  def testSubmodulesRegisteredOnce(self):
+    inputs = tf.ones(dtype=tf.float32, shape=[10, 10])
+    submodule_a = SimpleModule(name="simple_submodule")
+    submodule_b = ComplexModule(name="complex_submodule")
+    module = ModuleWithSubmodules(
+        submodule_a=submodule_a, submodule_b=submodule_b)
+    module(inputs)  # pylint: disable=not-callable
+    variables = module.variables
+    module(inputs)  # pylint: disable=not-callable
+
+    self.assertEqual(module.variables, variables)
+    self.assertCountEqual(
+        module._submodules.keys(),
+        ["simple_submodule", "complex_submodule",
+         "module_with_submodules/simple_build",
+         "module_with_submodules/complex_build"])
+    self.assertIs(module._submodules["simple_submodule"], submodule_a)
+
   def testCallSignatureAndDocstring(self):
     my_module = SimpleModule()
     self.assertEqual(
@@ -537,6 +598,33 @@ class AbstractModuleTest(parameterized.TestCase, tf.test.TestCase):
         inspect.getargspec(my_module._build))
     self.assertEqual(my_module.__call__.__doc__, my_module._build.__doc__)
 
+  def testCallAdapterSharedPerClass(self):
+    module_a = SimpleModule(name="module_a")
+    module_b = SimpleModule(name="module_b")
+    self.assertIs(module_a.__call__.__func__, module_b.__call__.__func__)
+    self.assertIs(module_a.__call__.__self__, module_a)
+
+  def testTemplateCreatedLazily(self):
+    with tf.variable_scope("outer"):
+      module_a = SimpleModule(name="lazy")
+      module_b = IdentityModule(name="lazy")
+      # Names are still uniquified at construction, without templates.
+      module_c = IdentityModule(name="lazy")
+      template = tf.make_template("lazy", lambda: None, create_scope_now_=True)
+    # Entering the variable scope in the constructor creates the template.
+    self.assertIsNotNone(module_a._lazy_template)
+    self.assertIsNone(module_b._lazy_template)
+    self.assertIsNone(module_c._lazy_template)
+    self.assertEqual(module_b.scope_name, "outer/lazy_1")
+    self.assertEqual(module_c.module_name, "lazy_2")
+    self.assertEqual(template.variable_scope.name, "outer/lazy_3")
+
+    # The template is created in the construction scope, not the current one.
+    with tf.variable_scope("other"):
+      module_c(tf.ones([2]))  # pylint: disable=not-callable
+    self.assertEqual(module_c.variable_scope.name, "outer/lazy_2")
+    self.assertEqual(module_c.name_scopes, ("other/lazy_2",))
+
 
 def _make_model_with_params(inputs, output_size):
   weight_shape = [inputs.get_shape().as_list()[-1], output_size]
@@ -704,6 +792,15 @@ class MatMulModule(base.AbstractModule):
     return x * self.w
 
 
+class ScaleModule(base.AbstractModule):
+
+  call_count = 0
+
+  def _build(self, x, scales):
+    self.call_count += 1
+    return x * sum(scales)
+
+
 # @tf.contrib.eager.run_all_tests_in_graph_and_eager_modes
 class DefunTest(tf.test.TestCase):
 
@@ -738,6 +835,58 @@ class DefunTest(tf.test.TestCase):
       self.assertListEqual(output.shape.as_list(), [batch_size, 32])
     self.assertEqual(module.call_count, 2)
 
+  def testDefunRelaxedDims(self):
+    module = MatMulModule()
+    self.assertIsNone(module.defun_stats)
+    module.defun(relaxed_dims=[0])
+
+    for batch_size in (10, 20, 10):
+      output = module(tf.zeros([batch_size, 1]))
+      # The output of the graph function has an unknown batch dimension.
+      self.assertListEqual(output.shape.as_list(), [None, 32])
+    self.assertEqual(module.call_count, 1)
+    stats = module.defun_stats
+    self.assertEqual((stats.hits, stats.misses, stats.num_functions),
+                     (2, 1, 1))
+    self.assertGreater(stats.first_call_time_secs, 0.)
+
+  def testDefunNumpyInputs(self):
+    module = MatMulModule()
+    module.defun()
+
+    for _ in range(2):
+      output = module(np.zeros([10, 1], dtype=np.float32))
+      self.assertListEqual(output.shape.as_list(), [10, 32])
+    self.assertEqual(module.call_count, 1)
+    self.assertEqual(module.defun_stats.hits, 1)
+
+  def testDefunUnhashableInputs(self):
+    module = ScaleModule()
+    module.defun()
+
+    for _ in range(2):
+      output = module(tf.ones([2]), scales=bytearray([1, 2]))
+    self.assertEqual(module.call_count, 2)
+    stats = module.defun_stats
+    self.assertEqual((stats.hits, stats.misses, stats.num_functions),
+                     (0, 2, 0))
+    with self.test_session() as sess:
+      self.assertAllClose(sess.run(output), [3., 3.])
+
+  def testDefunMaxCachedFunctions(self):
+    module = MatMulModule()
+    module.defun(max_cached_functions=2)
+
+    for batch_size in (1, 2, 1, 3, 2):
+      module(tf.zeros([batch_size, 1]))
+    # The function for a batch size of 2 was discarded when tracing the one for
+    # a batch size of 3, and traced again.
+    self.assertEqual(module.call_count, 4)
+    stats = module.defun_stats
+    self.assertEqual(
+        (stats.hits, stats.misses, stats.evictions, stats.num_functions),
+        (1, 4, 2, 2))
+
   def testGetVariablesDisabledWhenUsingDefun(self):
     module = MatMulModule()
     module.defun()
@@ -25,8 +25,6 @@ from __future__ import print_function
 import collections
 
 # Dependency imports
-import six
-
 from sonnet.python.modules import base
 from sonnet.python.modules import basic
 from sonnet.python.modules import rnn_core
@@ -54,6 +52,15 @@ def _get_flat_core_sizes(cores):
   return core_sizes_lists
 
 
+def _zero_past_sequence_end(sequence, sequence_length):
+  """Zeroes the entries of a time-major sequence past each sequence's end."""
+  mask = tf.transpose(tf.sequence_mask(
+      sequence_length, maxlen=tf.shape(sequence)[0], dtype=sequence.dtype))
+  mask = tf.reshape(mask, tf.concat(
+      [tf.shape(mask), tf.ones([tf.rank(sequence) - 2], dtype=tf.int32)], 0))
+  return sequence * mask
+
+
 def _get_shape_without_batch_dimension(tensor_nest):
   """Converts Tensor nest to a TensorShape nest, removing batch dimension."""
   def _strip_batch_and_convert_to_shape(tensor):
@@ -107,6 +114,19 @@ class VanillaRNN(rnn_core.RNNCore):
     self._regularizers = util.check_regularizers(
         regularizers, self.POSSIBLE_INITIALIZER_KEYS)
 
+    with self._enter_variable_scope():
+      self._in_to_hidden_linear = basic.Linear(
+          self._hidden_size, name="in_to_hidden",
+          initializers=self._initializers.get("in_to_hidden"),
+          partitioners=self._partitioners.get("in_to_hidden"),
+          regularizers=self._regularizers.get("in_to_hidden"))
+
+      self._hidden_to_hidden_linear = basic.Linear(
+          self._hidden_size, name="hidden_to_hidden",
+          initializers=self._initializers.get("hidden_to_hidden"),
+          partitioners=self._partitioners.get("hidden_to_hidden"),
+          regularizers=self._regularizers.get("hidden_to_hidden"))
+
   def _build(self, input_, prev_state):
     """Connects the VanillaRNN module into the graph.
 
@@ -129,25 +149,55 @@ class VanillaRNN(rnn_core.RNNCore):
         first time, and the inferred size of the inputs does not match previous
         invocations.
     """
-    self._in_to_hidden_linear = basic.Linear(
-        self._hidden_size, name="in_to_hidden",
-        initializers=self._initializers.get("in_to_hidden"),
-        partitioners=self._partitioners.get("in_to_hidden"),
-        regularizers=self._regularizers.get("in_to_hidden"))
-
-    self._hidden_to_hidden_linear = basic.Linear(
-        self._hidden_size, name="hidden_to_hidden",
-        initializers=self._initializers.get("hidden_to_hidden"),
-        partitioners=self._partitioners.get("hidden_to_hidden"),
-        regularizers=self._regularizers.get("hidden_to_hidden"))
-
     in_to_hidden = self._in_to_hidden_linear(input_)
+    return self._projected_step(in_to_hidden, prev_state)
+
+  def _projected_step(self, in_to_hidden, prev_state):
+    """Computes one step given the input contribution to the hidden state."""
     hidden_to_hidden = self._hidden_to_hidden_linear(prev_state)
     output = self._activation(in_to_hidden + hidden_to_hidden)
 
     # For VanillaRNN, the next state of the RNN is the same as the output
     return output, output
 
+  @util.reuse_variables
+  def project_inputs(self, inputs):
+    """Computes the input-to-hidden contribution in a single matmul.
+
+    Args:
+      inputs: Tensor of size `[..., input_size]`, e.g. a time-major sequence
+        of size `[time_steps, batch_size, input_size]`.
+
+    Returns:
+      A Tensor of size `[..., hidden_size]`.
+    """
+    return basic.BatchApply(self._in_to_hidden_linear,
+                            n_dims=inputs.get_shape().ndims - 1)(inputs)
+
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None):
+    """Runs the VanillaRNN over a whole time-major input sequence.
+
+    The input-to-hidden projection for every time step is computed up front by
+    `project_inputs`, so the recurrence only performs the hidden-to-hidden
+    matmul per step.
+
+    Args:
+      input_sequence: Tensor of size `[time_steps, batch_size, input_size]`.
+      initial_state: Tensor of size `[batch_size, hidden_size]`.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. See `RNNCore.unroll`.
+
+    Returns:
+      A tuple (output_sequence, final_state) where `output_sequence` is a
+      Tensor of size `[time_steps, batch_size, hidden_size]` and `final_state`
+      is a Tensor of size `[batch_size, hidden_size]`.
+    """
+    return rnn_core.dynamic_unroll(
+        self._projected_step, self.project_inputs(input_sequence),
+        initial_state, self.output_size, sequence_length=sequence_length)
+
   @property
   def in_to_hidden_linear(self):
     self._ensure_is_connected()
@@ -369,6 +419,79 @@ class DeepRNN(rnn_core.RNNCore):
     self._last_output_size = _get_shape_without_batch_dimension(output)
     return output, tuple(next_states)
 
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None):
+    """Runs the DeepRNN over a whole time-major input sequence, layer by layer.
+
+    Unlike unrolling the DeepRNN one time step at a time (e.g. with
+    `RNNCore.unroll`), each internal module processes the entire sequence
+    before the next module starts. Cores that provide an `unroll_sequence`
+    method of their own (`snt.LSTM`, `snt.GRU`, `snt.VanillaRNN` and
+    `snt.DeepRNN`) compute the input projection of all time steps, including
+    the skip connections, in a single large matmul, leaving only the
+    recurrent matmuls inside the loop. Other recurrent cores are unrolled with
+    a `tf.while_loop`, and non-recurrent modules are applied to all time steps
+    at once using `snt.BatchApply`.
+
+    The result is the same as unrolling the DeepRNN over time, up to floating
+    point error.
+
+    Args:
+      input_sequence: Tensor or nested tuple of Tensors of size
+        `[time_steps, batch_size, ...]`.
+      initial_state: a tuple with the initial state of each one of the
+        recurrent cores of the `DeepRNN`.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. Outputs past the end of a sequence are zero
+        and the final state of each core is the one at the end of the sequence.
+
+    Returns:
+      A tuple (output_sequence, final_state), where `output_sequence` has the
+      structure of the output of the `DeepRNN` with an extra leading time
+      dimension, and `final_state` is a tuple with the final state of each
+      one of the recurrent cores.
+    """
+    current_input = input_sequence
+    final_states = []
+    outputs = []
+    recurrent_idx = 0
+    concatenate = lambda *args: tf.concat(args, axis=-1)
+    for i, core in enumerate(self._cores):
+      if self._skip_connections and i > 0:
+        current_input = nest.map_structure(
+            concatenate, input_sequence, current_input)
+
+      if self._is_recurrent_list[i]:
+        core_initial_state = initial_state[recurrent_idx]
+        if hasattr(core, "unroll_sequence"):
+          current_input, final_state = core.unroll_sequence(
+              current_input, core_initial_state,
+              sequence_length=sequence_length)
+        else:
+          current_input, final_state = rnn_core.dynamic_unroll(
+              core, current_input, core_initial_state, core.output_size,
+              sequence_length=sequence_length)
+        final_states.append(final_state)
+        recurrent_idx += 1
+      else:
+        current_input = basic.BatchApply(core)(current_input)
+
+      if self._skip_connections:
+        outputs.append(current_input)
+
+    if self._skip_connections and self._concat_final_output_if_skip:
+      output = nest.map_structure(concatenate, *outputs)
+    else:
+      output = current_input
+
+    if sequence_length is not None and not all(self._is_recurrent_list):
+      # Non-recurrent modules may produce non-zero outputs from the padding.
+      output = nest.map_structure(
+          lambda x: _zero_past_sequence_end(x, sequence_length), output)
+
+    return output, tuple(final_states)
+
   def initial_state(self, batch_size, dtype=tf.float32, trainable=False,
                     trainable_initializers=None, trainable_regularizers=None,
                     name=None):
@@ -555,18 +678,40 @@ class BidirectionalRNN(base.AbstractModule):
   the full input sequence in order to produce a full sequence of outputs and
   states concatenated along the feature dimension among the forward and
   backward cores.
+
+  The backward core processes each sequence from its last step to its first
+  one, and its outputs (and states) are returned in the order they were
+  computed, i.e. reversed in time.
+
+  #### Dynamic unrolling
+
+  With `unroll_mode="dynamic"` each direction is unrolled in its own
+  `tf.while_loop` (see `RNNCore.unroll`). The two loops do not depend on each
+  other, so TensorFlow can run them concurrently, and the size of the graph
+  does not depend on the length of the sequence. When a `sequence_length` is
+  passed at connection time, each sequence is reversed with
+  `tf.reverse_sequence` before the backward pass so that padding is never fed
+  to the backward core, and both loops stop after the longest sequence.
   """
 
-  def __init__(self, forward_core, backward_core, name="bidir_rnn"):
+  def __init__(self, forward_core, backward_core, unroll_mode="static",
+               return_state_sequence=True, name="bidir_rnn"):
     """Construct a Bidirectional RNN core.
 
     Args:
       forward_core: callable RNNCore module that computes forward states.
       backward_core: callable RNNCore module that computes backward states.
+      unroll_mode: Either `"static"` (the default), which adds every time step
+        to the graph, or `"dynamic"`, which unrolls each direction with a
+        `tf.while_loop`.
+      return_state_sequence: Boolean that indicates whether the states of every
+        time step are returned. If `False`, only the final states of the cores
+        are returned, which avoids storing the per-step states.
       name: name of the module.
 
     Raises:
       ValueError: if not all the modules are recurrent.
+      ValueError: if `unroll_mode` is not `"static"` or `"dynamic"`.
     """
     super(BidirectionalRNN, self).__init__(name=name)
     self._forward_core = forward_core
@@ -579,14 +724,50 @@ class BidirectionalRNN(base.AbstractModule):
     if not(_is_recurrent(forward_core) and _is_recurrent(backward_core)):
       raise ValueError("Forward and backward cores must both be instances of"
                        "RNNCore.")
+    if unroll_mode not in rnn_core.UNROLL_MODES:
+      raise ValueError("Invalid unroll_mode '{}', must be one of {}.".format(
+          unroll_mode, rnn_core.UNROLL_MODES))
+    self._unroll_mode = unroll_mode
+    self._return_state_sequence = return_state_sequence
+
+  def _unroll(self, core, input_sequence, initial_state, sequence_length):
+    """Unrolls `core`, returning its outputs and (final or all) states."""
+    if self._return_state_sequence:
+      def step(input_, prev_state):
+        output, next_state = core(input_, prev_state)
+        return (output, next_state), next_state
+      output_size = (core.output_size, core.state_size)
+      output_dtype = nest.flatten(initial_state)[0].dtype
+      dtype = (nest.map_structure(lambda _: output_dtype, core.output_size),
+               nest.map_structure(lambda state: state.dtype, initial_state))
+    else:
+      step = core
+      output_size = core.output_size
+      dtype = None
+
+    if self._unroll_mode == rnn_core.UNROLL_STATIC:
+      output_sequence, final_state = rnn_core.static_unroll(
+          step, input_sequence, initial_state, sequence_length=sequence_length)
+    else:
+      output_sequence, final_state = rnn_core.dynamic_unroll(
+          step, input_sequence, initial_state, output_size,
+          sequence_length=sequence_length, dtype=dtype)
 
-  def _build(self, input_sequence, state):
+    if self._return_state_sequence:
+      return output_sequence
+    return output_sequence, final_state
+
+  def _build(self, input_sequence, state, sequence_length=None):
     """Connects the BidirectionalRNN module into the graph.
 
     Args:
       input_sequence: tensor (time, batch, [feature_1, ..]). It must be
           time_major.
       state: tuple of states for the forward and backward cores.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+          each sequence in the batch. Outputs (and states) past the end of a
+          sequence are zero, and the final states are those at the end of each
+          sequence.
 
     Returns:
       A dict with forward/backard states and output sequences:
@@ -598,53 +779,43 @@ class BidirectionalRNN(base.AbstractModule):
             "forward": ...,
             "backward": ...}
 
+      The states are sequences of per-step states if the module was
+      constructed with `return_state_sequence=True`, and the final states of
+      the cores otherwise.
+
     Raises:
-      ValueError: in case time dimension is not statically known.
+      ValueError: in case the module unrolls statically and the time dimension
+          is not statically known.
     """
-    input_shape = input_sequence.get_shape()
-    if input_shape[0] is None:
-      raise ValueError("Time dimension of input (dim 0) must be statically"
-                       "known.")
-    seq_length = int(input_shape[0])
     forward_state, backward_state = state
 
-    # Lists for the forward backward output and state.
-    output_sequence_f = []
-    output_sequence_b = []
+    if sequence_length is None:
+      reverse = lambda x: tf.reverse(x, axis=[0])
+    else:
+      reverse = lambda x: tf.reverse_sequence(  # pylint: disable=g-long-lambda
+          x, sequence_length, seq_axis=0, batch_axis=1)
 
     # Forward pass over the sequence.
     with tf.name_scope("forward_rnn"):
-      core_state = forward_state
-      for i in six.moves.range(seq_length):
-        core_output, core_state = self._forward_core(
-            input_sequence[i, :,], core_state)
-
-        output_sequence_f.append((core_output, core_state))
-
-      output_sequence_f = nest.map_structure(
-          lambda *vals: tf.stack(vals), *output_sequence_f)
+      output_sequence_f, state_f = self._unroll(
+          self._forward_core, input_sequence, forward_state, sequence_length)
 
     # Backward pass over the sequence.
     with tf.name_scope("backward_rnn"):
-      core_state = backward_state
-      for i in six.moves.range(seq_length - 1, -1, -1):
-        core_output, core_state = self._backward_core(
-            input_sequence[i, :,], core_state)
-
-        output_sequence_b.append((core_output, core_state))
-
-      output_sequence_b = nest.map_structure(
-          lambda *vals: tf.stack(vals), *output_sequence_b)
+      reversed_input_sequence = nest.map_structure(reverse, input_sequence)
+      output_sequence_b, state_b = self._unroll(
+          self._backward_core, reversed_input_sequence, backward_state,
+          sequence_length)
 
     # Compose the full output and state sequeneces.
     return {
         "outputs": {
-            "forward": output_sequence_f[0],
-            "backward": output_sequence_b[0]
+            "forward": output_sequence_f,
+            "backward": output_sequence_b
         },
         "state": {
-            "forward": output_sequence_f[1],
-            "backward": output_sequence_b[1]
+            "forward": state_f,
+            "backward": state_b
         }
     }
 
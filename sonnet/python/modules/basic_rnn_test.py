@@ -465,6 +465,56 @@ class DeepRNNTest(tf.test.TestCase, parameterized.TestCase):
     self.assertAllClose(next_state1_value, manual_next_state1_value)
     self.assertAllClose(next_state2_value, manual_next_state2_value)
 
+  @parameterized.parameters(
+      itertools.product(("lstm", "lstm_layer_norm", "gru", "vanilla_rnn"),
+                        (True, False)))
+  def testUnrollSequence(self, core_type, skip_connections):
+    seq_len, batch_size, in_size, hidden_size = 6, 3, 2, 4
+    def make_core(name):
+      if core_type == "lstm":
+        return snt.LSTM(hidden_size, use_peepholes=True, name=name)
+      elif core_type == "lstm_layer_norm":
+        return snt.LSTM(hidden_size, use_layer_norm=True, name=name)
+      elif core_type == "gru":
+        return snt.GRU(hidden_size, name=name)
+      return snt.VanillaRNN(hidden_size, name=name)
+    deep_rnn = snt.DeepRNN([make_core("core1"), make_core("core2")],
+                           skip_connections=skip_connections)
+    inputs = tf.random_uniform([seq_len, batch_size, in_size])
+    sequence_length = tf.constant([6, 2, 4])
+    initial_state = deep_rnn.initial_state(batch_size)
+
+    # Connect layer by layer first, so that the variables are created outside
+    # of the cores' `_build`.
+    layerwise = deep_rnn.unroll_sequence(
+        inputs, initial_state, sequence_length=sequence_length)
+    num_variables = len(tf.trainable_variables())
+    stepwise = deep_rnn.unroll(
+        inputs, initial_state, sequence_length=sequence_length)
+    self.assertEqual(num_variables, len(tf.trainable_variables()))
+
+    self.evaluate(tf.global_variables_initializer())
+    layerwise, stepwise = self.evaluate((layerwise, stepwise))
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllClose, layerwise, stepwise)
+
+  def testUnrollSequenceNonRecurrent(self):
+    seq_len, batch_size, in_size = 5, 3, 2
+    deep_rnn = snt.DeepRNN([snt.Linear(4), snt.LSTM(4), snt.Linear(3)],
+                           skip_connections=False)
+    inputs = tf.random_uniform([seq_len, batch_size, in_size])
+    sequence_length = tf.constant([5, 1, 3])
+    initial_state = deep_rnn.initial_state(batch_size)
+    layerwise = deep_rnn.unroll_sequence(
+        inputs, initial_state, sequence_length=sequence_length)
+    stepwise = deep_rnn.unroll(
+        inputs, initial_state, sequence_length=sequence_length)
+
+    self.evaluate(tf.global_variables_initializer())
+    layerwise, stepwise = self.evaluate((layerwise, stepwise))
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllClose, layerwise, stepwise)
+
   def testNonRecurrentOnly(self):
     batch_size = 3
     in_size = 2
@@ -724,7 +774,7 @@ class ModelRNNTest(tf.test.TestCase):
 
 
 # @tf.contrib.eager.run_all_tests_in_graph_and_eager_modes
-class BidirectionalRNNTest(tf.test.TestCase):
+class BidirectionalRNNTest(tf.test.TestCase, parameterized.TestCase):
 
   toy_out = collections.namedtuple("toy_out", ("out_one", "out_two"))
 
@@ -791,6 +841,70 @@ class BidirectionalRNNTest(tf.test.TestCase):
     self.assertAllEqual(output["state"]["backward"].hidden.get_shape(),
                         shape_backward)
 
+  def testDynamicMatchesStatic(self):
+    """Test that dynamic unrolling computes the same values as static."""
+    seq = tf.random_uniform([self.seq_len, self.batch_size, self.feature_size])
+    outputs = []
+    for unroll_mode in ("static", "dynamic"):
+      bidir_rnn = snt.BidirectionalRNN(
+          self.forward_core, self.backward_core, unroll_mode=unroll_mode)
+      state = bidir_rnn.initial_state(self.batch_size)
+      outputs.append(bidir_rnn(seq, state))
+
+    self.evaluate(tf.global_variables_initializer())
+    static_output, dynamic_output = self.evaluate(outputs)
+    tf.contrib.framework.nest.map_structure(
+        self.assertAllClose, static_output, dynamic_output)
+
+  @parameterized.parameters("static", "dynamic")
+  def testSequenceLength(self, unroll_mode):
+    """Test final states against running each sequence on its own."""
+    bidir_rnn = snt.BidirectionalRNN(
+        self.forward_core, self.backward_core, unroll_mode=unroll_mode,
+        return_state_sequence=False)
+    seq = tf.random_uniform([self.seq_len, self.batch_size, self.feature_size])
+    sequence_length = tf.constant([8, 1, 5, 3, 8])
+    state = bidir_rnn.initial_state(self.batch_size)
+    output = bidir_rnn(seq, state, sequence_length=sequence_length)
+
+    single_outputs = []
+    for i, length in enumerate([8, 1, 5, 3, 8]):
+      single_outputs.append(bidir_rnn(seq[:length, i:i + 1],
+                                      bidir_rnn.initial_state(1)))
+
+    self.evaluate(tf.global_variables_initializer())
+    output, single_outputs = self.evaluate((output, single_outputs))
+    for i, (length, single) in enumerate(zip([8, 1, 5, 3, 8], single_outputs)):
+      for direction in ("forward", "backward"):
+        tf.contrib.framework.nest.map_structure(
+            lambda x, y: self.assertAllClose(x[i:i + 1], y),  # pylint: disable=cell-var-from-loop
+            output["state"][direction], single["state"][direction])
+      self.assertAllClose(output["outputs"]["backward"][:length, i:i + 1],
+                          single["outputs"]["backward"])
+      self.assertAllEqual(
+          output["outputs"]["backward"][length:, i],
+          np.zeros_like(output["outputs"]["backward"][length:, i]))
+
+  def testDynamicUnknownLength(self):
+    """Test that dynamic unrolling accepts an unknown number of time steps."""
+    bidir_rnn = snt.BidirectionalRNN(
+        self.forward_core, self.backward_core, unroll_mode="dynamic")
+    seq = tf.placeholder(tf.float32, [None, self.batch_size, self.feature_size])
+    state = bidir_rnn.initial_state(self.batch_size)
+    output = bidir_rnn(seq, state)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      output = sess.run(output, feed_dict={seq: np.zeros(
+          [self.seq_len, self.batch_size, self.feature_size])})
+    self.assertEqual(output["outputs"]["backward"].shape,
+                     (self.seq_len, self.batch_size, self.hidden_size_backward))
+
+  def testInvalidUnrollMode(self):
+    with self.assertRaisesRegexp(ValueError, "Invalid unroll_mode"):
+      snt.BidirectionalRNN(self.forward_core, self.backward_core,
+                           unroll_mode="foo")
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -22,10 +22,19 @@ from __future__ import print_function
 import math
 
 # Dependency imports
+import numpy as np
+import six
 from sonnet.python.modules import base
 from sonnet.python.modules import util
 import tensorflow as tf
 
+from tensorflow.python.ops import variables
+
+
+# Optimizers which do not have any slot, so whose state is only the variables.
+_SLOT_FREE_OPTIMIZERS = (tf.train.GradientDescentOptimizer,
+                         tf.train.ProximalGradientDescentOptimizer)
+
 
 def _embedding_dim(vocab_size):
   """Calculate a reasonable embedding size for a vocabulary.
@@ -44,6 +53,42 @@ def _embedding_dim(vocab_size):
   return int(round(6.0 * math.sqrt(math.sqrt(vocab_size))))
 
 
+def _is_raw_vocab_file(existing_vocab):
+  return (isinstance(existing_vocab, six.string_types) and
+          not existing_vocab.endswith(".npy"))
+
+
+def _map_vocab_file(path, embed_dim=None):
+  """Memory-maps a vocabulary matrix stored in a file.
+
+  Args:
+    path: Path of a `.npy` file, or of a raw file of float32 values.
+    embed_dim: Number of columns of the matrix in a raw file.
+
+  Returns:
+    A read-only, memory-mapped NumPy array.
+
+  Raises:
+    ValueError: if `embed_dim` is not provided for a raw file, or does not
+      divide its number of values, or if the array is not a matrix.
+  """
+  if not _is_raw_vocab_file(path):
+    vocab = np.load(path, mmap_mode="r")
+  else:
+    if embed_dim is None:
+      raise ValueError("embed_dim must be provided with a raw float32 "
+                       "existing_vocab file.")
+    vocab = np.memmap(path, dtype=np.float32, mode="r")
+    if vocab.size % embed_dim:
+      raise ValueError("The {} values of '{}' are not a multiple of "
+                       "embed_dim={}.".format(vocab.size, path, embed_dim))
+    vocab = vocab.reshape([-1, embed_dim])
+  if vocab.ndim != 2:
+    raise ValueError("existing_vocab must be a matrix, got shape {}.".format(
+        vocab.shape))
+  return vocab
+
+
 class Embed(base.AbstractModule):
   """Module for embedding tokens in a low-dimensional space."""
 
@@ -60,7 +105,8 @@ class Embed(base.AbstractModule):
                regularizers=None,
                trainable=True,
                custom_getter=None,
-               name="embed"):
+               name="embed",
+               deduplicate_ids=False):
     """Constructs an Embed module.
 
     Args:
@@ -73,7 +119,13 @@ class Embed(base.AbstractModule):
         provided as it will be inferred.
       existing_vocab: a [vocab_size, embed_dim] vocabulary matrix. Will be
         converted to a tf.float32 tensor. If provided, neither or vocab_size or
-        embed_dim should be provided as they are inferred.
+        embed_dim should be provided as they are inferred. Alternatively, the
+        path of a `.npy` file or of a raw float32 file (for which `embed_dim`
+        must be provided) holding the matrix. The file is memory-mapped, and
+        only loaded into the embeddings by `load_existing_vocab`, so that the
+        matrix is not stored as a constant of the graph. Looking up the
+        embeddings before they are loaded, or restored from a checkpoint in
+        which they were, raises an `InvalidArgumentError`.
       densify_gradients: if True, we convert the embedding gradient from an
         indexed-slices to a regular tensor before sending it back to the
         parameter server. This avoids excess computation on the parameter
@@ -99,6 +151,11 @@ class Embed(base.AbstractModule):
         correspond to regexes to match variable names. See the `tf.get_variable`
         documentation for information about the custom_getter API.
       name: string. Name for this module.
+      deduplicate_ids: if True, the embeddings of the unique values of `ids`
+        are looked up once and then gathered for every id. The gradient of the
+        embeddings then has one row per unique id, summed over its
+        occurrences, rather than one row per id. Use this option when ids
+        repeat a lot within a batch, e.g. with Zipfian token distributions.
 
     Raises:
       ValueError: if neither one of vocab_size or existing_vocab is provided, or
@@ -109,17 +166,26 @@ class Embed(base.AbstractModule):
     if vocab_size is None and existing_vocab is None:
       raise ValueError("Must provide on of vocab_size or existing_vocab.")
 
+    inferred_args = [vocab_size, initializers, partitioners]
+    if not _is_raw_vocab_file(existing_vocab):
+      inferred_args.append(embed_dim)
     if existing_vocab is not None and not all(
-        x is None for x in [vocab_size, embed_dim, initializers, partitioners]):
+        x is None for x in inferred_args):
       raise ValueError("If existing_vocab is provided, none of vocab_size, "
                        "embedding_dim, initializers, or partitioners is "
                        "needed.")
 
     super(Embed, self).__init__(custom_getter=custom_getter, name=name)
     self._existing_vocab = None
+    self._existing_vocab_file = None
+    self._load_vocab_chunk = None
+    self._mark_existing_vocab_loaded = None
     if existing_vocab is None:
       self._vocab_size = vocab_size
       self._embed_dim = embed_dim or _embedding_dim(self._vocab_size)
+    elif isinstance(existing_vocab, six.string_types):
+      self._existing_vocab_file = _map_vocab_file(existing_vocab, embed_dim)
+      self._vocab_size, self._embed_dim = self._existing_vocab_file.shape
     else:
       self._existing_vocab = tf.convert_to_tensor(
           existing_vocab, dtype=tf.float32)
@@ -135,6 +201,7 @@ class Embed(base.AbstractModule):
         regularizers, self.POSSIBLE_INITIALIZER_KEYS)
     self._trainable = trainable
     self._densify_gradients = densify_gradients
+    self._deduplicate_ids = deduplicate_ids
 
   def _build(self, ids):
     """Lookup embeddings.
@@ -149,7 +216,40 @@ class Embed(base.AbstractModule):
       Tensor of tf.shape(ids) + [embedding_dim] and dtype float32.
     """
     # Construct embeddings.
-    if self._existing_vocab is None:
+    if self._existing_vocab_file is not None:
+      self._embeddings = tf.get_variable(
+          "embeddings",
+          shape=[self._vocab_size, self._embed_dim],
+          dtype=tf.float32,
+          initializer=tf.zeros_initializer(),
+          regularizer=self._regularizers.get(self.EMBEDDINGS, None),
+          trainable=self._trainable)
+      if self._load_vocab_chunk is None:
+        with tf.name_scope("load_existing_vocab"):
+          self._vocab_offset = tf.placeholder(tf.int32, [], name="offset")
+          self._vocab_chunk = tf.placeholder(
+              tf.float32, [None, self._embed_dim], name="chunk")
+          chunk_end = self._vocab_offset + tf.shape(self._vocab_chunk)[0]
+          self._load_vocab_chunk = tf.group(self._embeddings[
+              self._vocab_offset:chunk_end].assign(self._vocab_chunk))
+      # Saved along with the embeddings, so that restoring them from a
+      # checkpoint also marks them as loaded.
+      self._existing_vocab_loaded = tf.get_variable(
+          "existing_vocab_loaded",
+          shape=[],
+          dtype=tf.bool,
+          initializer=tf.zeros_initializer(),
+          trainable=False)
+      if self._mark_existing_vocab_loaded is None:
+        self._mark_existing_vocab_loaded = tf.assign(
+            self._existing_vocab_loaded, True)
+      assert_loaded = tf.Assert(
+          self._existing_vocab_loaded,
+          ["The embeddings of {} are read before load_existing_vocab is "
+           "run.".format(self.module_name)])
+      with tf.control_dependencies([assert_loaded]):
+        ids = tf.identity(ids)
+    elif self._existing_vocab is None:
       if self.EMBEDDINGS not in self._initializers:
         self._initializers[self.EMBEDDINGS] = tf.initializers.random_normal()
       self._embeddings = tf.get_variable(
@@ -179,7 +279,54 @@ class Embed(base.AbstractModule):
       embeddings = self._embeddings
 
     # Lookup embeddings
-    return tf.nn.embedding_lookup(embeddings, ids, name="embedding_lookup")
+    if not self._deduplicate_ids:
+      return tf.nn.embedding_lookup(embeddings, ids, name="embedding_lookup")
+
+    # Only the unique rows are gathered from the (partitions of the)
+    # embeddings. The gradient of the second, cheap gather is segment-summed
+    # into the gradient of the unique rows.
+    with tf.name_scope("embedding_lookup"):
+      ids = tf.convert_to_tensor(ids)
+      unique_ids, unique_idx = tf.unique(tf.reshape(ids, [-1]))
+      unique_embeddings = tf.nn.embedding_lookup(embeddings, unique_ids)
+      outputs = tf.gather(unique_embeddings, unique_idx)
+      outputs = tf.reshape(
+          outputs, tf.concat([tf.shape(ids), [self._embed_dim]], axis=0))
+      outputs.set_shape(ids.get_shape().concatenate(self._embed_dim))
+    return outputs
+
+  def load_existing_vocab(self, session, chunk_bytes=64 * 1024 * 1024):
+    """Loads the vocabulary file into the embeddings, in chunks of rows.
+
+    Only one chunk of the memory-mapped file is copied in host memory at a
+    time, e.g. after the variables are initialized, or from the `init_fn` of a
+    `tf.train.Scaffold`:
+
+    ```python
+    scaffold = tf.train.Scaffold(
+        init_fn=lambda _, sess: embed.load_existing_vocab(sess))
+    ```
+
+    Args:
+      session: A `tf.Session` in which the embeddings are initialized.
+      chunk_bytes: Maximum number of bytes of the rows loaded at once.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+      ValueError: If the module was not constructed with a vocabulary file.
+    """
+    self._ensure_is_connected()
+    if self._existing_vocab_file is None:
+      raise ValueError("The module was not constructed with an existing_vocab "
+                       "file.")
+    chunk_rows = max(1, chunk_bytes // (4 * self._embed_dim))
+    for offset in range(0, self._vocab_size, chunk_rows):
+      chunk = self._existing_vocab_file[offset:offset + chunk_rows]
+      session.run(self._load_vocab_chunk, feed_dict={
+          self._vocab_offset: offset,
+          self._vocab_chunk: np.asarray(chunk, dtype=np.float32)})
+    session.run(self._mark_existing_vocab_loaded)
 
   @property
   def vocab_size(self):
@@ -205,3 +352,404 @@ class Embed(base.AbstractModule):
     """
     self._ensure_is_connected()
     return self._embeddings
+
+
+def _partitions(embeddings):
+  """Returns the list of variables of a, possibly partitioned, variable."""
+  if isinstance(embeddings, variables.PartitionedVariable):
+    return list(embeddings)
+  return [embeddings]
+
+
+def _scatter_update_rows(partitions, ids, updates,
+                         scatter_fn=tf.scatter_update):
+  """Updates rows of embeddings looked up by `tf.nn.embedding_lookup`.
+
+  Args:
+    partitions: List of the variables of the embeddings, addressed with the
+      default "mod" partition strategy.
+    ids: 1D Tensor of unique int64 ids.
+    updates: Tensor of the new rows of `ids`.
+    scatter_fn: Op applying the updates to the rows of a variable, e.g.
+      `tf.scatter_update` or `tf.scatter_add`.
+
+  Returns:
+    An op updating the rows.
+  """
+  num_partitions = len(partitions)
+  if num_partitions == 1:
+    return scatter_fn(partitions[0], ids, updates)
+  partition_assignments = tf.to_int32(ids % num_partitions)
+  partition_ids = tf.dynamic_partition(
+      ids // num_partitions, partition_assignments, num_partitions)
+  partition_updates = tf.dynamic_partition(
+      updates, partition_assignments, num_partitions)
+  return tf.group(*[
+      scatter_fn(partition, partition_ids[i], partition_updates[i])
+      for i, partition in enumerate(partitions)])
+
+
+def _top_k_ids(partitions, k):
+  """Returns the ids of the `k` largest values of a partitioned vector.
+
+  The top `k` values of each partition are found on its device, and only these
+  candidates are compared across partitions. Ties are broken by the lowest id.
+
+  Args:
+    partitions: List of the 1D variables of the vector, addressed with the
+      default "mod" partition strategy.
+    k: int. Number of ids to return.
+
+  Returns:
+    A 1D int64 Tensor of the ids of the `k` largest values, in decreasing
+    order of their values.
+  """
+  num_partitions = len(partitions)
+  if num_partitions == 1:
+    return tf.to_int64(tf.nn.top_k(partitions[0], k=k).indices)
+  candidate_values = []
+  candidate_ids = []
+  for i, partition in enumerate(partitions):
+    with tf.colocate_with(partition):
+      values, indices = tf.nn.top_k(
+          partition, k=min(k, partition.get_shape()[0].value))
+    candidate_values.append(values)
+    candidate_ids.append(tf.to_int64(indices) * num_partitions + i)
+  candidate_values = tf.concat(candidate_values, axis=0)
+  candidate_ids = tf.concat(candidate_ids, axis=0)
+  # top_k breaks ties by the lowest index, so sort the candidates by id.
+  num_candidates = candidate_ids.get_shape()[0].value
+  _, order = tf.nn.top_k(-candidate_ids, k=num_candidates)
+  _, top = tf.nn.top_k(tf.gather(candidate_values, order), k=k)
+  return tf.gather(tf.gather(candidate_ids, order), top)
+
+
+class CachedEmbed(base.AbstractModule):
+  """Embed module caching the rows of the most frequent ids in a dense table.
+
+  The embeddings of the `num_hot_ids` most frequent ids are stored in a small,
+  unpartitioned "hot" table, and only the other ids are looked up in the
+  "cold" embeddings of an `Embed` module, which are typically partitioned:
+
+  ```python
+  embed = snt.CachedEmbed(
+      vocab_size=10000000, embed_dim=64, num_hot_ids=10000,
+      partitioners={"embeddings": tf.fixed_size_partitioner(16)})
+  embeddings = embed(ids)
+  rerank = embed.rerank()  # e.g. run every 1000 steps.
+  ```
+
+  The frequencies of the ids are counted while training, and `rerank` moves
+  the rows of the ids which became the most frequent to the hot table, and
+  the others back to the cold embeddings. Initially, the hot ids are
+  `[0, num_hot_ids)`, e.g. the most frequent ids of a vocabulary sorted by
+  frequency.
+
+  Optimizers keep per-row state in slot variables, e.g. the accumulators of
+  `tf.train.AdagradOptimizer` or the moments of `tf.train.AdamOptimizer`.
+  When training with such an optimizer, pass it to `rerank` so that the rows
+  of its slots move along with the rows of the embeddings, which must be done
+  after the optimizer has created its slots, e.g. by `minimize`. Otherwise,
+  the migrated rows continue with the state of other ids.
+
+  The frequencies of the ids and the map of the ids to the rows of the hot
+  table have one entry per id, and are partitioned like the cold embeddings so
+  that neither the lookups nor the counting of the ids is served by a single
+  device.
+
+  The rows of the cold embeddings of the hot ids are unused. `rerank` sets
+  them, and the rows of their slots, to zero, so that e.g. an L1 or L2
+  regularizer of the cold embeddings does not act on stale copies of the hot
+  rows. This is not the case of the initial hot ids until the first `rerank`.
+  """
+
+  EMBEDDINGS = "embeddings"
+  POSSIBLE_INITIALIZER_KEYS = {EMBEDDINGS}
+
+  def __init__(self,
+               vocab_size,
+               embed_dim,
+               num_hot_ids,
+               count_decay=1.0,
+               deduplicate_ids=False,
+               initializers=None,
+               partitioners=None,
+               regularizers=None,
+               trainable=True,
+               update_ops_collection=tf.GraphKeys.UPDATE_OPS,
+               custom_getter=None,
+               name="cached_embed"):
+    """Constructs a CachedEmbed module.
+
+    Args:
+      vocab_size: int. Number of unique tokens to embed.
+      embed_dim: int. Number of dimensions to assign to each embedding.
+      num_hot_ids: int. Number of rows of the hot table.
+      count_decay: float. Factor by which the frequencies of the ids are
+        multiplied after each `rerank`, so that the hot ids follow changes of
+        the distribution of the ids.
+      deduplicate_ids: if True, the cold embeddings are looked up once per
+        unique id. See `Embed`.
+      initializers: Optional dict containing initializers for the embeddings
+        of both tables (with key 'embeddings'). As a default, embeddings are
+        initialized via a normal distribution.
+      partitioners: Optional dict containing partitioners for the cold
+        embeddings, also used for the frequencies of the ids and the map of the
+        ids to the rows of the hot table (with key 'embeddings'). As a default,
+        no partitioners are used.
+      regularizers: Optional dict containing regularizers for the embeddings
+        of both tables (with key 'embeddings'). As a default, no regularizers
+        are used.
+      trainable: if True, the embeddings will be updated during training.
+      update_ops_collection: Name of TensorFlow variable collection to add the
+        ops counting the ids to. If `None`, we instead add the ops as control
+        dependencies of the output of the module. By default,
+        `tf.GraphKeys.UPDATE_OPS`.
+      custom_getter: Callable or dictionary of callables to use as
+        custom getters inside the module.
+      name: string. Name for this module.
+
+    Raises:
+      ValueError: if `num_hot_ids` is not in `[1, vocab_size]`.
+    """
+    super(CachedEmbed, self).__init__(custom_getter=custom_getter, name=name)
+    if not 0 < num_hot_ids <= vocab_size:
+      raise ValueError("num_hot_ids must be in [1, {}], got {}.".format(
+          vocab_size, num_hot_ids))
+    self._vocab_size = vocab_size
+    self._embed_dim = embed_dim
+    self._num_hot_ids = num_hot_ids
+    self._count_decay = count_decay
+    self._initializers = util.check_initializers(
+        initializers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._partitioners = util.check_partitioners(
+        partitioners, self.POSSIBLE_INITIALIZER_KEYS)
+    self._regularizers = util.check_regularizers(
+        regularizers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._trainable = trainable
+    self._update_ops_collection = update_ops_collection
+
+    with self._enter_variable_scope():
+      self._cold_embed = Embed(
+          vocab_size=vocab_size,
+          embed_dim=embed_dim,
+          deduplicate_ids=deduplicate_ids,
+          initializers=dict(self._initializers),
+          partitioners=partitioners,
+          regularizers=regularizers,
+          trainable=trainable,
+          name="cold_embed")
+
+  def _build(self, ids, is_training=True):
+    """Lookup embeddings.
+
+    Args:
+      ids: Tensor of dtype int64.
+      is_training: Python boolean, whether to count the ids and the lookups
+        of the hot table.
+
+    Returns:
+      Tensor of tf.shape(ids) + [embed_dim] and dtype float32.
+    """
+    self._hot_embeddings = tf.get_variable(
+        "hot_embeddings",
+        shape=[self._num_hot_ids, self._embed_dim],
+        dtype=tf.float32,
+        initializer=self._initializers.get(
+            self.EMBEDDINGS, tf.initializers.random_normal()),
+        regularizer=self._regularizers.get(self.EMBEDDINGS, None),
+        trainable=self._trainable)
+    self._hot_ids = tf.get_variable(
+        "hot_ids",
+        dtype=tf.int64,
+        initializer=tf.range(self._num_hot_ids, dtype=tf.int64),
+        trainable=False)
+    # The entry of an id is 0 until the first `rerank`, meaning that the ids
+    # `[0, num_hot_ids)` are in the rows of the same index of the hot table,
+    # and then -1 if the id is cold and the row of the hot table plus one
+    # otherwise. Initializing the entries to zero does not depend on how they
+    # are partitioned.
+    self._hot_slots = tf.get_variable(
+        "hot_slots",
+        shape=[self._vocab_size],
+        dtype=tf.int32,
+        initializer=tf.zeros_initializer(),
+        partitioner=self._partitioners.get(self.EMBEDDINGS, None),
+        trainable=False)
+    self._id_counts = tf.get_variable(
+        "id_counts",
+        shape=[self._vocab_size],
+        dtype=tf.float32,
+        initializer=tf.zeros_initializer(),
+        partitioner=self._partitioners.get(self.EMBEDDINGS, None),
+        trainable=False)
+    self._num_hits = tf.get_variable(
+        "num_hits", shape=[], dtype=tf.int64,
+        initializer=tf.zeros_initializer(), trainable=False)
+    self._num_lookups = tf.get_variable(
+        "num_lookups", shape=[], dtype=tf.int64,
+        initializer=tf.zeros_initializer(), trainable=False)
+
+    ids = tf.convert_to_tensor(ids)
+    flat_ids = tf.to_int64(tf.reshape(ids, [-1]))
+    slots = tf.nn.embedding_lookup(self._hot_slots, flat_ids)
+    initial_slots = tf.where(flat_ids < self._num_hot_ids,
+                             tf.to_int32(flat_ids), -tf.ones_like(slots))
+    slots = tf.where(tf.equal(slots, 0), initial_slots, slots - 1)
+    is_hot = tf.to_int32(slots >= 0)
+    cold_ids, _ = tf.dynamic_partition(flat_ids, is_hot, 2)
+    _, hot_slots = tf.dynamic_partition(slots, is_hot, 2)
+    positions = tf.dynamic_partition(tf.range(tf.size(flat_ids)), is_hot, 2)
+    cold_embeddings = self._cold_embed(cold_ids)
+    hot_embeddings = tf.gather(self._hot_embeddings, hot_slots)
+    outputs = tf.dynamic_stitch(positions, [cold_embeddings, hot_embeddings])
+    outputs = tf.reshape(
+        outputs, tf.concat([tf.shape(ids), [self._embed_dim]], axis=0))
+    outputs.set_shape(ids.get_shape().concatenate(self._embed_dim))
+
+    if is_training:
+      unique_ids, _, unique_counts = tf.unique_with_counts(flat_ids)
+      update_ops = [
+          _scatter_update_rows(_partitions(self._id_counts), unique_ids,
+                               tf.to_float(unique_counts),
+                               scatter_fn=tf.scatter_add),
+          tf.assign_add(self._num_hits, tf.to_int64(tf.reduce_sum(is_hot))),
+          tf.assign_add(self._num_lookups, tf.to_int64(tf.size(flat_ids))),
+      ]
+      if self._update_ops_collection:
+        for update_op in update_ops:
+          tf.add_to_collection(self._update_ops_collection, update_op)
+      else:
+        with tf.control_dependencies(update_ops):
+          outputs = tf.identity(outputs)
+
+    return outputs
+
+  def _get_slot_tables(self, optimizer, slot_name):
+    """Returns the (cold partitions, hot table) of a slot of `optimizer`."""
+    cold_slots = [optimizer.get_slot(partition, slot_name)
+                  for partition in _partitions(self._cold_embed.embeddings)]
+    hot_slot = optimizer.get_slot(self._hot_embeddings, slot_name)
+    if hot_slot is None or any(slot is None for slot in cold_slots):
+      raise ValueError(
+          "The optimizer has no '{}' slot for the embeddings of {}. Call "
+          "rerank after the optimizer is applied to them, e.g. by "
+          "minimize.".format(slot_name, self.module_name))
+    return cold_slots, hot_slot
+
+  @util.reuse_variables
+  def rerank(self, optimizer=None):
+    """Moves the rows of the most frequent ids to the hot table.
+
+    Args:
+      optimizer: Optional `tf.train.Optimizer` training the embeddings, whose
+        slots are moved along with the embeddings.
+
+    Returns:
+      An op writing the rows of the hot table back to the cold embeddings,
+      reading the rows of the `num_hot_ids` most frequent ids from them into
+      the hot table, zeroing these rows of the cold embeddings and updating
+      the id to slot map accordingly. The same is done for the slots of
+      `optimizer`.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+      ValueError: If `optimizer` has not created its slots for the embeddings.
+    """
+    self._ensure_is_connected()
+    # Pairs of the (cold partitions, hot table) of the embeddings and slots.
+    tables = [(_partitions(self._cold_embed.embeddings), self._hot_embeddings)]
+    if optimizer is not None:
+      slot_names = optimizer.get_slot_names()
+      # The slots of an optimizer only exist once it is applied.
+      if not slot_names and not isinstance(optimizer, _SLOT_FREE_OPTIMIZERS):
+        raise ValueError(
+            "The optimizer has not created its slots yet. Call rerank after "
+            "the optimizer is applied to the embeddings of {}, e.g. by "
+            "minimize.".format(self.module_name))
+      for slot_name in sorted(slot_names):
+        tables.append(self._get_slot_tables(optimizer, slot_name))
+    hot_slot_partitions = _partitions(self._hot_slots)
+    id_count_partitions = _partitions(self._id_counts)
+    new_hot_ids = _top_k_ids(id_count_partitions, self._num_hot_ids)
+
+    write_backs = [
+        _scatter_update_rows(cold_partitions, self._hot_ids, tf.identity(hot))
+        for cold_partitions, hot in tables]
+    with tf.control_dependencies(write_backs):
+      free_slots = _scatter_update_rows(
+          hot_slot_partitions, self._hot_ids,
+          -tf.ones([self._num_hot_ids], dtype=tf.int32))
+      new_hot_rows = [tf.nn.embedding_lookup(cold_partitions, new_hot_ids)
+                      for cold_partitions, _ in tables]
+    with tf.control_dependencies([free_slots] + new_hot_rows):
+      update_ops = [
+          _scatter_update_rows(hot_slot_partitions, new_hot_ids,
+                               tf.range(1, self._num_hot_ids + 1)),
+          tf.assign(self._hot_ids, new_hot_ids),
+      ]
+      for (cold_partitions, hot), rows in zip(tables, new_hot_rows):
+        update_ops.append(tf.assign(hot, rows))
+        update_ops.append(_scatter_update_rows(
+            cold_partitions, new_hot_ids, tf.zeros_like(rows)))
+    if self._count_decay != 1.0:
+      with tf.control_dependencies([new_hot_ids]):
+        update_ops.extend(
+            tf.assign(partition, partition * self._count_decay)
+            for partition in id_count_partitions)
+    return tf.group(*update_ops)
+
+  @property
+  def vocab_size(self):
+    """Size of input vocabulary."""
+    return self._vocab_size
+
+  @property
+  def embed_dim(self):
+    """Size of embedding vectors."""
+    return self._embed_dim
+
+  @property
+  def num_hot_ids(self):
+    """Number of rows of the hot table."""
+    return self._num_hot_ids
+
+  @property
+  def cold_embed(self):
+    """The `Embed` module of the ids which are not in the hot table."""
+    return self._cold_embed
+
+  @property
+  def hot_embeddings(self):
+    """Returns the Variable containing the embeddings of the hot ids.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._hot_embeddings
+
+  @property
+  def hot_ids(self):
+    """Returns the Variable containing the ids of the rows of the hot table.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._hot_ids
+
+  @property
+  def hit_rate(self):
+    """Returns the fraction of the ids counted so far found in the hot table.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return (tf.to_float(self._num_hits) /
+            tf.to_float(tf.maximum(self._num_lookups, 1)))
@@ -0,0 +1,207 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for embedding modules on Zipfian distributed ids.
+
+Run with:
+
+  python embed_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+VOCAB_SIZE = 1000000
+EMBED_DIM = 64
+BATCH_SIZE = 128
+SEQUENCE_LENGTH = 64
+NUM_PARTITIONS = 4
+ZIPF_EXPONENT = 1.2
+NUM_RUNS = 10
+NUM_BUCKETS = 10000
+NUM_HOT_IDS = 10000
+
+
+def _zipf_ids(shape, seed=0):
+  """Returns ids in [0, VOCAB_SIZE) following a Zipf distribution."""
+  random_state = np.random.RandomState(seed)
+  ids = random_state.zipf(ZIPF_EXPONENT, size=shape) - 1
+  return np.minimum(ids, VOCAB_SIZE - 1).astype(np.int64)
+
+
+class EmbedBenchmark(tf.test.Benchmark):
+  """Measures the lookup time and gradient size of `snt.Embed`."""
+
+  def _benchmark_lookup(self, deduplicate_ids, num_partitions):
+    ids_value = _zipf_ids([BATCH_SIZE, SEQUENCE_LENGTH])
+    with tf.Graph().as_default():
+      partitioners = None
+      if num_partitions > 1:
+        partitioners = {
+            "embeddings": tf.fixed_size_partitioner(num_partitions)}
+      embed = snt.Embed(VOCAB_SIZE, EMBED_DIM, partitioners=partitioners,
+                        deduplicate_ids=deduplicate_ids)
+      ids = tf.placeholder(tf.int64, ids_value.shape)
+      outputs = embed(ids)
+      variables = embed.get_variables()
+      gradients = tf.gradients(tf.reduce_sum(outputs), variables)
+      feed_dict = {ids: ids_value}
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        gradients_value = sess.run(gradients, feed_dict=feed_dict)
+
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(outputs.op, feed_dict=feed_dict)
+        lookup_time = (time.time() - start_time) / NUM_RUNS
+
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(gradients, feed_dict=feed_dict)
+        gradient_time = (time.time() - start_time) / NUM_RUNS
+
+    gradient_bytes = sum(g.values.nbytes + g.indices.nbytes
+                         for g in gradients_value)
+    self.report_benchmark(
+        name="embed_{}_{}_partitions".format(
+            "deduplicated" if deduplicate_ids else "raw", num_partitions),
+        iters=NUM_RUNS,
+        wall_time=lookup_time,
+        extras={"lookup_time": lookup_time,
+                "gradient_time": gradient_time,
+                "gradient_bytes": gradient_bytes,
+                "unique_ids_fraction": (
+                    len(np.unique(ids_value)) / ids_value.size)})
+
+  def benchmarkLookup(self):
+    for num_partitions in (1, NUM_PARTITIONS):
+      for deduplicate_ids in (False, True):
+        self._benchmark_lookup(deduplicate_ids, num_partitions)
+
+
+class CompositionalEmbedBenchmark(tf.test.Benchmark):
+  """Compares the lookup throughput and size of compositional embeddings."""
+
+  def _benchmark_module(self, name, module_fn):
+    ids_value = _zipf_ids([BATCH_SIZE, SEQUENCE_LENGTH])
+    with tf.Graph().as_default():
+      module = module_fn()
+      ids = tf.placeholder(tf.int64, ids_value.shape)
+      outputs = module(ids)
+      variables = module.get_variables()
+      gradients = tf.gradients(tf.reduce_sum(outputs), variables)
+      num_parameters = sum(v.get_shape().num_elements() for v in variables)
+      feed_dict = {ids: ids_value}
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        sess.run([outputs.op, gradients], feed_dict=feed_dict)
+
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(outputs.op, feed_dict=feed_dict)
+        lookup_time = (time.time() - start_time) / NUM_RUNS
+
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(gradients, feed_dict=feed_dict)
+        gradient_time = (time.time() - start_time) / NUM_RUNS
+
+    self.report_benchmark(
+        name=name,
+        iters=NUM_RUNS,
+        wall_time=lookup_time,
+        extras={"ids_per_sec": ids_value.size / lookup_time,
+                "gradient_time": gradient_time,
+                "num_parameters": num_parameters,
+                "compression": VOCAB_SIZE * EMBED_DIM / num_parameters})
+
+  def benchmarkEmbed(self):
+    self._benchmark_module("embed", lambda: snt.Embed(VOCAB_SIZE, EMBED_DIM))
+
+  def benchmarkHashEmbed(self):
+    for combiner in ("sum", "concat"):
+      self._benchmark_module(
+          "hash_embed_" + combiner,
+          lambda: snt.HashEmbed(  # pylint: disable=g-long-lambda
+              NUM_BUCKETS, EMBED_DIM, num_hashes=2, combiner=combiner))
+
+  def benchmarkQuotientRemainderEmbed(self):
+    for combiner in ("mul", "concat"):
+      self._benchmark_module(
+          "quotient_remainder_embed_" + combiner,
+          lambda: snt.QuotientRemainderEmbed(  # pylint: disable=g-long-lambda
+              VOCAB_SIZE, EMBED_DIM, NUM_BUCKETS, combiner=combiner))
+
+
+class CachedEmbedBenchmark(tf.test.Benchmark):
+  """Measures the lookup time and hit rate of a hot-row cache."""
+
+  def _benchmark_lookup(self, name, module_fn):
+    with tf.Graph().as_default():
+      module = module_fn()
+      ids = tf.placeholder(tf.int64, [BATCH_SIZE, SEQUENCE_LENGTH])
+      outputs = module(ids)
+      update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+      rerank = module.rerank() if isinstance(module, snt.CachedEmbed) else None
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Count the ids of a first batch, which makes their rows hot.
+        feed_dict = {ids: _zipf_ids(ids.get_shape().as_list())}
+        sess.run([outputs.op] + update_ops, feed_dict=feed_dict)
+        if rerank is not None:
+          sess.run(rerank)
+
+        start_time = time.time()
+        for i in range(NUM_RUNS):
+          feed_dict = {ids: _zipf_ids(ids.get_shape().as_list(), seed=i + 1)}
+          sess.run([outputs.op] + update_ops, feed_dict=feed_dict)
+        lookup_time = (time.time() - start_time) / NUM_RUNS
+
+        extras = {"lookup_time": lookup_time}
+        if rerank is not None:
+          extras["hit_rate"] = sess.run(module.hit_rate)
+          start_time = time.time()
+          sess.run(rerank)
+          extras["rerank_time"] = time.time() - start_time
+
+    self.report_benchmark(
+        name=name, iters=NUM_RUNS, wall_time=lookup_time, extras=extras)
+
+  def benchmarkLookup(self):
+    partitioners = {"embeddings": tf.fixed_size_partitioner(NUM_PARTITIONS)}
+    self._benchmark_lookup(
+        "partitioned_embed",
+        lambda: snt.Embed(VOCAB_SIZE, EMBED_DIM, partitioners=partitioners))
+    self._benchmark_lookup(
+        "cached_embed",
+        lambda: snt.CachedEmbed(  # pylint: disable=g-long-lambda
+            VOCAB_SIZE, EMBED_DIM, NUM_HOT_IDS, partitioners=partitioners))
+
+
+if __name__ == "__main__":
+  tf.test.main()
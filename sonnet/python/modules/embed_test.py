@@ -19,6 +19,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
 # Dependency imports
 
 from absl.testing import parameterized
@@ -141,6 +143,51 @@ class EmbedTest(parameterized.TestCase, tf.test.TestCase):
       sess.run(tf.global_variables_initializer())
       sess.run(embeddings)
 
+  @parameterized.named_parameters(
+      ("Unpartitioned", None),
+      ("Partitioned", tf.fixed_size_partitioner(3)),
+  )
+  def testDeduplicateIds(self, partitioner):
+    partitioners = {"embeddings": partitioner} if partitioner else None
+    embed_mod = snt.Embed(
+        vocab_size=self._vocab_size,
+        embed_dim=2,
+        partitioners=partitioners,
+        deduplicate_ids=True)
+    ids = tf.convert_to_tensor(self._ids)
+    embeddings = embed_mod(ids)
+    self.assertEqual(embeddings.get_shape().as_list(),
+                     list(self._ids.shape) + [2])
+
+    expected_embeddings = tf.nn.embedding_lookup(embed_mod.embeddings, ids)
+    variables_list = list(embed_mod.embeddings) if partitioner else [
+        embed_mod.embeddings]
+    gradients = tf.gradients(tf.reduce_sum(embeddings), variables_list)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_, expected_embeddings_, gradients_ = sess.run(
+          [embeddings, expected_embeddings, gradients])
+    self.assertAllClose(embeddings_, expected_embeddings_)
+
+    # The sparse gradients have a single row per unique id, whose values are
+    # the number of occurrences of the id.
+    for gradient in gradients_:
+      self.assertLen(np.unique(gradient.indices), len(gradient.indices))
+    self.assertAllClose(sum(g.values.sum(axis=0) for g in gradients_),
+                        [self._ids.size] * 2)
+    if not partitioner:
+      counts = np.bincount(self._ids.flatten())
+      gradient, = gradients_
+      self.assertAllClose(gradient.values,
+                          np.tile(counts[gradient.indices, None], [1, 2]))
+
+  def testPositionalArguments(self):
+    initializers = {"embeddings": tf.zeros_initializer()}
+    embed_mod = snt.Embed(self._vocab_size, self._embed_dim, None, False,
+                          initializers, None, None, True, None, "positional")
+    self.assertEqual(embed_mod.module_name, "positional")
+    embed_mod(tf.convert_to_tensor(self._ids))
+
   def testInvalidRegularizationParameters(self):
     regularizer = tf.contrib.layers.l1_regularizer(scale=0.5)
     with self.assertRaisesRegexp(KeyError, "Invalid regularizer keys.*"):
@@ -195,5 +242,194 @@ class EmbedTest(parameterized.TestCase, tf.test.TestCase):
       self.assertEqual(embed_mod.vocab_size, true_vocab_size)
       self.assertEqual(embed_mod.embed_dim, true_embed_dim)
 
+  @parameterized.named_parameters(
+      ("Npy", "vocab.npy"),
+      ("Raw", "vocab.raw"),
+  )
+  def testExistingVocabFile(self, filename):
+    existing = np.random.randn(1000, 16).astype(np.float32)
+    path = os.path.join(self.get_temp_dir(), filename)
+    if path.endswith(".npy"):
+      np.save(path, existing)
+      embed_mod = snt.Embed(existing_vocab=path)
+    else:
+      existing.tofile(path)
+      embed_mod = snt.Embed(existing_vocab=path, embed_dim=16)
+    self.assertEqual(embed_mod.vocab_size, 1000)
+    self.assertEqual(embed_mod.embed_dim, 16)
+
+    ids = np.array([0, 999, 42])
+    embeddings = embed_mod(tf.constant(ids))
+    # The vocabulary is not a constant of the graph.
+    graph_def_bytes = tf.get_default_graph().as_graph_def().ByteSize()
+    self.assertLess(graph_def_bytes, existing.nbytes)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      with self.assertRaisesOpError("read before load_existing_vocab"):
+        sess.run(embeddings)
+      # Loads the vocabulary in chunks of 64 rows.
+      embed_mod.load_existing_vocab(sess, chunk_bytes=64 * 16 * 4)
+      self.assertAllClose(sess.run(embed_mod.embeddings), existing)
+      self.assertAllClose(sess.run(embeddings), existing[ids])
+
+  def testExistingVocabFileErrors(self):
+    path = os.path.join(self.get_temp_dir(), "vocab.raw")
+    np.zeros([10], dtype=np.float32).tofile(path)
+    with self.assertRaisesRegexp(ValueError, "embed_dim must be provided"):
+      snt.Embed(existing_vocab=path)
+    with self.assertRaisesRegexp(ValueError, "not a multiple of embed_dim=3"):
+      snt.Embed(existing_vocab=path, embed_dim=3)
+
+    with self.assertRaisesRegexp(ValueError, "not constructed with an"):
+      self._embed_mod(tf.convert_to_tensor(self._ids))
+      self._embed_mod.load_existing_vocab(None)
+
+
+class CachedEmbedTest(parameterized.TestCase, tf.test.TestCase):
+
+  def testLookupAndHitRate(self):
+    embed_mod = snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=3,
+                                update_ops_collection=None)
+    ids = np.array([[0, 5, 1], [9, 0, 2]])
+    embeddings = embed_mod(tf.constant(ids))
+    self.assertEqual(embeddings.get_shape().as_list(), [2, 3, 2])
+
+    cold_embeddings = np.tile(np.arange(10.)[:, None], [1, 2])
+    hot_embeddings = 100 + cold_embeddings[:3]
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run([tf.assign(embed_mod.cold_embed.embeddings, cold_embeddings),
+                tf.assign(embed_mod.hot_embeddings, hot_embeddings)])
+      embeddings_ = sess.run(embeddings)
+      hit_rate = sess.run(embed_mod.hit_rate)
+    # The ids [0, 3) are initially in the hot table.
+    expected_embeddings = np.where(ids[..., None] < 3, 100, 0) + ids[..., None]
+    self.assertAllClose(embeddings_, np.tile(expected_embeddings, [1, 1, 2]))
+    self.assertAllClose(hit_rate, 4 / 6)
+
+  def testUpdateOpsCollection(self):
+    embed_mod = snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=3)
+    embed_mod(tf.constant([1, 2, 3]))
+    self.assertLen(tf.get_collection(tf.GraphKeys.UPDATE_OPS), 3)
+    embed_mod(tf.constant([1, 2, 3]), is_training=False)
+    self.assertLen(tf.get_collection(tf.GraphKeys.UPDATE_OPS), 3)
+
+  def testPartitionedIdState(self):
+    embed_mod = snt.CachedEmbed(
+        vocab_size=10, embed_dim=2, num_hot_ids=2,
+        partitioners={"embeddings": tf.fixed_size_partitioner(3)})
+    embed_mod(tf.constant([1, 2, 3]))
+    # The per-id state is partitioned like the cold embeddings.
+    for name in ("hot_slots", "id_counts"):
+      partitions = [variable for variable in embed_mod.get_all_variables()
+                    if variable.op.name.split("/")[-2] == name]
+      self.assertLen(partitions, 3)
+
+  @parameterized.named_parameters(
+      ("Unpartitioned", None),
+      ("Partitioned", tf.fixed_size_partitioner(3)),
+  )
+  def testRerank(self, partitioner):
+    partitioners = {"embeddings": partitioner} if partitioner else None
+    embed_mod = snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=2,
+                                count_decay=0.5, partitioners=partitioners)
+    embed_mod(tf.constant([7, 7, 7, 8, 8, 1]))
+    update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+    all_embeddings = embed_mod(tf.range(10), is_training=False)
+    rerank = embed_mod.rerank()
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(update_ops)
+      expected_embeddings = sess.run(all_embeddings)
+      sess.run(rerank)
+      # Moving rows between the tables does not change the embeddings.
+      self.assertAllClose(sess.run(all_embeddings), expected_embeddings)
+      self.assertAllEqual(sess.run(embed_mod.hot_ids), [7, 8])
+      self.assertAllClose(sess.run(embed_mod.hot_embeddings),
+                          expected_embeddings[[7, 8]])
+
+      # The hot table is updated by the gradients of the hot ids.
+      loss = tf.reduce_sum(embed_mod(tf.constant([7, 1]), is_training=False))
+      sess.run(tf.train.GradientDescentOptimizer(1.).minimize(loss))
+      self.assertAllClose(sess.run(all_embeddings)[[7, 1]],
+                          expected_embeddings[[7, 1]] - 1)
+
+  @parameterized.named_parameters(
+      ("Unpartitioned", None),
+      ("Partitioned", tf.fixed_size_partitioner(3)),
+  )
+  def testRerankOptimizerSlots(self, partitioner):
+    partitioners = {"embeddings": partitioner} if partitioner else None
+    embed_mod = snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=2,
+                                partitioners=partitioners,
+                                update_ops_collection=None)
+    embeddings = embed_mod(tf.constant([0, 7, 7, 8]))
+    optimizer = tf.train.AdagradOptimizer(0.1)
+    train_op = optimizer.minimize(tf.reduce_sum(embeddings))
+    all_embeddings = embed_mod(tf.range(10), is_training=False)
+    rerank = embed_mod.rerank(optimizer)
+
+    # The accumulators of the ids, in the hot or cold table.
+    cold_partitions = embed_mod.cold_embed.embeddings
+    if partitioner:
+      cold_partitions = list(cold_partitions)
+    else:
+      cold_partitions = [cold_partitions]
+    cold_accumulators = tf.nn.embedding_lookup(
+        [optimizer.get_slot(partition, "accumulator")
+         for partition in cold_partitions], tf.range(10))
+    hot_accumulators = optimizer.get_slot(embed_mod.hot_embeddings,
+                                          "accumulator")
+    def get_accumulators(sess):
+      cold, hot, hot_ids = sess.run(
+          [cold_accumulators, hot_accumulators, embed_mod.hot_ids])
+      cold[hot_ids] = hot
+      return cold
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(train_op)
+      expected_embeddings = sess.run(all_embeddings)
+      expected_accumulators = get_accumulators(sess)
+      # The squared gradients of the ids are accumulated.
+      self.assertAllClose(expected_accumulators[[0, 1, 7, 8]],
+                          [[1.1] * 2, [0.1] * 2, [4.1] * 2, [1.1] * 2])
+
+      sess.run(rerank)
+      # Ties of the counts are broken by the lowest id.
+      self.assertAllEqual(sess.run(embed_mod.hot_ids), [7, 0])
+      self.assertAllClose(sess.run(all_embeddings), expected_embeddings)
+      self.assertAllClose(get_accumulators(sess), expected_accumulators)
+
+      # The cold rows of the hot ids are zeroed.
+      cold_embeddings, cold_accumulators_ = sess.run(
+          [tf.nn.embedding_lookup(embed_mod.cold_embed.embeddings, [7, 0]),
+           tf.gather(cold_accumulators, [7, 0])])
+      self.assertAllClose(cold_embeddings, np.zeros([2, 2]))
+      self.assertAllClose(cold_accumulators_, np.zeros([2, 2]))
+
+  def testRerankOptimizerWithoutSlots(self):
+    embed_mod = snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=2)
+    embed_mod(tf.constant([1, 2]))
+    with self.assertRaisesRegexp(ValueError, "has not created its slots"):
+      embed_mod.rerank(tf.train.AdagradOptimizer(0.1))
+
+    # The optimizer has slots, but not for the embeddings.
+    optimizer = tf.train.AdagradOptimizer(0.1)
+    other = tf.get_variable("other", shape=[2])
+    optimizer.minimize(tf.reduce_sum(other))
+    with self.assertRaisesRegexp(ValueError, "has no 'accumulator' slot"):
+      embed_mod.rerank(optimizer)
+
+    # Optimizers without slots only move the embeddings.
+    embed_mod.rerank(tf.train.GradientDescentOptimizer(0.1))
+
+  def testInvalidNumHotIds(self):
+    with self.assertRaisesRegexp(ValueError, "num_hot_ids must be in"):
+      snt.CachedEmbed(vocab_size=10, embed_dim=2, num_hot_ids=11)
+
+
 if __name__ == "__main__":
   tf.test.main()
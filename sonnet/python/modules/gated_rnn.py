@@ -38,6 +38,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import functools
 
 # Dependency imports
 
@@ -51,6 +52,8 @@ from sonnet.python.modules import rnn_core
 from sonnet.python.modules import util
 import tensorflow as tf
 
+from tensorflow.python.ops import variables
+
 
 LSTMState = collections.namedtuple("LSTMState", ("hidden", "cell"))
 
@@ -230,16 +233,7 @@ class LSTM(rnn_core.RNNCore):
         first time, and the inferred size of the inputs does not match previous
         invocations.
     """
-    prev_hidden, prev_cell = prev_state
-
-    # pylint: disable=invalid-unary-operand-type
-    if self._hidden_clip_value is not None:
-      prev_hidden = tf.clip_by_value(
-          prev_hidden, -self._hidden_clip_value, self._hidden_clip_value)
-    if self._cell_clip_value is not None:
-      prev_cell = tf.clip_by_value(
-          prev_cell, -self._cell_clip_value, self._cell_clip_value)
-    # pylint: enable=invalid-unary-operand-type
+    prev_hidden, prev_cell = self._clip_state(prev_state)
 
     self._create_gate_variables(inputs.get_shape(), inputs.dtype)
 
@@ -251,15 +245,35 @@ class LSTM(rnn_core.RNNCore):
     gates = tf.matmul(inputs_and_hidden, self._w_xh)
 
     if self._use_layer_norm:
-      gates = layer_norm.LayerNorm()(gates)
+      gates = self._gates_layer_norm()(gates)
 
     gates += self._b
 
+    if self._use_peepholes:  # diagonal connections
+      self._create_peephole_variables(inputs.dtype)
+
+    return self._gates_to_state(gates, prev_cell)
+
+  def _clip_state(self, prev_state):
+    """Clips the previous hidden and cell states, if requested."""
+    prev_hidden, prev_cell = prev_state
+
+    # pylint: disable=invalid-unary-operand-type
+    if self._hidden_clip_value is not None:
+      prev_hidden = tf.clip_by_value(
+          prev_hidden, -self._hidden_clip_value, self._hidden_clip_value)
+    if self._cell_clip_value is not None:
+      prev_cell = tf.clip_by_value(
+          prev_cell, -self._cell_clip_value, self._cell_clip_value)
+    # pylint: enable=invalid-unary-operand-type
+    return prev_hidden, prev_cell
+
+  def _gates_to_state(self, gates, prev_cell):
+    """Computes the output and next state from the (biased) gate values."""
     # i = input_gate, j = next_input, f = forget_gate, o = output_gate
     i, j, f, o = tf.split(value=gates, num_or_size_splits=4, axis=1)
 
     if self._use_peepholes:  # diagonal connections
-      self._create_peephole_variables(inputs.dtype)
       f += self._w_f_diag * prev_cell
       i += self._w_i_diag * prev_cell
 
@@ -284,54 +298,132 @@ class LSTM(rnn_core.RNNCore):
     equiv_input_size = self._hidden_state_size + input_shape.dims[1].value
     initializer = basic.create_linear_initializer(equiv_input_size)
 
-    self._w_xh = tf.get_variable(
-        self.W_GATES,
-        shape=[equiv_input_size, 4 * self._hidden_size],
-        dtype=dtype,
-        initializer=self._initializers.get(self.W_GATES, initializer),
-        partitioner=self._partitioners.get(self.W_GATES),
-        regularizer=self._regularizers.get(self.W_GATES))
-    self._b = tf.get_variable(
-        self.B_GATES,
-        shape=[4 * self._hidden_size],
-        dtype=dtype,
-        initializer=self._initializers.get(self.B_GATES, initializer),
-        partitioner=self._partitioners.get(self.B_GATES),
-        regularizer=self._regularizers.get(self.B_GATES))
-    if self._use_projection:
-      w_h_initializer = basic.create_linear_initializer(self._hidden_size)
-      self._w_h_projection = tf.get_variable(
-          self.W_H_PROJECTION,
-          shape=[self._hidden_size, self._hidden_state_size],
+    with _auto_reuse_scope():
+      self._w_xh = tf.get_variable(
+          self.W_GATES,
+          shape=[equiv_input_size, 4 * self._hidden_size],
+          dtype=dtype,
+          initializer=self._initializers.get(self.W_GATES, initializer),
+          partitioner=self._partitioners.get(self.W_GATES),
+          regularizer=self._regularizers.get(self.W_GATES))
+      self._b = tf.get_variable(
+          self.B_GATES,
+          shape=[4 * self._hidden_size],
           dtype=dtype,
-          initializer=self._initializers.get(self.W_H_PROJECTION,
-                                             w_h_initializer),
-          partitioner=self._partitioners.get(self.W_H_PROJECTION),
-          regularizer=self._regularizers.get(self.W_H_PROJECTION))
+          initializer=self._initializers.get(self.B_GATES, initializer),
+          partitioner=self._partitioners.get(self.B_GATES),
+          regularizer=self._regularizers.get(self.B_GATES))
+      if self._use_projection:
+        w_h_initializer = basic.create_linear_initializer(self._hidden_size)
+        self._w_h_projection = tf.get_variable(
+            self.W_H_PROJECTION,
+            shape=[self._hidden_size, self._hidden_state_size],
+            dtype=dtype,
+            initializer=self._initializers.get(self.W_H_PROJECTION,
+                                               w_h_initializer),
+            partitioner=self._partitioners.get(self.W_H_PROJECTION),
+            regularizer=self._regularizers.get(self.W_H_PROJECTION))
 
   def _create_peephole_variables(self, dtype):
     """Initialize the variables used for the peephole connections."""
-    self._w_f_diag = tf.get_variable(
-        self.W_F_DIAG,
-        shape=[self._hidden_size],
-        dtype=dtype,
-        initializer=self._initializers.get(self.W_F_DIAG),
-        partitioner=self._partitioners.get(self.W_F_DIAG),
-        regularizer=self._regularizers.get(self.W_F_DIAG))
-    self._w_i_diag = tf.get_variable(
-        self.W_I_DIAG,
-        shape=[self._hidden_size],
-        dtype=dtype,
-        initializer=self._initializers.get(self.W_I_DIAG),
-        partitioner=self._partitioners.get(self.W_I_DIAG),
-        regularizer=self._regularizers.get(self.W_I_DIAG))
-    self._w_o_diag = tf.get_variable(
-        self.W_O_DIAG,
-        shape=[self._hidden_size],
-        dtype=dtype,
-        initializer=self._initializers.get(self.W_O_DIAG),
-        partitioner=self._partitioners.get(self.W_O_DIAG),
-        regularizer=self._regularizers.get(self.W_O_DIAG))
+    with _auto_reuse_scope():
+      self._w_f_diag = tf.get_variable(
+          self.W_F_DIAG,
+          shape=[self._hidden_size],
+          dtype=dtype,
+          initializer=self._initializers.get(self.W_F_DIAG),
+          partitioner=self._partitioners.get(self.W_F_DIAG),
+          regularizer=self._regularizers.get(self.W_F_DIAG))
+      self._w_i_diag = tf.get_variable(
+          self.W_I_DIAG,
+          shape=[self._hidden_size],
+          dtype=dtype,
+          initializer=self._initializers.get(self.W_I_DIAG),
+          partitioner=self._partitioners.get(self.W_I_DIAG),
+          regularizer=self._regularizers.get(self.W_I_DIAG))
+      self._w_o_diag = tf.get_variable(
+          self.W_O_DIAG,
+          shape=[self._hidden_size],
+          dtype=dtype,
+          initializer=self._initializers.get(self.W_O_DIAG),
+          partitioner=self._partitioners.get(self.W_O_DIAG),
+          regularizer=self._regularizers.get(self.W_O_DIAG))
+
+  def _gates_layer_norm(self):
+    """Returns a `LayerNorm` module sharing variables across connections."""
+    with _auto_reuse_scope():
+      return layer_norm.LayerNorm()
+
+  def _split_gate_weights(self, input_size):
+    """Splits the gate weights into their input and recurrent parts."""
+    return tf.split(self._w_xh, [input_size, self._hidden_state_size], axis=0)
+
+  @util.reuse_variables
+  def project_inputs(self, inputs):
+    """Computes the input contribution to all gates in a single matmul.
+
+    Args:
+      inputs: Tensor of size `[..., input_size]`, e.g. a time-major sequence
+        of size `[time_steps, batch_size, input_size]`.
+
+    Returns:
+      A Tensor of size `[..., 4 * hidden_size]` holding the input projections
+      of all gates. The gate biases are included unless layer normalization is
+      used, in which case they are added after normalizing the gates.
+    """
+    input_size = inputs.get_shape()[-1]
+    self._create_gate_variables(tf.TensorShape([None, input_size]),
+                                inputs.dtype)
+    w_x, _ = self._split_gate_weights(input_size.value)
+    flat_inputs = tf.reshape(inputs, [-1, input_size.value])
+    projected = tf.matmul(flat_inputs, w_x)
+    if not self._use_layer_norm:
+      projected += self._b
+    output_shape = tf.concat(
+        [tf.shape(inputs)[:-1], [4 * self._hidden_size]], axis=0)
+    projected = tf.reshape(projected, output_shape)
+    projected.set_shape(
+        inputs.get_shape()[:-1].concatenate([4 * self._hidden_size]))
+    return projected
+
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None):
+    """Runs the LSTM over a whole time-major input sequence.
+
+    The input projection for every time step is computed up front by
+    `project_inputs`, so the recurrence only multiplies the previous hidden
+    state by the recurrent part of the gate weights.
+
+    Args:
+      input_sequence: Tensor of size `[time_steps, batch_size, input_size]`.
+      initial_state: Tuple (initial_hidden, initial_cell).
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. See `RNNCore.unroll`.
+
+    Returns:
+      A tuple (output_sequence, final_state) where `output_sequence` is a
+      Tensor of size `[time_steps, batch_size, hidden_size]` and `final_state`
+      is a `LSTMState` namedtuple.
+    """
+    projected_inputs = self.project_inputs(input_sequence)
+    input_size = input_sequence.get_shape()[-1].value
+    _, w_h = self._split_gate_weights(input_size)
+    if self._use_peepholes:
+      self._create_peephole_variables(input_sequence.dtype)
+    if self._use_layer_norm:
+      gates_layer_norm = self._gates_layer_norm()
+
+    def step(projected_inputs_t, prev_state):
+      prev_hidden, prev_cell = self._clip_state(prev_state)
+      gates = projected_inputs_t + tf.matmul(prev_hidden, w_h)
+      if self._use_layer_norm:
+        gates = gates_layer_norm(gates) + self._b
+      return self._gates_to_state(gates, prev_cell)
+
+    return rnn_core.dynamic_unroll(
+        step, projected_inputs, LSTMState(*initial_state), self.output_size,
+        sequence_length=sequence_length)
 
   @property
   def state_size(self):
@@ -605,6 +697,14 @@ class BatchNormLSTM(rnn_core.RNNCore):
   may achieve better performance on some tasks when testing with cached
   statistics.
 
+  ##### Batch normalization: folding for inference
+
+  With the moving statistics, batch norm (h) and (x) are affine transforms of
+  the gate contributions, so they can be folded into the gate weights and
+  biases. `fold_batch_norm` returns a plain `LSTM` computing the same outputs
+  as this core connected with `is_training=False` and `test_local_stats=False`,
+  with a single matmul per step and no batch norm.
+
   Attributes:
     state_size: Tuple of `tf.TensorShape`s indicating the size of state tensors.
     output_size: `tf.TensorShape` indicating the size of the core output.
@@ -766,6 +866,83 @@ class BatchNormLSTM(rnn_core.RNNCore):
     return BatchNormLSTM.CoreWithExtraBuildArgs(
         self, is_training=is_training, test_local_stats=test_local_stats)
 
+  def fold_batch_norm(self, name=None):
+    """Returns an `LSTM` with the moving batch norm statistics folded in.
+
+    The batch norm (h) and (x) transforms, using the moving statistics, and
+    their `gamma` scaling are folded into the gate weights and biases. The
+    returned core does not own any variables: its weights are computed from the
+    variables of this module when it is connected, so they always reflect the
+    current value of the statistics. Its outputs match this core connected with
+    `is_training=False` and `test_local_stats=False`.
+
+    Example usage:
+
+      bn_lstm = snt.BatchNormLSTM(4, use_batch_norm_x=True)
+      output, _ = tf.nn.dynamic_rnn(
+          bn_lstm.with_batch_norm_control(is_training=True), ...)
+      folded_lstm = bn_lstm.fold_batch_norm()
+      serving_output, _ = tf.nn.dynamic_rnn(folded_lstm, ...)
+
+    Args:
+      name: Name of the returned module. Defaults to the name of this module
+        with a `_folded` suffix.
+
+    Returns:
+      An `snt.LSTM`.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the graph.
+      base.NotSupportedError: If batch norm (c) is enabled, since it cannot be
+        folded into the gate weights, or if `max_unique_stats > 1`.
+    """
+    self._ensure_is_connected()
+    if self._use_batch_norm_c:
+      raise base.NotSupportedError(
+          "Batch norm (c) cannot be folded into the gate weights.")
+    if self._max_unique_stats != 1:
+      raise base.NotSupportedError(
+          "Folding batch norm requires max_unique_stats == 1.")
+    if name is None:
+      name = self.module_name + "_folded"
+
+    with tf.name_scope(name + "_weights"):
+      b = self._b
+      if self._use_batch_norm_h or self._use_batch_norm_x:
+        w_x, w_h = self._w_x, self._w_h
+        if self._use_batch_norm_x:
+          scale, shift = self._batch_norm_x.inference_transform()
+          w_x = w_x * (self._gamma_x * scale)
+          b = b + self._gamma_x * shift
+        if self._use_batch_norm_h:
+          scale, shift = self._batch_norm_h.inference_transform()
+          w_h = w_h * (self._gamma_h * scale)
+          b = b + self._gamma_h * shift
+        w_xh = tf.concat([w_x, w_h], axis=0)
+      else:
+        # Without batch norm the gate weights are a single variable.
+        w_xh = self._w_xh
+      folded_variables = {
+          LSTM.W_GATES: w_xh,
+          LSTM.B_GATES: b,
+      }
+      if self._use_peepholes:
+        folded_variables.update({LSTM.W_F_DIAG: self._w_f_diag,
+                                 LSTM.W_I_DIAG: self._w_i_diag,
+                                 LSTM.W_O_DIAG: self._w_o_diag})
+
+    def folded_getter(getter, name, *args, **kwargs):
+      del getter, args, kwargs  # Unused.
+      return folded_variables[name.split("/")[-1]]
+
+    return LSTM(self._hidden_size,
+                forget_bias=self._forget_bias,
+                use_peepholes=self._use_peepholes,
+                hidden_clip_value=self._hidden_clip_value,
+                cell_clip_value=self._cell_clip_value,
+                custom_getter=folded_getter,
+                name=name)
+
   @classmethod
   def get_possible_initializer_keys(
       cls, use_peepholes=False, use_batch_norm_h=True, use_batch_norm_x=False,
@@ -1130,16 +1307,18 @@ class BatchNormLSTM(rnn_core.RNNCore):
     No offset `beta` or scaling `gamma` are learnt.
     """
 
-    def __init__(self, max_unique_stats, name=None):
+    def __init__(self, max_unique_stats, eps=1e-3, name=None):
       """Create an IndexedStatsBatchNorm.
 
       Args:
         max_unique_stats: number of different indices to have statistics for;
           indices beyond this will use the final statistics.
+        eps: Small number added to the variance to avoid dividing by zero.
         name: Name of the module.
       """
       super(BatchNormLSTM.IndexedStatsBatchNorm, self).__init__(name=name)
       self._max_unique_stats = max_unique_stats
+      self._eps = eps
 
     def _build(self, inputs, index, is_training, test_local_stats):
       """Add the IndexedStatsBatchNorm module to the graph.
@@ -1156,8 +1335,9 @@ class BatchNormLSTM(rnn_core.RNNCore):
         Output of batch norm operation.
       """
       def create_batch_norm():
-        return batch_norm.BatchNorm(offset=False, scale=False)(
-            inputs, is_training, test_local_stats)
+        self._batch_norm = batch_norm.BatchNorm(offset=False, scale=False,
+                                                eps=self._eps)
+        return self._batch_norm(inputs, is_training, test_local_stats)
 
       if self._max_unique_stats > 1:
         pred_fn_pairs = [(tf.equal(i, index), create_batch_norm)
@@ -1168,6 +1348,27 @@ class BatchNormLSTM(rnn_core.RNNCore):
       else:
         return create_batch_norm()
 
+    def inference_transform(self):
+      """Returns the batch norm with moving statistics as an affine transform.
+
+      Only supported when `max_unique_stats` is 1.
+
+      Returns:
+        A tuple `(scale, shift)` of vectors such that the output of the module
+        when using the moving statistics is `inputs * scale + shift`.
+
+      Raises:
+        base.NotSupportedError: If `max_unique_stats > 1`.
+      """
+      self._ensure_is_connected()
+      if self._max_unique_stats > 1:
+        raise base.NotSupportedError(
+            "The statistics depend on the index when max_unique_stats > 1.")
+      moving_mean = tf.reshape(self._batch_norm.moving_mean, [-1])
+      moving_variance = tf.reshape(self._batch_norm.moving_variance, [-1])
+      scale = tf.rsqrt(moving_variance + self._eps)
+      return scale, -moving_mean * scale
+
   class CoreWithExtraBuildArgs(rnn_core.RNNCore):
     """Wraps an RNNCore so that the build method receives extra args and kwargs.
 
@@ -1204,7 +1405,21 @@ class BatchNormLSTM(rnn_core.RNNCore):
 
 
 class ConvLSTM(rnn_core.RNNCore):
-  """Convolutional LSTM."""
+  """Convolutional LSTM.
+
+  #### Fused convolution
+
+  When constructed with `fused=True` the inputs and the hidden state are
+  concatenated along the channel dimension and each step runs a single
+  convolution, instead of one convolution for the inputs and another for the
+  hidden state. The stacked kernel is assembled at connection time from the
+  variables of the two convolutions, so checkpoints written by an unfused
+  `ConvLSTM` can be restored into a fused one and vice versa.
+
+  The input convolution does not depend on the recurrent state, so when a
+  whole input sequence is available `unroll_sequence` computes it for all time
+  steps with a single convolution before running the recurrence.
+  """
 
   @classmethod
   def get_possible_initializer_keys(cls, conv_ndims, use_bias=True):
@@ -1238,7 +1453,8 @@ class ConvLSTM(rnn_core.RNNCore):
                regularizers=None,
                use_layer_norm=False,
                custom_getter=None,
-               name="conv_lstm"):
+               name="conv_lstm",
+               fused=False):
     """Construct ConvLSTM.
 
     Args:
@@ -1272,6 +1488,10 @@ class ConvLSTM(rnn_core.RNNCore):
         and allows overwriting the internal get_variable method. See the
         `tf.get_variable` documentation for more details.
       name: Name of the module.
+      fused: Boolean that indicates whether to compute the input and hidden
+        convolutions of a step with a single convolution over the
+        concatenation of the inputs and the hidden state. The variables are the
+        same in both modes.
 
     Raises:
       ValueError: If `skip_connection` is `True` and stride is different from 1
@@ -1299,13 +1519,32 @@ class ConvLSTM(rnn_core.RNNCore):
     self._partitioners = partitioners
     self._regularizers = regularizers
     self._use_layer_norm = use_layer_norm
+    self._fused = fused
 
     self._total_output_channels = output_channels
     if self._stride != 1:
       self._total_output_channels //= self._stride * self._stride
 
-    self._convolutions = dict()
-
+    # The input and hidden convolutions own the variables in both modes, and
+    # share them with the fused convolution.
+    reuse_getter = _auto_reuse_getter if self._fused else None
+    with self._enter_variable_scope():
+      self._convolutions = dict()
+      self._convolutions["input"] = self._new_convolution(
+          self._use_bias, custom_getter=reuse_getter)
+      if self._legacy_bias_behaviour:
+        self._convolutions["hidden"] = self._new_convolution(
+            self._use_bias, custom_getter=reuse_getter)
+      else:
+        # Do not apply bias a second time
+        self._convolutions["hidden"] = self._new_convolution(
+            use_bias=False, custom_getter=reuse_getter)
+      if self._use_layer_norm:
+        self._layer_norm = layer_norm.LayerNorm()
+      if self._fused:
+        self._fused_convolution = self._new_convolution(
+            self._use_bias, custom_getter=self._fused_convolution_getter,
+            name="fused_conv")
 
     if self._use_bias and self._legacy_bias_behaviour:
       tf.logging.warning(
@@ -1313,13 +1552,15 @@ class ConvLSTM(rnn_core.RNNCore):
           "convolutions. To avoid this, invoke the constructor with option "
           "`legacy_bias_behaviour=False`. In future, this will be the default.")
 
-  def _new_convolution(self, use_bias):
+  def _new_convolution(self, use_bias, custom_getter=None, name="conv"):
     """Returns new convolution.
 
     Args:
       use_bias: Use bias in convolutions. If False, clean_dict removes bias
         entries from initializers, partitioners and regularizers passed to
         the constructor of the convolution.
+      custom_getter: Optional custom getter of the convolution.
+      name: Name of the convolution.
     """
     def clean_dict(input_dict):
       if input_dict and not use_bias:
@@ -1337,7 +1578,50 @@ class ConvLSTM(rnn_core.RNNCore):
         initializers=clean_dict(self._initializers),
         partitioners=clean_dict(self._partitioners),
         regularizers=clean_dict(self._regularizers),
-        name="conv")
+        custom_getter=custom_getter,
+        name=name)
+
+  def _fused_convolution_getter(self, getter, name, shape, initializer,
+                                **kwargs):
+    """Maps the variables of the fused convolution onto the unfused ones.
+
+    The kernel of the fused convolution is the concatenation, along the input
+    channels, of the kernels of the input and hidden convolutions. Its bias is
+    the sum of their biases. Both are computed once per connection, see
+    `_fuse_weights`.
+    """
+    getter = functools.partial(_auto_reuse_getter, getter)
+    variable_name = name.split("/")[-1]
+    input_name = "{}/{}".format(
+        self._convolutions["input"].scope_name, variable_name)
+    hidden_name = "{}/{}".format(
+        self._convolutions["hidden"].scope_name, variable_name)
+
+    if variable_name == "w":
+      shape = list(shape)
+      input_shape = shape[:-2] + [shape[-2] - self._output_channels, shape[-1]]
+      hidden_shape = shape[:-2] + [self._output_channels, shape[-1]]
+      use_default_initializer = (
+          not self._initializers or "w" not in self._initializers)
+
+      def get_kernel(kernel_name, kernel_shape):
+        kernel_initializer = initializer
+        if use_default_initializer:
+          kernel_initializer = conv.create_weight_initializer(
+              kernel_shape[:-1], dtype=kwargs.get("dtype", tf.float32))
+        return getter(kernel_name, shape=kernel_shape,
+                      initializer=kernel_initializer, **kwargs)
+
+      kernels = [get_kernel(input_name, input_shape),
+                 get_kernel(hidden_name, hidden_shape)]
+      return _fuse_weights(lambda: tf.concat(kernels, axis=-2), kernels)
+
+    biases = [getter(input_name, shape=shape, initializer=initializer,
+                     **kwargs)]
+    if self._legacy_bias_behaviour:
+      biases.append(getter(hidden_name, shape=shape, initializer=initializer,
+                           **kwargs))
+    return _fuse_weights(lambda: tf.add_n(biases), biases)
 
   @property
   def convolutions(self):
@@ -1358,25 +1642,24 @@ class ConvLSTM(rnn_core.RNNCore):
 
   def _build(self, inputs, state):
     hidden, cell = state
-    if "input" not in self._convolutions:
-      self._convolutions["input"] = self._new_convolution(self._use_bias)
-    if "hidden" not in self._convolutions:
-      if self._legacy_bias_behaviour:
-        self._convolutions["hidden"] = self._new_convolution(self._use_bias)
-      else:
-        # Do not apply bias a second time
-        self._convolutions["hidden"] = self._new_convolution(use_bias=False)
-    input_conv = self._convolutions["input"]
-    hidden_conv = self._convolutions["hidden"]
-    next_hidden = input_conv(inputs) + hidden_conv(hidden)
+    if self._fused:
+      next_hidden = self._fused_convolution(
+          tf.concat([inputs, hidden], axis=self._conv_ndims+1))
+    else:
+      input_conv = self._convolutions["input"]
+      hidden_conv = self._convolutions["hidden"]
+      next_hidden = input_conv(inputs) + hidden_conv(hidden)
+    return self._projected_step(next_hidden, cell)
 
+  def _projected_step(self, next_hidden, cell):
+    """Computes one step given the summed input and hidden convolutions."""
     if self._use_layer_norm:
       # Normalize over all non-batch dimensions.
       # Temporarily flatten the spatial and channel dimensions together.
       flatten = basic.BatchFlatten()
       unflatten = basic.BatchReshape(next_hidden.get_shape().as_list()[1:])
       next_hidden = flatten(next_hidden)
-      next_hidden = layer_norm.LayerNorm()(next_hidden)
+      next_hidden = self._layer_norm(next_hidden)
       next_hidden = unflatten(next_hidden)
 
     gates = tf.split(value=next_hidden, num_or_size_splits=4,
@@ -1388,6 +1671,55 @@ class ConvLSTM(rnn_core.RNNCore):
     output = tf.tanh(next_cell) * tf.sigmoid(output_gate)
     return output, (output, next_cell)
 
+  @util.reuse_variables
+  def project_inputs(self, inputs):
+    """Applies the input convolution to all time steps at once.
+
+    Args:
+      inputs: Tensor of size `[time_steps, batch_size] + input_shape`.
+
+    Returns:
+      A Tensor of size `[time_steps, batch_size, ..., 4 * output_channels]`
+      holding the input contribution to all gates.
+    """
+    return basic.BatchApply(self._convolutions["input"], n_dims=2)(inputs)
+
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None):
+    """Runs the ConvLSTM over a whole time-major input sequence.
+
+    The input convolution for every time step is computed up front by
+    `project_inputs`, so the recurrence only runs the hidden convolution. The
+    convolutions are never fused in this mode.
+
+    Args:
+      input_sequence: Tensor of size `[time_steps, batch_size] + input_shape`.
+      initial_state: Tuple `(hidden, cell)` of the initial state.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. See `RNNCore.unroll`.
+
+    Returns:
+      A tuple (output_sequence, final_state) with the outputs of all time steps
+      and the state after the last step of each sequence.
+    """
+    projected_inputs = self.project_inputs(input_sequence)
+    hidden_conv = self._convolutions["hidden"]
+
+    def step(projected_inputs_t, prev_state):
+      hidden, cell = prev_state
+      return self._projected_step(projected_inputs_t + hidden_conv(hidden),
+                                  cell)
+
+    return rnn_core.dynamic_unroll(
+        step, projected_inputs, tuple(initial_state), self.output_size,
+        sequence_length=sequence_length)
+
+  @property
+  def fused(self):
+    """Boolean indicating whether the convolutions are fused."""
+    return self._fused
+
   @property
   def use_layer_norm(self):
     """Boolean indicating whether layer norm is enabled."""
@@ -1424,9 +1756,24 @@ class GRU(rnn_core.RNNCore):
 
   The implementation is based on: https://arxiv.org/pdf/1412.3555v1.pdf.
 
+  #### Fused gates
+
+  When constructed with `fused=True` the per-gate weights are concatenated at
+  connection time, so that a step runs one input matmul for all three gates,
+  one recurrent matmul for the update and reset gates and one matmul for the
+  reset-gated candidate, instead of six matmuls and three bias additions. The
+  variables themselves are still stored per gate (`wz`, `uz`, `bz`, ...), so
+  checkpoints written by an unfused `GRU` can be restored into a fused one and
+  vice versa.
+
+  The input projection does not depend on the recurrent state, so when a whole
+  input sequence is available `unroll_sequence` computes it for all time steps
+  with a single matmul before running the recurrence.
+
   Attributes:
     state_size: Integer indicating the size of state tensor.
     output_size: Integer indicating the size of the core output.
+    fused: Boolean indicating whether the gate matmuls are fused.
   """
 
   # Keys that may be provided for parameter initializers.
@@ -1442,7 +1789,7 @@ class GRU(rnn_core.RNNCore):
   POSSIBLE_INITIALIZER_KEYS = {WZ, UZ, BZ, WR, UR, BR, WH, UH, BH}
 
   def __init__(self, hidden_size, initializers=None, partitioners=None,
-               regularizers=None, custom_getter=None, name="gru"):
+               regularizers=None, custom_getter=None, name="gru", fused=False):
     """Construct GRU.
 
     Args:
@@ -1462,6 +1809,9 @@ class GRU(rnn_core.RNNCore):
         and allows overwriting the internal get_variable method. See the
         `tf.get_variable` documentation for more details.
       name: Name of the module.
+      fused: Boolean that indicates whether to concatenate the gate weights
+        and compute the gates with three matmuls per step instead of six. The
+        variables are the same in both modes.
 
     Raises:
       KeyError: if `initializers` contains any keys not returned by
@@ -1473,6 +1823,7 @@ class GRU(rnn_core.RNNCore):
     """
     super(GRU, self).__init__(custom_getter=custom_getter, name=name)
     self._hidden_size = hidden_size
+    self._fused = fused
     self._initializers = util.check_initializers(
         initializers, self.POSSIBLE_INITIALIZER_KEYS)
     self._partitioners = util.check_partitioners(
@@ -1524,59 +1875,128 @@ class GRU(rnn_core.RNNCore):
         first time, and the inferred size of the inputs does not match previous
         invocations.
     """
-    input_size = inputs.get_shape()[1]
-    weight_shape = (input_size, self._hidden_size)
-    u_shape = (self._hidden_size, self._hidden_size)
-    bias_shape = (self._hidden_size,)
+    self._create_variables(inputs.get_shape()[1], inputs.dtype)
+
+    if self._fused:
+      gate_weights = [self._wz, self._uz, self._bz, self._wr, self._ur,
+                      self._br, self._wh, self._uh, self._bh]
+      w_gates, b_gates = _fuse_weights(self._input_gate_weights, gate_weights)
+      recurrent_weights = _fuse_weights(self._recurrent_gate_weights,
+                                        gate_weights)
+      projected_inputs = tf.matmul(inputs, w_gates) + b_gates
+      state = self._projected_step(
+          projected_inputs, prev_state, recurrent_weights)
+      return state, state
 
-    self._wz = tf.get_variable(GRU.WZ, weight_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.WZ),
-                               partitioner=self._partitioners.get(GRU.WZ),
-                               regularizer=self._regularizers.get(GRU.WZ))
-    self._uz = tf.get_variable(GRU.UZ, u_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.UZ),
-                               partitioner=self._partitioners.get(GRU.UZ),
-                               regularizer=self._regularizers.get(GRU.UZ))
-    self._bz = tf.get_variable(GRU.BZ, bias_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.BZ),
-                               partitioner=self._partitioners.get(GRU.BZ),
-                               regularizer=self._regularizers.get(GRU.BZ))
     z = tf.sigmoid(tf.matmul(inputs, self._wz) +
                    tf.matmul(prev_state, self._uz) + self._bz)
-
-    self._wr = tf.get_variable(GRU.WR, weight_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.WR),
-                               partitioner=self._partitioners.get(GRU.WR),
-                               regularizer=self._regularizers.get(GRU.WR))
-    self._ur = tf.get_variable(GRU.UR, u_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.UR),
-                               partitioner=self._partitioners.get(GRU.UR),
-                               regularizer=self._regularizers.get(GRU.UR))
-    self._br = tf.get_variable(GRU.BR, bias_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.BR),
-                               partitioner=self._partitioners.get(GRU.BR),
-                               regularizer=self._regularizers.get(GRU.BR))
     r = tf.sigmoid(tf.matmul(inputs, self._wr) +
                    tf.matmul(prev_state, self._ur) + self._br)
-
-    self._wh = tf.get_variable(GRU.WH, weight_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.WH),
-                               partitioner=self._partitioners.get(GRU.WH),
-                               regularizer=self._regularizers.get(GRU.WH))
-    self._uh = tf.get_variable(GRU.UH, u_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.UH),
-                               partitioner=self._partitioners.get(GRU.UH),
-                               regularizer=self._regularizers.get(GRU.UH))
-    self._bh = tf.get_variable(GRU.BH, bias_shape, dtype=inputs.dtype,
-                               initializer=self._initializers.get(GRU.BH),
-                               partitioner=self._partitioners.get(GRU.BH),
-                               regularizer=self._regularizers.get(GRU.BH))
     h_twiddle = tf.tanh(tf.matmul(inputs, self._wh) +
                         tf.matmul(r * prev_state, self._uh) + self._bh)
 
     state = (1 - z) * prev_state + z * h_twiddle
     return state, state
 
+  def _create_variables(self, input_size, dtype):
+    """Creates (or reuses) the per-gate variables of the GRU."""
+    weight_shape = (input_size, self._hidden_size)
+    u_shape = (self._hidden_size, self._hidden_size)
+    bias_shape = (self._hidden_size,)
+
+    def _get_variable(name, shape):
+      return tf.get_variable(name, shape, dtype=dtype,
+                             initializer=self._initializers.get(name),
+                             partitioner=self._partitioners.get(name),
+                             regularizer=self._regularizers.get(name))
+
+    with _auto_reuse_scope():
+      self._wz = _get_variable(GRU.WZ, weight_shape)
+      self._uz = _get_variable(GRU.UZ, u_shape)
+      self._bz = _get_variable(GRU.BZ, bias_shape)
+      self._wr = _get_variable(GRU.WR, weight_shape)
+      self._ur = _get_variable(GRU.UR, u_shape)
+      self._br = _get_variable(GRU.BR, bias_shape)
+      self._wh = _get_variable(GRU.WH, weight_shape)
+      self._uh = _get_variable(GRU.UH, u_shape)
+      self._bh = _get_variable(GRU.BH, bias_shape)
+
+  def _input_gate_weights(self):
+    """Returns the input weights and biases of all gates, concatenated."""
+    w_gates = tf.concat([self._wz, self._wr, self._wh], axis=1)
+    b_gates = tf.concat([self._bz, self._br, self._bh], axis=0)
+    return w_gates, b_gates
+
+  def _recurrent_gate_weights(self):
+    """Returns the (update and reset, candidate) recurrent weights."""
+    return tf.concat([self._uz, self._ur], axis=1), self._uh
+
+  def _projected_step(self, projected_inputs, prev_state, recurrent_weights):
+    """Computes one GRU step given the projected inputs of all gates."""
+    u_zr, u_h = recurrent_weights
+    x_zr, x_h = tf.split(projected_inputs,
+                         [2 * self._hidden_size, self._hidden_size], axis=1)
+    z, r = tf.split(tf.sigmoid(x_zr + tf.matmul(prev_state, u_zr)),
+                    num_or_size_splits=2, axis=1)
+    h_twiddle = tf.tanh(x_h + tf.matmul(r * prev_state, u_h))
+    return (1 - z) * prev_state + z * h_twiddle
+
+  @util.reuse_variables
+  def project_inputs(self, inputs):
+    """Computes the input contribution to all gates in a single matmul.
+
+    Args:
+      inputs: Tensor of size `[..., input_size]`, e.g. a time-major sequence
+        of size `[time_steps, batch_size, input_size]`.
+
+    Returns:
+      A Tensor of size `[..., 3 * hidden_size]` holding the (biased) input
+      projections of the update gate, reset gate and candidate activation.
+    """
+    input_size = inputs.get_shape()[-1]
+    self._create_variables(input_size, inputs.dtype)
+    w_gates, b_gates = self._input_gate_weights()
+    flat_inputs = tf.reshape(inputs, [-1, input_size.value])
+    projected = tf.matmul(flat_inputs, w_gates) + b_gates
+    output_shape = tf.concat(
+        [tf.shape(inputs)[:-1], [3 * self._hidden_size]], axis=0)
+    projected = tf.reshape(projected, output_shape)
+    projected.set_shape(
+        inputs.get_shape()[:-1].concatenate([3 * self._hidden_size]))
+    return projected
+
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None):
+    """Runs the GRU over a whole time-major input sequence.
+
+    The input projection for every time step is computed up front by
+    `project_inputs`, so the recurrence only performs the two state-dependent
+    matmuls per step. The gates are fused regardless of the `fused` flag.
+
+    Args:
+      input_sequence: Tensor of size `[time_steps, batch_size, input_size]`.
+      initial_state: Tensor of size `[batch_size, hidden_size]`.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. See `RNNCore.unroll`.
+
+    Returns:
+      A tuple (output_sequence, final_state) where `output_sequence` is a
+      Tensor of size `[time_steps, batch_size, hidden_size]` and `final_state`
+      is a Tensor of size `[batch_size, hidden_size]`.
+    """
+    projected_inputs = self.project_inputs(input_sequence)
+    recurrent_weights = self._recurrent_gate_weights()
+
+    def step(projected_inputs_t, prev_state):
+      state = self._projected_step(
+          projected_inputs_t, prev_state, recurrent_weights)
+      return state, state
+
+    return rnn_core.dynamic_unroll(
+        step, projected_inputs, initial_state, self.output_size,
+        sequence_length=sequence_length)
+
   @property
   def state_size(self):
     return tf.TensorShape([self._hidden_size])
@@ -1585,6 +2005,53 @@ class GRU(rnn_core.RNNCore):
   def output_size(self):
     return tf.TensorShape([self._hidden_size])
 
+  @property
+  def fused(self):
+    """Boolean indicating whether the gate matmuls are fused."""
+    return self._fused
+
+
+def _fuse_weights(fuse_fn, weights):
+  """Returns `fuse_fn()`, which combines `weights`, outside of control flow.
+
+  A fused core is typically connected inside the loop of `tf.nn.dynamic_rnn`,
+  where combining its weights would copy all of them at every step. When all
+  the `weights` are variables, they are therefore combined outside of the
+  loop, once per connection. Otherwise, e.g. if a custom getter returns
+  tensors computed inside the loop, they are combined in place.
+
+  Args:
+    fuse_fn: Function without arguments combining the `weights`.
+    weights: List of the variables or tensors combined by `fuse_fn`.
+
+  Returns:
+    The result of `fuse_fn`.
+  """
+  if all(isinstance(weight, (tf.Variable, variables.PartitionedVariable))
+         for weight in weights):
+    # Clears the control flow context as well as the control dependencies.
+    with tf.control_dependencies(None):
+      return fuse_fn()
+  return fuse_fn()
+
+
+def _auto_reuse_scope():
+  """Returns a variable scope creating variables or reusing existing ones.
+
+  Cores computing whole sequences at once, e.g. in `unroll_sequence`, request
+  their variables outside of the template of `_build` as well as inside of it,
+  in either order. Within this scope, the first request creates the variables
+  and the others reuse them, without changing their names.
+  """
+  return tf.variable_scope(tf.get_variable_scope(), reuse=tf.AUTO_REUSE,
+                           auxiliary_name_scope=False)
+
+
+def _auto_reuse_getter(getter, *args, **kwargs):
+  """Custom getter version of `_auto_reuse_scope`, e.g. for sub-modules."""
+  kwargs["reuse"] = tf.AUTO_REUSE
+  return getter(*args, **kwargs)
+
 
 class HighwayCore(rnn_core.RNNCore):
   """Recurrent Highway Network cell.
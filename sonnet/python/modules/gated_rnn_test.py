@@ -20,6 +20,7 @@ from __future__ import division
 from __future__ import print_function
 
 import itertools
+import os
 
 # Dependency imports
 from absl.testing import parameterized
@@ -739,6 +740,72 @@ class LSTMTest(tf.test.TestCase, parameterized.TestCase):
                             hidden_size=1,
                             max_unique_stats=0)
 
+  @parameterized.parameters(
+      (False, False, False),
+      (False, False, True),
+      (True, False, False),
+      (False, True, False),
+      (True, True, False),
+      (True, True, True))
+  def testFoldBatchNorm(self, use_batch_norm_h, use_batch_norm_x,
+                        use_peepholes):
+    hidden_size = 4
+    batch_size = 3
+    time_steps = 5
+    input_size = 3
+    cell = snt.BatchNormLSTM(hidden_size=hidden_size,
+                             use_peepholes=use_peepholes,
+                             use_batch_norm_h=use_batch_norm_h,
+                             use_batch_norm_x=use_batch_norm_x,
+                             hidden_clip_value=2.,
+                             cell_clip_value=2.)
+    inputs = tf.constant(
+        np.random.randn(batch_size, time_steps, input_size), dtype=tf.float32)
+    initial_state = cell.initial_state(batch_size, tf.float32)
+    output, _ = tf.nn.dynamic_rnn(
+        cell.with_batch_norm_control(is_training=False,
+                                     test_local_stats=False),
+        inputs, initial_state=initial_state)
+
+    folded_lstm = cell.fold_batch_norm()
+    self.assertIsInstance(folded_lstm, snt.LSTM)
+    folded_output, _ = tf.nn.dynamic_rnn(folded_lstm, inputs,
+                                         initial_state=initial_state)
+    self.assertEmpty(folded_lstm.get_variables())
+
+    self.evaluate(tf.global_variables_initializer())
+    # Use non-trivial statistics and scales.
+    assign_ops = []
+    for variable in cell.get_variables():
+      if variable.op.name.endswith("moving_mean"):
+        value = tf.random_normal(variable.get_shape())
+      elif (variable.op.name.endswith("moving_variance") or
+            "gamma" in variable.op.name):
+        value = tf.random_uniform(variable.get_shape(), 0.5, 2.)
+      else:
+        continue
+      assign_ops.append(tf.assign(variable, value))
+    self.evaluate(assign_ops)
+
+    output, folded_output = self.evaluate((output, folded_output))
+    self.assertAllClose(output, folded_output, rtol=1e-5, atol=1e-5)
+
+  def testFoldBatchNormNotSupported(self):
+    inputs = tf.ones([2, 3])
+    cell = snt.BatchNormLSTM(hidden_size=4, use_batch_norm_c=True)
+    with self.assertRaises(snt.NotConnectedError):
+      cell.fold_batch_norm()
+    cell.with_batch_norm_control(is_training=False)(
+        inputs, cell.initial_state(2))
+    with self.assertRaisesRegexp(snt.NotSupportedError, "Batch norm \\(c\\)"):
+      cell.fold_batch_norm()
+
+    cell = snt.BatchNormLSTM(hidden_size=4, max_unique_stats=2)
+    cell.with_batch_norm_control(is_training=False)(
+        inputs, cell.initial_state(2))
+    with self.assertRaisesRegexp(snt.NotSupportedError, "max_unique_stats"):
+      cell.fold_batch_norm()
+
   @parameterized.parameters(
       (False, 1),
       (False, 2),
@@ -1146,6 +1213,97 @@ class ConvLSTMTest(tf.test.TestCase, parameterized.TestCase):
     self.evaluate(init)
     self.evaluate(train_op)
 
+  @parameterized.parameters(
+      (snt.Conv1DLSTM, 1, False, False),
+      (snt.Conv1DLSTM, 1, True, False),
+      (snt.Conv1DLSTM, 1, True, True),
+      (snt.Conv2DLSTM, 2, True, False),
+      (snt.Conv2DLSTM, 2, True, True),
+  )
+  def testFusedRestoresUnfusedCheckpoint(self, lstm_class, dim, use_bias,
+                                         legacy_bias_behaviour):
+    batch_size = 2
+    input_channels = 3
+    output_channels = 5
+    input_shape = (8,) * dim + (input_channels,)
+    output_shape = (batch_size,) + input_shape[:-1] + (output_channels,)
+    input_data = np.random.randn(batch_size, *input_shape).astype(np.float32)
+    state_data = np.random.randn(*output_shape).astype(np.float32)
+    checkpoint_path = os.path.join(self.get_temp_dir(), "conv_lstm")
+
+    def build(fused):
+      lstm = lstm_class(input_shape=input_shape,
+                        output_channels=output_channels,
+                        kernel_shape=3,
+                        use_bias=use_bias,
+                        legacy_bias_behaviour=legacy_bias_behaviour,
+                        use_layer_norm=True,
+                        fused=fused)
+      output, _ = lstm(tf.constant(input_data),
+                       (tf.constant(state_data), tf.constant(state_data)))
+      return lstm, output
+
+    with tf.Graph().as_default():
+      lstm, output = build(fused=False)
+      variable_shapes = {v.op.name: v.get_shape() for v in lstm.get_variables()}
+      saver = tf.train.Saver()
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        expected_output = sess.run(output)
+        saver.save(sess, checkpoint_path)
+
+    with tf.Graph().as_default():
+      fused_lstm, output = build(fused=True)
+      self.assertTrue(fused_lstm.fused)
+      self.assertEqual(
+          variable_shapes,
+          {v.op.name: v.get_shape() for v in fused_lstm.get_variables()})
+      saver = tf.train.Saver()
+      with self.test_session() as sess:
+        saver.restore(sess, checkpoint_path)
+        self.assertAllClose(expected_output, sess.run(output), atol=1e-5)
+
+  @parameterized.parameters(
+      (snt.Conv1DLSTM, 1, False),
+      (snt.Conv2DLSTM, 2, False),
+      (snt.Conv2DLSTM, 2, True),
+  )
+  def testUnrollSequence(self, lstm_class, dim, fused):
+    time_steps = 4
+    batch_size = 2
+    input_channels = 3
+    output_channels = 5
+    input_shape = (6,) * dim + (input_channels,)
+
+    lstm = lstm_class(input_shape=input_shape,
+                      output_channels=output_channels,
+                      kernel_shape=3,
+                      use_layer_norm=True,
+                      fused=fused)
+    input_sequence = tf.random_normal((time_steps, batch_size) + input_shape)
+    initial_state = lstm.initial_state(batch_size, tf.float32)
+    output_sequence, final_state = lstm.unroll_sequence(input_sequence,
+                                                        initial_state)
+    num_variables = len(lstm.get_variables())
+
+    # Stepping through the sequence reuses the variables created above.
+    step_output_sequence, step_final_state = tf.nn.dynamic_rnn(
+        lstm, input_sequence, time_major=True, initial_state=initial_state)
+    self.assertLen(lstm.get_variables(), num_variables)
+    if fused:
+      # The kernels are concatenated once, not at every step of the loop.
+      concat_ops = [op for op in tf.get_default_graph().get_operations()
+                    if op.type == "ConcatV2" and "fused_conv" in op.name]
+      self.assertNotEmpty(concat_ops)
+      for op in concat_ops:
+        self.assertIsNone(op._get_control_flow_context())  # pylint: disable=protected-access
+
+    self.evaluate(tf.global_variables_initializer())
+    results, step_results = self.evaluate(
+        ((output_sequence, final_state),
+         (step_output_sequence, step_final_state)))
+    self.assertAllClose(results, step_results, atol=1e-5)
+
 
 # @tf.contrib.eager.run_all_tests_in_graph_and_eager_modes
 class GRUTest(tf.test.TestCase, parameterized.TestCase):
@@ -1295,6 +1453,126 @@ class GRUTest(tf.test.TestCase, parameterized.TestCase):
     self.assertLen(tf.get_collection(tf.GraphKeys.REGULARIZATION_LOSSES),
                    len(keys))
 
+  def testFusedComputation(self):
+
+    def sigmoid(x):
+      return 1 / (1 + np.exp(-x))
+
+    batch_size = 2
+    input_size = 3
+    hidden_size = 5
+
+    input_data = np.random.randn(batch_size, input_size)
+    state_data = np.random.randn(batch_size, hidden_size)
+    inputs = tf.constant(input_data)
+    state_in = tf.constant(state_data)
+
+    gru = snt.GRU(hidden_size, fused=True, name="rnn")
+    self.assertTrue(gru.fused)
+    _, state = gru(inputs, state_in)
+    gru_variables = gru.get_variables()
+    self.assertLen(gru_variables, 9, "Fused GRU should have 9 variables")
+    param_map = {param.name.split("/")[-1].split(":")[0]: param
+                 for param in gru_variables}
+
+    self.evaluate(tf.global_variables_initializer())
+    state_ex, params = self.evaluate([state, param_map])
+    z = sigmoid(np.dot(input_data, params["wz"]) +
+                np.dot(state_data, params["uz"]) + params["bz"])
+    r = sigmoid(np.dot(input_data, params["wr"]) +
+                np.dot(state_data, params["ur"]) + params["br"])
+    h_twiddle = np.tanh(np.dot(input_data, params["wh"]) +
+                        np.dot(r * state_data, params["uh"]) + params["bh"])
+    state_real = (1 - z) * state_data + z * h_twiddle
+
+    self.assertAllClose(state_real, state_ex)
+
+  @parameterized.parameters(True, False)
+  def testUnrollSequence(self, fused):
+    seq_len = 4
+    batch_size = 2
+    input_size = 3
+    hidden_size = 5
+
+    input_data = np.random.randn(seq_len, batch_size, input_size)
+    state_data = np.random.randn(batch_size, hidden_size)
+    input_sequence = tf.constant(input_data, dtype=tf.float32)
+    initial_state = tf.constant(state_data, dtype=tf.float32)
+
+    gru = snt.GRU(hidden_size, fused=fused)
+    output_sequence, final_state = gru.unroll_sequence(
+        input_sequence, initial_state)
+    self.assertEqual(output_sequence.get_shape().as_list(),
+                     [seq_len, batch_size, hidden_size])
+    self.assertLen(gru.get_variables(), 9)
+
+    # Stepping through the sequence reuses the variables created above.
+    state = initial_state
+    step_outputs = []
+    for t in xrange(seq_len):
+      output, state = gru(input_sequence[t], state)
+      step_outputs.append(output)
+    self.assertLen(gru.get_variables(), 9)
+
+    self.evaluate(tf.global_variables_initializer())
+    output_sequence_v, final_state_v, step_outputs_v, state_v = self.evaluate(
+        [output_sequence, final_state, tf.stack(step_outputs), state])
+    self.assertAllClose(output_sequence_v, step_outputs_v)
+    self.assertAllClose(final_state_v, state_v)
+
+  def testFusedWeightsOutsideLoop(self):
+    seq_len = 4
+    batch_size = 2
+    input_size = 3
+    hidden_size = 5
+
+    input_sequence = tf.constant(
+        np.random.randn(seq_len, batch_size, input_size), dtype=tf.float32)
+    initial_state = tf.constant(
+        np.random.randn(batch_size, hidden_size), dtype=tf.float32)
+    gru = snt.GRU(hidden_size, fused=True)
+    output_sequence, _ = tf.nn.dynamic_rnn(
+        gru, input_sequence, initial_state=initial_state, time_major=True)
+    expected_output_sequence, _ = gru.unroll_sequence(
+        input_sequence, initial_state)
+
+    # The gate weights are concatenated once, not at every step of the loop.
+    concat_ops = [op for op in tf.get_default_graph().get_operations()
+                  if op.type == "ConcatV2" and "gru" in op.name]
+    self.assertNotEmpty(concat_ops)
+    for op in concat_ops:
+      self.assertIsNone(op._get_control_flow_context())  # pylint: disable=protected-access
+
+    self.evaluate(tf.global_variables_initializer())
+    output_sequence_v, expected_output_sequence_v = self.evaluate(
+        [output_sequence, expected_output_sequence])
+    self.assertAllClose(output_sequence_v, expected_output_sequence_v)
+
+  def testFusedRestoresUnfusedCheckpoint(self):
+    batch_size = 2
+    hidden_size = 4
+    input_data = np.random.randn(batch_size, hidden_size).astype(np.float32)
+    checkpoint_path = os.path.join(self.get_temp_dir(), "gru")
+
+    with tf.Graph().as_default():
+      gru = snt.GRU(hidden_size)
+      output, _ = gru(tf.constant(input_data), tf.zeros([batch_size,
+                                                         hidden_size]))
+      saver = tf.train.Saver()
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        expected_output = sess.run(output)
+        saver.save(sess, checkpoint_path)
+
+    with tf.Graph().as_default():
+      fused_gru = snt.GRU(hidden_size, fused=True)
+      output, _ = fused_gru(tf.constant(input_data),
+                            tf.zeros([batch_size, hidden_size]))
+      saver = tf.train.Saver()
+      with self.test_session() as sess:
+        saver.restore(sess, checkpoint_path)
+        self.assertAllClose(expected_output, sess.run(output))
+
 
 # @tf.contrib.eager.run_all_tests_in_graph_and_eager_modes
 class HighwayCoreTest(tf.test.TestCase, parameterized.TestCase):
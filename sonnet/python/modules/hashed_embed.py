@@ -0,0 +1,380 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Modules embedding ids from huge vocabularies in small tables.
+
+Unlike `snt.Embed`, these modules do not store one row per id, but compose
+the embedding of an id from rows of smaller tables:
+
+* `HashEmbed` looks up the rows of `num_hashes` hashes of the id in a table
+  of `num_buckets` rows, and sums or concatenates them.
+* `QuotientRemainderEmbed` looks up the quotient and the remainder of the
+  division of the id by `num_buckets` in two tables, and combines them.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+from sonnet.python.modules import util
+import tensorflow as tf
+
+# Prime modulus of the universal hash functions of integer ids.
+_HASH_PRIME = 2**31 - 1
+# Integer ids are hashed as vectors of `_NUM_ID_WORDS` words of `_ID_WORD_BITS`
+# bits each, which are all smaller than `_HASH_PRIME`, so that the full 64 bits
+# of the ids are hashed.
+_ID_WORD_BITS = 16
+_NUM_ID_WORDS = 64 // _ID_WORD_BITS
+
+
+def _check_combiner(combiner, combiners):
+  if combiner not in combiners:
+    raise ValueError("Invalid combiner '{}', must be one of {}.".format(
+        combiner, ", ".join(sorted(combiners))))
+
+
+def _string_to_ids(ids, num_buckets, key=None):
+  """Hashes string ids into `[0, num_buckets)`."""
+  if key is None:
+    return tf.string_to_hash_bucket_fast(ids, num_buckets)
+  return tf.string_to_hash_bucket_strong(ids, num_buckets, key)
+
+
+class HashEmbed(base.AbstractModule):
+  """Module embedding ids as the combination of the rows of several hashes.
+
+  Each id is hashed by `num_hashes` independent hash functions into a shared
+  table of `num_buckets` rows, whose rows are summed or concatenated. Two ids
+  only have the same embedding if all their hashes collide, so `num_buckets`
+  can be much smaller than the number of ids.
+
+  Integer ids are split into 16 bit words `w_i`, and hashed by universal hash
+  functions `((sum_i a_i * w_i + b) mod p) mod num_buckets`, and string ids by
+  keyed `tf.string_to_hash_bucket_strong`.
+  """
+
+  EMBEDDINGS = "embeddings"
+  POSSIBLE_INITIALIZER_KEYS = {EMBEDDINGS}
+  COMBINERS = {"sum", "concat"}
+
+  def __init__(self,
+               num_buckets,
+               embed_dim,
+               num_hashes=2,
+               combiner="sum",
+               seed=0,
+               initializers=None,
+               partitioners=None,
+               regularizers=None,
+               trainable=True,
+               custom_getter=None,
+               name="hash_embed"):
+    """Constructs a HashEmbed module.
+
+    Args:
+      num_buckets: int. Number of rows of the embeddings table.
+      embed_dim: int. Number of dimensions of the output embeddings.
+      num_hashes: int. Number of hash functions.
+      combiner: 'sum' to sum the rows of the hashes, each of `embed_dim`
+        dimensions, or 'concat' to concatenate them, each of
+        `embed_dim // num_hashes` dimensions.
+      seed: int. Seed of the parameters of the hash functions.
+      initializers: Optional dict containing initializers for embeddings (with
+        key 'embeddings'). As a default, embeddings are initialized via a
+        normal distribution.
+      partitioners: Optional dict containing partitioners for embeddings (with
+        key 'embeddings'). As a default, no partitioners are used.
+      regularizers: Optional dict containing regularizers for embeddings (with
+        key 'embeddings'). As a default, no regularizers are used.
+      trainable: if True, the embeddings will be updated during training.
+      custom_getter: Callable or dictionary of callables to use as
+        custom getters inside the module.
+      name: string. Name for this module.
+
+    Raises:
+      ValueError: if `combiner` is invalid, or if `embed_dim` is not divisible
+        by `num_hashes` with the 'concat' combiner.
+    """
+    super(HashEmbed, self).__init__(custom_getter=custom_getter, name=name)
+    _check_combiner(combiner, self.COMBINERS)
+    if combiner == "concat" and embed_dim % num_hashes:
+      raise ValueError("embed_dim={} must be divisible by num_hashes={} with "
+                       "the 'concat' combiner.".format(embed_dim, num_hashes))
+    self._num_buckets = num_buckets
+    self._embed_dim = embed_dim
+    self._num_hashes = num_hashes
+    self._combiner = combiner
+
+    # Parameters of the universal hash functions of integer ids, and keys of
+    # the hash functions of string ids.
+    random_state = np.random.RandomState(seed)
+    self._hash_params = random_state.randint(
+        1, _HASH_PRIME, size=[num_hashes, _NUM_ID_WORDS + 1]).astype(np.int64)
+    self._hash_keys = random_state.randint(
+        0, 2**31, size=[num_hashes, 2]).tolist()
+
+    self._initializers = util.check_initializers(
+        initializers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._partitioners = util.check_partitioners(
+        partitioners, self.POSSIBLE_INITIALIZER_KEYS)
+    self._regularizers = util.check_regularizers(
+        regularizers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._trainable = trainable
+
+  def _hash(self, ids):
+    """Returns the `[num_hashes] + ids.shape` buckets of `ids`."""
+    if ids.dtype == tf.string:
+      return tf.stack([_string_to_ids(ids, self._num_buckets, key)
+                       for key in self._hash_keys])
+    ids = tf.to_int64(ids)
+    words = [tf.bitwise.bitwise_and(
+        tf.bitwise.right_shift(ids, _ID_WORD_BITS * i),
+        2**_ID_WORD_BITS - 1) for i in range(_NUM_ID_WORDS)]
+    buckets = []
+    for params in self._hash_params:
+      # Reducing after each term keeps the products within int64.
+      hashed_ids = tf.fill(tf.shape(ids), tf.constant(params[-1], tf.int64))
+      for a, word in zip(params[:-1], words):
+        hashed_ids = tf.floormod(hashed_ids + word * int(a), _HASH_PRIME)
+      buckets.append(tf.floormod(hashed_ids, self._num_buckets))
+    return tf.stack(buckets)
+
+  def _build(self, ids):
+    """Lookup embeddings.
+
+    Args:
+      ids: Tensor of integer or string ids.
+
+    Returns:
+      Tensor of tf.shape(ids) + [embed_dim] and dtype float32.
+    """
+    if self._combiner == "concat":
+      table_dim = self._embed_dim // self._num_hashes
+    else:
+      table_dim = self._embed_dim
+    if self.EMBEDDINGS not in self._initializers:
+      self._initializers[self.EMBEDDINGS] = tf.initializers.random_normal()
+    self._embeddings = tf.get_variable(
+        "embeddings",
+        shape=[self._num_buckets, table_dim],
+        dtype=tf.float32,
+        initializer=self._initializers[self.EMBEDDINGS],
+        partitioner=self._partitioners.get(self.EMBEDDINGS, None),
+        regularizer=self._regularizers.get(self.EMBEDDINGS, None),
+        trainable=self._trainable)
+
+    ids = tf.convert_to_tensor(ids)
+    hashed_embeddings = tf.nn.embedding_lookup(
+        self._embeddings, self._hash(ids), name="embedding_lookup")
+    hashed_embeddings = tf.unstack(hashed_embeddings, self._num_hashes)
+    if self._combiner == "sum":
+      return tf.add_n(hashed_embeddings)
+    return tf.concat(hashed_embeddings, axis=-1)
+
+  @property
+  def num_buckets(self):
+    """Number of rows of the embeddings table."""
+    return self._num_buckets
+
+  @property
+  def embed_dim(self):
+    """Size of embedding vectors."""
+    return self._embed_dim
+
+  @property
+  def num_hashes(self):
+    """Number of hash functions."""
+    return self._num_hashes
+
+  @property
+  def embeddings(self):
+    """Returns the Variable containing the embeddings table.
+
+    Returns:
+      A 2D Variable with `num_buckets` rows, constructed in the most recent
+        __call__.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._embeddings
+
+
+class QuotientRemainderEmbed(base.AbstractModule):
+  """Module embedding ids as the combination of a quotient and a remainder.
+
+  The embedding of an id combines the row `id // num_buckets` of a quotient
+  table and the row `id % num_buckets` of a remainder table. Since no two ids
+  have the same quotient and remainder, every id of the vocabulary has a
+  unique embedding, while only storing about
+  `vocab_size / num_buckets + num_buckets` rows.
+
+  Integer ids are taken modulo `vocab_size`, and string ids are hashed into
+  `[0, vocab_size)` by `tf.string_to_hash_bucket_fast`.
+  """
+
+  QUOTIENT_EMBEDDINGS = "quotient_embeddings"
+  REMAINDER_EMBEDDINGS = "remainder_embeddings"
+  POSSIBLE_INITIALIZER_KEYS = {QUOTIENT_EMBEDDINGS, REMAINDER_EMBEDDINGS}
+  COMBINERS = {"mul", "sum", "concat"}
+
+  def __init__(self,
+               vocab_size,
+               embed_dim,
+               num_buckets,
+               combiner="mul",
+               initializers=None,
+               partitioners=None,
+               regularizers=None,
+               trainable=True,
+               custom_getter=None,
+               name="quotient_remainder_embed"):
+    """Constructs a QuotientRemainderEmbed module.
+
+    Args:
+      vocab_size: int. Number of unique ids to embed.
+      embed_dim: int. Number of dimensions of the output embeddings.
+      num_buckets: int. Number of rows of the remainder table.
+      combiner: 'mul' or 'sum' to multiply or sum the rows of the tables,
+        each of `embed_dim` dimensions, or 'concat' to concatenate them, each
+        of `embed_dim // 2` dimensions.
+      initializers: Optional dict containing initializers for the tables (with
+        keys 'quotient_embeddings' and 'remainder_embeddings'). As a default,
+        the tables are initialized via a normal distribution.
+      partitioners: Optional dict containing partitioners for the tables (with
+        keys 'quotient_embeddings' and 'remainder_embeddings'). As a default,
+        no partitioners are used.
+      regularizers: Optional dict containing regularizers for the tables (with
+        keys 'quotient_embeddings' and 'remainder_embeddings'). As a default,
+        no regularizers are used.
+      trainable: if True, the embeddings will be updated during training.
+      custom_getter: Callable or dictionary of callables to use as
+        custom getters inside the module.
+      name: string. Name for this module.
+
+    Raises:
+      ValueError: if `combiner` is invalid, or if `embed_dim` is odd with the
+        'concat' combiner.
+    """
+    super(QuotientRemainderEmbed, self).__init__(
+        custom_getter=custom_getter, name=name)
+    _check_combiner(combiner, self.COMBINERS)
+    if combiner == "concat" and embed_dim % 2:
+      raise ValueError("embed_dim={} must be even with the 'concat' "
+                       "combiner.".format(embed_dim))
+    self._vocab_size = vocab_size
+    self._embed_dim = embed_dim
+    self._num_buckets = num_buckets
+    self._combiner = combiner
+
+    self._initializers = util.check_initializers(
+        initializers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._partitioners = util.check_partitioners(
+        partitioners, self.POSSIBLE_INITIALIZER_KEYS)
+    self._regularizers = util.check_regularizers(
+        regularizers, self.POSSIBLE_INITIALIZER_KEYS)
+    self._trainable = trainable
+
+  def _get_table(self, key, num_rows, table_dim):
+    if key not in self._initializers:
+      self._initializers[key] = tf.initializers.random_normal()
+    return tf.get_variable(
+        key,
+        shape=[num_rows, table_dim],
+        dtype=tf.float32,
+        initializer=self._initializers[key],
+        partitioner=self._partitioners.get(key, None),
+        regularizer=self._regularizers.get(key, None),
+        trainable=self._trainable)
+
+  def _build(self, ids):
+    """Lookup embeddings.
+
+    Args:
+      ids: Tensor of integer or string ids.
+
+    Returns:
+      Tensor of tf.shape(ids) + [embed_dim] and dtype float32.
+    """
+    if self._combiner == "concat":
+      table_dim = self._embed_dim // 2
+    else:
+      table_dim = self._embed_dim
+    num_quotients = -(-self._vocab_size // self._num_buckets)
+    self._quotient_embeddings = self._get_table(
+        self.QUOTIENT_EMBEDDINGS, num_quotients, table_dim)
+    self._remainder_embeddings = self._get_table(
+        self.REMAINDER_EMBEDDINGS, self._num_buckets, table_dim)
+
+    ids = tf.convert_to_tensor(ids)
+    if ids.dtype == tf.string:
+      ids = _string_to_ids(ids, self._vocab_size)
+    else:
+      ids = tf.floormod(tf.to_int64(ids), self._vocab_size)
+    quotient_embeddings = tf.nn.embedding_lookup(
+        self._quotient_embeddings, ids // self._num_buckets,
+        name="quotient_embedding_lookup")
+    remainder_embeddings = tf.nn.embedding_lookup(
+        self._remainder_embeddings, ids % self._num_buckets,
+        name="remainder_embedding_lookup")
+
+    if self._combiner == "mul":
+      return quotient_embeddings * remainder_embeddings
+    elif self._combiner == "sum":
+      return quotient_embeddings + remainder_embeddings
+    return tf.concat([quotient_embeddings, remainder_embeddings], axis=-1)
+
+  @property
+  def vocab_size(self):
+    """Size of input vocabulary."""
+    return self._vocab_size
+
+  @property
+  def embed_dim(self):
+    """Size of embedding vectors."""
+    return self._embed_dim
+
+  @property
+  def num_buckets(self):
+    """Number of rows of the remainder table."""
+    return self._num_buckets
+
+  @property
+  def quotient_embeddings(self):
+    """Returns the Variable containing the quotient table.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._quotient_embeddings
+
+  @property
+  def remainder_embeddings(self):
+    """Returns the Variable containing the remainder table.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._remainder_embeddings
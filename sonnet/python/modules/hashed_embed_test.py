@@ -0,0 +1,172 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.hashed_embed."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+from sonnet.python.modules import hashed_embed
+import tensorflow as tf
+
+
+class HashEmbedTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters(("sum", 8), ("concat", 4))
+  def testIntegerIds(self, combiner, table_dim):
+    embed_mod = snt.HashEmbed(num_buckets=11, embed_dim=8, num_hashes=2,
+                              combiner=combiner)
+    ids = np.array([[0, 5, 2**40], [-3, 7, 5]])
+    embeddings = embed_mod(tf.constant(ids))
+    self.assertEqual(embeddings.get_shape().as_list(), [2, 3, 8])
+    self.assertEqual(embed_mod.embeddings.get_shape().as_list(),
+                     [11, table_dim])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_, table = sess.run([embeddings, embed_mod.embeddings])
+
+    # pylint: disable=protected-access
+    hashed_embeddings = []
+    words = [np.bitwise_and(np.right_shift(ids, 16 * i), 2**16 - 1)
+             for i in range(4)]
+    for params in embed_mod._hash_params:
+      buckets = np.full(ids.shape, params[-1], dtype=np.int64)
+      for a, word in zip(params[:-1], words):
+        buckets = np.mod(buckets + word * a, hashed_embed._HASH_PRIME)
+      hashed_embeddings.append(table[np.mod(buckets, 11)])
+    # pylint: enable=protected-access
+    if combiner == "sum":
+      expected_embeddings = sum(hashed_embeddings)
+    else:
+      expected_embeddings = np.concatenate(hashed_embeddings, axis=-1)
+    self.assertAllClose(embeddings_, expected_embeddings)
+    self.assertAllClose(embeddings_[0, 1], embeddings_[1, 2])
+
+  def testLargeIdsDifferingByHashPrime(self):
+    embed_mod = snt.HashEmbed(num_buckets=1000, embed_dim=4, num_hashes=2)
+    # pylint: disable=protected-access
+    ids = np.array([2**40, 2**40 + hashed_embed._HASH_PRIME,
+                    2**31, 2**31 + hashed_embed._HASH_PRIME])
+    # pylint: enable=protected-access
+    embeddings = embed_mod(tf.constant(ids))
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_ = sess.run(embeddings)
+    self.assertFalse(np.allclose(embeddings_[0], embeddings_[1]))
+    self.assertFalse(np.allclose(embeddings_[2], embeddings_[3]))
+
+  def testStringIds(self):
+    embed_mod = snt.HashEmbed(num_buckets=1000, embed_dim=4, num_hashes=3)
+    embeddings = embed_mod(tf.constant(["a", "b", "a"]))
+    self.assertEqual(embeddings.get_shape().as_list(), [3, 4])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_ = sess.run(embeddings)
+    self.assertAllClose(embeddings_[0], embeddings_[2])
+    self.assertFalse(np.allclose(embeddings_[0], embeddings_[1]))
+
+  def testPartitioners(self):
+    embed_mod = snt.HashEmbed(
+        num_buckets=10, embed_dim=4,
+        partitioners={"embeddings": tf.fixed_size_partitioner(2)})
+    embeddings = embed_mod(tf.constant([1, 2, 3]))
+    self.assertLen(list(embed_mod.embeddings), 2)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(embeddings)
+
+  def testInvalidCombiner(self):
+    with self.assertRaisesRegexp(ValueError, "Invalid combiner 'mean'"):
+      snt.HashEmbed(num_buckets=10, embed_dim=4, combiner="mean")
+    with self.assertRaisesRegexp(ValueError, "must be divisible"):
+      snt.HashEmbed(num_buckets=10, embed_dim=5, num_hashes=2,
+                    combiner="concat")
+
+
+class QuotientRemainderEmbedTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters("mul", "sum", "concat")
+  def testIntegerIds(self, combiner):
+    embed_mod = snt.QuotientRemainderEmbed(
+        vocab_size=100, embed_dim=6, num_buckets=8, combiner=combiner)
+    ids = np.array([[0, 9, 99], [42, 7, 142]])
+    embeddings = embed_mod(tf.constant(ids))
+    self.assertEqual(embeddings.get_shape().as_list(), [2, 3, 6])
+    table_dim = 3 if combiner == "concat" else 6
+    self.assertEqual(embed_mod.quotient_embeddings.get_shape().as_list(),
+                     [13, table_dim])
+    self.assertEqual(embed_mod.remainder_embeddings.get_shape().as_list(),
+                     [8, table_dim])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_, quotient_table, remainder_table = sess.run(
+          [embeddings, embed_mod.quotient_embeddings,
+           embed_mod.remainder_embeddings])
+
+    ids = ids % 100
+    quotient_embeddings = quotient_table[ids // 8]
+    remainder_embeddings = remainder_table[ids % 8]
+    if combiner == "mul":
+      expected_embeddings = quotient_embeddings * remainder_embeddings
+    elif combiner == "sum":
+      expected_embeddings = quotient_embeddings + remainder_embeddings
+    else:
+      expected_embeddings = np.concatenate(
+          [quotient_embeddings, remainder_embeddings], axis=-1)
+    self.assertAllClose(embeddings_, expected_embeddings)
+
+  def testStringIds(self):
+    embed_mod = snt.QuotientRemainderEmbed(
+        vocab_size=1000, embed_dim=4, num_buckets=32)
+    embeddings = embed_mod(tf.constant([["a", "b"], ["b", "c"]]))
+    self.assertEqual(embeddings.get_shape().as_list(), [2, 2, 4])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      embeddings_ = sess.run(embeddings)
+    self.assertAllClose(embeddings_[0, 1], embeddings_[1, 0])
+
+  def testInitializersAndRegularizers(self):
+    regularizer = tf.contrib.layers.l1_regularizer(scale=0.5)
+    embed_mod = snt.QuotientRemainderEmbed(
+        vocab_size=100, embed_dim=4, num_buckets=10,
+        initializers={"quotient_embeddings": tf.ones_initializer(),
+                      "remainder_embeddings": tf.ones_initializer()},
+        regularizers={"remainder_embeddings": regularizer})
+    embeddings = embed_mod(tf.constant([3, 50]))
+    self.assertLen(tf.get_collection(tf.GraphKeys.REGULARIZATION_LOSSES), 1)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self.assertAllClose(sess.run(embeddings), np.ones([2, 4]))
+
+  def testInvalidInitializerKeys(self):
+    with self.assertRaisesRegexp(KeyError, "Invalid initializer keys.*"):
+      snt.QuotientRemainderEmbed(
+          vocab_size=100, embed_dim=4, num_buckets=10,
+          initializers={"embeddings": tf.ones_initializer()})
+
+
+if __name__ == "__main__":
+  tf.test.main()
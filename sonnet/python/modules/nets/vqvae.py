@@ -26,6 +26,219 @@ import tensorflow as tf
 from tensorflow.python.training import moving_averages
 
 
+def _nearest_embedding_indices(flat_inputs, w, chunk_size=None):
+  """Returns the indices of the columns of `w` closest to `flat_inputs`.
+
+  Args:
+    flat_inputs: Tensor of shape [N, embedding_dim].
+    w: Tensor of shape [embedding_dim, num_embeddings].
+    chunk_size: If given, the distances are computed for chunks of
+      `chunk_size` embeddings at a time, keeping only the running minima, so
+      that the [N, num_embeddings] distance matrix is never materialized.
+
+  Returns:
+    int64 Tensor of shape [N].
+  """
+  num_embeddings = w.get_shape()[1].value
+  if chunk_size is None or chunk_size >= num_embeddings:
+    distances = (tf.reduce_sum(flat_inputs**2, 1, keepdims=True)
+                 - 2 * tf.matmul(flat_inputs, w)
+                 + tf.reduce_sum(w ** 2, 0, keepdims=True))
+    return tf.argmax(- distances, 1)
+
+  def body(start, best_distances, best_indices):
+    w_chunk = w[:, start:start + chunk_size]
+    # The norms of the inputs do not change the closest embeddings.
+    distances = (- 2 * tf.matmul(flat_inputs, w_chunk)
+                 + tf.reduce_sum(w_chunk ** 2, 0, keepdims=True))
+    chunk_distances = tf.reduce_min(distances, 1)
+    chunk_indices = tf.argmin(distances, 1, output_type=tf.int32) + start
+    closer = chunk_distances < best_distances
+    return (start + chunk_size,
+            tf.where(closer, chunk_distances, best_distances),
+            tf.where(closer, chunk_indices, best_indices))
+
+  num_inputs = tf.shape(flat_inputs)[:1]
+  _, _, indices = tf.while_loop(
+      lambda start, unused_distances, unused_indices: start < num_embeddings,
+      body,
+      [tf.constant(0),
+       tf.fill(num_inputs, float('inf')),
+       tf.zeros(num_inputs, dtype=tf.int32)],
+      back_prop=False,
+      # Only one block of distances is held in memory at a time.
+      parallel_iterations=1)
+  return tf.to_int64(indices)
+
+
+def _encoding_counts(flat_encoding_indices, num_embeddings):
+  """Returns the number of inputs mapped to each embedding."""
+  return tf.unsorted_segment_sum(
+      tf.ones_like(flat_encoding_indices, dtype=tf.float32),
+      flat_encoding_indices, num_embeddings)
+
+
+def _perplexity(encoding_counts):
+  avg_probs = encoding_counts / tf.reduce_sum(encoding_counts)
+  return tf.exp(- tf.reduce_sum(avg_probs * tf.log(avg_probs + 1e-10)))
+
+
+class _CodebookIndex(object):
+  """Inverted file index over the embeddings, for approximate search.
+
+  The embeddings are clustered by k-means into `num_clusters` clusters, and
+  each input is only compared to the embeddings of the `num_probes` clusters
+  whose centroids are closest to it. The clustering is refreshed every
+  `refresh_interval` training steps, starting from the previous
+  centroids.
+  """
+
+  def __init__(self, embedding_dim, num_embeddings, num_clusters, num_probes,
+               refresh_interval, kmeans_iterations):
+    if not 0 < num_probes <= num_clusters <= num_embeddings:
+      raise ValueError(
+          'Expected 0 < num_index_probes <= num_index_clusters <= '
+          'num_embeddings, got {}, {} and {}.'.format(
+              num_probes, num_clusters, num_embeddings))
+    self._num_embeddings = num_embeddings
+    self._num_clusters = num_clusters
+    self._num_probes = num_probes
+    self._refresh_interval = refresh_interval
+    self._kmeans_iterations = kmeans_iterations
+
+    self._centroids = tf.get_variable(
+        'index_centroids', [embedding_dim, num_clusters],
+        initializer=tf.zeros_initializer(), trainable=False)
+    self._assignments = tf.get_variable(
+        'index_assignments', [num_embeddings], dtype=tf.int32,
+        initializer=tf.zeros_initializer(), trainable=False)
+    self._step = tf.get_variable(
+        'index_step', [], dtype=tf.int64,
+        initializer=tf.zeros_initializer(), trainable=False)
+
+  def _kmeans(self, w):
+    """Clusters the columns of `w`, starting from the current centroids."""
+    points = tf.transpose(w, [1, 0])
+    random_centroids = tf.gather(
+        points, tf.random_shuffle(tf.range(self._num_embeddings))[
+            :self._num_clusters])
+    centroids = tf.cond(
+        tf.equal(self._step, 0),
+        lambda: random_centroids,
+        lambda: tf.transpose(self._centroids.read_value(), [1, 0]))
+    for _ in range(self._kmeans_iterations):
+      assignments = _nearest_embedding_indices(
+          points, tf.transpose(centroids, [1, 0]))
+      sums = tf.unsorted_segment_sum(points, assignments, self._num_clusters)
+      counts = tf.unsorted_segment_sum(
+          tf.ones([self._num_embeddings]), assignments, self._num_clusters)
+      # Empty clusters keep their centroids.
+      centroids = tf.where(
+          counts > 0, sums / tf.maximum(counts, 1)[:, None], centroids)
+    centroids = tf.transpose(centroids, [1, 0])
+    assignments = _nearest_embedding_indices(points, centroids)
+    return centroids, tf.to_int32(assignments)
+
+  def _refresh(self, w):
+    """Returns the centroids and assignments, refreshed when it is time."""
+    def refresh():
+      centroids, assignments = self._kmeans(w)
+      return (tf.assign(self._centroids, centroids),
+              tf.assign(self._assignments, assignments))
+
+    def keep():
+      return (tf.identity(self._centroids), tf.identity(self._assignments))
+
+    centroids, assignments = tf.cond(
+        tf.equal(self._step % self._refresh_interval, 0), refresh, keep)
+    with tf.control_dependencies([centroids, assignments]):
+      increment_step = tf.assign_add(self._step, 1)
+    with tf.control_dependencies([increment_step]):
+      return tf.identity(centroids), tf.identity(assignments)
+
+  def search(self, flat_inputs, w, is_training):
+    """Returns the indices of the (approximately) closest embeddings.
+
+    Args:
+      flat_inputs: Tensor of shape [N, embedding_dim].
+      w: Tensor of shape [embedding_dim, num_embeddings].
+      is_training: boolean, whether to refresh the index when it is time.
+
+    Returns:
+      int64 Tensor of shape [N].
+    """
+    if is_training:
+      centroids, assignments = self._refresh(w)
+    else:
+      centroids = self._centroids.read_value()
+      assignments = self._assignments.read_value()
+
+    # Empty clusters are never probed.
+    cluster_sizes = tf.unsorted_segment_sum(
+        tf.ones_like(assignments), assignments, self._num_clusters)
+    centroid_distances = (
+        - 2 * tf.matmul(flat_inputs, centroids)
+        + tf.reduce_sum(centroids ** 2, 0, keepdims=True)
+        + tf.where(cluster_sizes > 0,
+                   tf.zeros([self._num_clusters]),
+                   tf.fill([self._num_clusters], float('inf')))[None, :])
+    _, probes = tf.nn.top_k(- centroid_distances, k=self._num_probes)
+
+    num_inputs = tf.shape(flat_inputs)[:1]
+
+    def body(cluster, best_distances, best_indices):
+      """Updates the closest embeddings of the inputs probing `cluster`."""
+      members = tf.to_int32(tf.reshape(
+          tf.where(tf.equal(assignments, cluster)), [-1]))
+      # A padding member, at an infinite distance, handles empty clusters.
+      members = tf.concat([members, [0]], 0)
+      member_w = tf.gather(w, members, axis=1)
+      member_norms = tf.concat([
+          tf.reduce_sum(member_w[:, :-1] ** 2, 0), [float('inf')]], 0)
+
+      rows = tf.to_int32(tf.reshape(
+          tf.where(tf.reduce_any(tf.equal(probes, cluster), 1)), [-1]))
+      distances = (- 2 * tf.matmul(tf.gather(flat_inputs, rows), member_w)
+                   + member_norms[None, :])
+      row_distances = tf.reduce_min(distances, 1)
+      row_indices = tf.gather(members, tf.argmin(distances, 1))
+
+      closer = row_distances < tf.gather(best_distances, rows)
+      closer_rows = tf.boolean_mask(rows, closer)[:, None]
+      is_closer = tf.scatter_nd(
+          closer_rows, tf.ones_like(closer_rows[:, 0]), num_inputs) > 0
+      return (
+          cluster + 1,
+          tf.where(is_closer,
+                   tf.scatter_nd(closer_rows,
+                                 tf.boolean_mask(row_distances, closer),
+                                 num_inputs),
+                   best_distances),
+          tf.where(is_closer,
+                   tf.scatter_nd(closer_rows,
+                                 tf.boolean_mask(row_indices, closer),
+                                 num_inputs),
+                   best_indices))
+
+    _, _, indices = tf.while_loop(
+        lambda cluster, unused_distances, unused_indices: (
+            cluster < self._num_clusters),
+        body,
+        [tf.constant(0),
+         tf.fill(num_inputs, float('inf')),
+         tf.zeros(num_inputs, dtype=tf.int32)],
+        back_prop=False,
+        parallel_iterations=1)
+    return tf.to_int64(indices)
+
+
+def _find_encoding_indices(flat_inputs, w, index, chunk_size, is_training):
+  """Returns the indices of the embeddings closest to `flat_inputs`."""
+  if index is not None:
+    return index.search(flat_inputs, w, is_training)
+  return _nearest_embedding_indices(flat_inputs, w, chunk_size)
+
+
 class VectorQuantizer(base.AbstractModule):
   """Sonnet module representing the VQ-VAE layer.
 
@@ -49,19 +262,46 @@ class VectorQuantizer(base.AbstractModule):
     num_embeddings: integer, the number of vectors in the quantized space.
     commitment_cost: scalar which controls the weighting of the loss terms
       (see equation 4 in the paper - this variable is Beta).
+    name: name of the module.
+    codebook_chunk_size: integer or None. If given, the closest embeddings are
+      found by scanning the codebook in chunks of this many embeddings, so
+      that the distances between all inputs and all embeddings are never held
+      in memory at once. The result is the same as the exact search.
+    num_index_clusters: integer or None. If given, the closest embeddings are
+      found approximately: the embeddings are clustered by k-means into this
+      many clusters, and each input is only compared to the embeddings of its
+      `num_index_probes` closest clusters.
+    num_index_probes: integer, the number of clusters searched for each input.
+      Searching all clusters gives the same result as the exact search.
+    index_refresh_interval: integer, the clusters are recomputed every this
+      many training steps, starting from the previous clusters.
+    index_kmeans_iterations: integer, the number of k-means iterations of each
+      refresh of the clusters.
+    output_encodings: boolean, whether to return the one-hot `encodings`,
+      which have shape [N, num_embeddings].
   """
 
   def __init__(self, embedding_dim, num_embeddings, commitment_cost,
-               name='vq_layer'):
+               name='vq_layer', codebook_chunk_size=None,
+               num_index_clusters=None, num_index_probes=1,
+               index_refresh_interval=100, index_kmeans_iterations=5,
+               output_encodings=True):
     super(VectorQuantizer, self).__init__(name=name)
     self._embedding_dim = embedding_dim
     self._num_embeddings = num_embeddings
     self._commitment_cost = commitment_cost
+    self._codebook_chunk_size = codebook_chunk_size
+    self._output_encodings = output_encodings
 
     with self._enter_variable_scope():
       initializer = tf.uniform_unit_scaling_initializer()
       self._w = tf.get_variable('embedding', [embedding_dim, num_embeddings],
                                 initializer=initializer, trainable=True)
+      self._index = None
+      if num_index_clusters is not None:
+        self._index = _CodebookIndex(
+            embedding_dim, num_embeddings, num_index_clusters,
+            num_index_probes, index_refresh_interval, index_kmeans_iterations)
 
   def _build(self, inputs, is_training):
     """Connects the module to some inputs.
@@ -77,7 +317,8 @@ class VectorQuantizer(base.AbstractModule):
         loss: Tensor containing the loss to optimize.
         perplexity: Tensor containing the perplexity of the encodings.
         encodings: Tensor containing the discrete encodings, ie which element
-          of the quantized space each input element was mapped to.
+          of the quantized space each input element was mapped to. Only
+          present if the module was constructed with `output_encodings=True`.
         encoding_indices: Tensor containing the discrete encoding indices, ie
           which element of the quantized space each input element was mapped to.
     """
@@ -88,13 +329,13 @@ class VectorQuantizer(base.AbstractModule):
                   [input_shape])]):
       flat_inputs = tf.reshape(inputs, [-1, self._embedding_dim])
 
-    distances = (tf.reduce_sum(flat_inputs**2, 1, keepdims=True)
-                 - 2 * tf.matmul(flat_inputs, self._w)
-                 + tf.reduce_sum(self._w ** 2, 0, keepdims=True))
-
-    encoding_indices = tf.argmax(- distances, 1)
-    encodings = tf.one_hot(encoding_indices, self._num_embeddings)
-    encoding_indices = tf.reshape(encoding_indices, tf.shape(inputs)[:-1])
+    flat_encoding_indices = _find_encoding_indices(
+        flat_inputs, self._w, self._index, self._codebook_chunk_size,
+        is_training)
+    encoding_counts = _encoding_counts(flat_encoding_indices,
+                                       self._num_embeddings)
+    encoding_indices = tf.reshape(flat_encoding_indices,
+                                  tf.shape(inputs)[:-1])
     quantized = self.quantize(encoding_indices)
 
     e_latent_loss = tf.reduce_mean((tf.stop_gradient(quantized) - inputs) ** 2)
@@ -102,14 +343,16 @@ class VectorQuantizer(base.AbstractModule):
     loss = q_latent_loss + self._commitment_cost * e_latent_loss
 
     quantized = inputs + tf.stop_gradient(quantized - inputs)
-    avg_probs = tf.reduce_mean(encodings, 0)
-    perplexity = tf.exp(- tf.reduce_sum(avg_probs * tf.log(avg_probs + 1e-10)))
+    perplexity = _perplexity(encoding_counts)
 
-    return {'quantize': quantized,
-            'loss': loss,
-            'perplexity': perplexity,
-            'encodings': encodings,
-            'encoding_indices': encoding_indices,}
+    outputs = {'quantize': quantized,
+               'loss': loss,
+               'perplexity': perplexity,
+               'encoding_indices': encoding_indices,}
+    if self._output_encodings:
+      outputs['encodings'] = tf.one_hot(flat_encoding_indices,
+                                        self._num_embeddings)
+    return outputs
 
   @property
   def embeddings(self):
@@ -153,16 +396,38 @@ class VectorQuantizerEMA(base.AbstractModule):
       equation 4 in the paper).
     decay: float, decay for the moving averages.
     epsilon: small float constant to avoid numerical instability.
+    name: name of the module.
+    codebook_chunk_size: integer or None. If given, the closest embeddings are
+      found by scanning the codebook in chunks of this many embeddings, so
+      that the distances between all inputs and all embeddings are never held
+      in memory at once. The result is the same as the exact search.
+    num_index_clusters: integer or None. If given, the closest embeddings are
+      found approximately: the embeddings are clustered by k-means into this
+      many clusters, and each input is only compared to the embeddings of its
+      `num_index_probes` closest clusters.
+    num_index_probes: integer, the number of clusters searched for each input.
+      Searching all clusters gives the same result as the exact search.
+    index_refresh_interval: integer, the clusters are recomputed every this
+      many training steps, starting from the previous clusters.
+    index_kmeans_iterations: integer, the number of k-means iterations of each
+      refresh of the clusters.
+    output_encodings: boolean, whether to return the one-hot `encodings`,
+      which have shape [N, num_embeddings].
   """
 
   def __init__(self, embedding_dim, num_embeddings, commitment_cost, decay,
-               epsilon=1e-5, name='VectorQuantizerEMA'):
+               epsilon=1e-5, name='VectorQuantizerEMA',
+               codebook_chunk_size=None, num_index_clusters=None,
+               num_index_probes=1, index_refresh_interval=100,
+               index_kmeans_iterations=5, output_encodings=True):
     super(VectorQuantizerEMA, self).__init__(name=name)
     self._embedding_dim = embedding_dim
     self._num_embeddings = num_embeddings
     self._decay = decay
     self._commitment_cost = commitment_cost
     self._epsilon = epsilon
+    self._codebook_chunk_size = codebook_chunk_size
+    self._output_encodings = output_encodings
 
     with self._enter_variable_scope():
       initializer = tf.random_normal_initializer()
@@ -177,6 +442,11 @@ class VectorQuantizerEMA(base.AbstractModule):
           initializer=tf.constant_initializer(0), use_resource=True)
       self._ema_w = tf.get_variable(
           'ema_dw', initializer=self._w.initialized_value(), use_resource=True)
+      self._index = None
+      if num_index_clusters is not None:
+        self._index = _CodebookIndex(
+            embedding_dim, num_embeddings, num_index_clusters,
+            num_index_probes, index_refresh_interval, index_kmeans_iterations)
 
   def _build(self, inputs, is_training):
     """Connects the module to some inputs.
@@ -194,7 +464,8 @@ class VectorQuantizerEMA(base.AbstractModule):
         loss: Tensor containing the loss to optimize.
         perplexity: Tensor containing the perplexity of the encodings.
         encodings: Tensor containing the discrete encodings, ie which element
-          of the quantized space each input element was mapped to.
+          of the quantized space each input element was mapped to. Only
+          present if the module was constructed with `output_encodings=True`.
         encoding_indices: Tensor containing the discrete encoding indices, ie
           which element of the quantized space each input element was mapped to.
     """
@@ -211,20 +482,20 @@ class VectorQuantizerEMA(base.AbstractModule):
                   [input_shape])]):
       flat_inputs = tf.reshape(inputs, [-1, self._embedding_dim])
 
-    distances = (tf.reduce_sum(flat_inputs**2, 1, keepdims=True)
-                 - 2 * tf.matmul(flat_inputs, w)
-                 + tf.reduce_sum(w ** 2, 0, keepdims=True))
-
-    encoding_indices = tf.argmax(- distances, 1)
-    encodings = tf.one_hot(encoding_indices, self._num_embeddings)
-    encoding_indices = tf.reshape(encoding_indices, tf.shape(inputs)[:-1])
+    flat_encoding_indices = _find_encoding_indices(
+        flat_inputs, w, self._index, self._codebook_chunk_size, is_training)
+    encoding_counts = _encoding_counts(flat_encoding_indices,
+                                       self._num_embeddings)
+    encoding_indices = tf.reshape(flat_encoding_indices,
+                                  tf.shape(inputs)[:-1])
     quantized = self.quantize(encoding_indices)
     e_latent_loss = tf.reduce_mean((tf.stop_gradient(quantized) - inputs) ** 2)
 
     if is_training:
       updated_ema_cluster_size = moving_averages.assign_moving_average(
-          self._ema_cluster_size, tf.reduce_sum(encodings, 0), self._decay)
-      dw = tf.matmul(flat_inputs, encodings, transpose_a=True)
+          self._ema_cluster_size, encoding_counts, self._decay)
+      dw = tf.transpose(tf.unsorted_segment_sum(
+          flat_inputs, flat_encoding_indices, self._num_embeddings), [1, 0])
       updated_ema_w = moving_averages.assign_moving_average(self._ema_w, dw,
                                                             self._decay)
       n = tf.reduce_sum(updated_ema_cluster_size)
@@ -242,14 +513,16 @@ class VectorQuantizerEMA(base.AbstractModule):
     else:
       loss = self._commitment_cost * e_latent_loss
     quantized = inputs + tf.stop_gradient(quantized - inputs)
-    avg_probs = tf.reduce_mean(encodings, 0)
-    perplexity = tf.exp(- tf.reduce_sum(avg_probs * tf.log(avg_probs + 1e-10)))
-
-    return {'quantize': quantized,
-            'loss': loss,
-            'perplexity': perplexity,
-            'encodings': encodings,
-            'encoding_indices': encoding_indices,}
+    perplexity = _perplexity(encoding_counts)
+
+    outputs = {'quantize': quantized,
+               'loss': loss,
+               'perplexity': perplexity,
+               'encoding_indices': encoding_indices,}
+    if self._output_encodings:
+      outputs['encodings'] = tf.one_hot(flat_encoding_indices,
+                                        self._num_embeddings)
+    return outputs
 
   @property
   def embeddings(self):
@@ -0,0 +1,97 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for the nearest embedding search of the VQ-VAE layers.
+
+Run with:
+
+  python vqvae_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+EMBEDDING_DIM = 64
+NUM_EMBEDDINGS = 16384
+INPUT_SHAPE = [16, 32, 32, EMBEDDING_DIM]
+CHUNK_SIZE = 1024
+NUM_INDEX_CLUSTERS = 128
+NUM_INDEX_PROBES = 8
+NUM_RUNS = 10
+
+
+class VectorQuantizerBenchmark(tf.test.Benchmark):
+  """Compares the exact, chunked and approximate codebook searches."""
+
+  def _benchmark_search(self, name, **kwargs):
+    inputs_value = np.random.randn(*INPUT_SHAPE).astype(np.float32)
+    with tf.Graph().as_default():
+      vqvae = snt.nets.VectorQuantizerEMA(
+          embedding_dim=EMBEDDING_DIM, num_embeddings=NUM_EMBEDDINGS,
+          commitment_cost=0.25, decay=0.99, **kwargs)
+      inputs = tf.placeholder(tf.float32, INPUT_SHAPE)
+      train_output = vqvae(inputs, is_training=True)
+      test_output = vqvae(inputs, is_training=False)
+      exact_indices = snt.nets.VectorQuantizerEMA(
+          embedding_dim=EMBEDDING_DIM, num_embeddings=NUM_EMBEDDINGS,
+          commitment_cost=0.25, decay=0.99, output_encodings=False,
+          name="exact")(inputs, is_training=False)["encoding_indices"]
+      exact_embeddings = [v for v in tf.global_variables()
+                          if v.op.name == "exact/embedding"][0]
+      copy_embeddings = tf.assign(exact_embeddings, vqvae.embeddings)
+      feed_dict = {inputs: inputs_value}
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up, which also builds the index of the approximate search.
+        sess.run(train_output["loss"], feed_dict=feed_dict)
+
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(test_output["encoding_indices"], feed_dict=feed_dict)
+        search_time = (time.time() - start_time) / NUM_RUNS
+
+        sess.run(copy_embeddings)
+        indices_value, exact_indices_value = sess.run(
+            [test_output["encoding_indices"], exact_indices],
+            feed_dict=feed_dict)
+
+    self.report_benchmark(
+        name=name,
+        iters=NUM_RUNS,
+        wall_time=search_time,
+        extras={"inputs_per_sec": indices_value.size / search_time,
+                "recall": np.mean(indices_value == exact_indices_value)})
+
+  def benchmarkSearch(self):
+    self._benchmark_search("exact")
+    self._benchmark_search("exact_no_encodings", output_encodings=False)
+    self._benchmark_search("chunked", codebook_chunk_size=CHUNK_SIZE,
+                           output_encodings=False)
+    self._benchmark_search(
+        "index", num_index_clusters=NUM_INDEX_CLUSTERS,
+        num_index_probes=NUM_INDEX_PROBES, output_encodings=False)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -119,6 +119,93 @@ class VqvaeTest(parameterized.TestCase, tf.test.TestCase):
         self.assertFalse((prev_w == current_w).all())
         prev_w = current_w
 
+  @parameterized.parameters(
+      (snt.nets.VectorQuantizer,
+       {'embedding_dim': 4, 'num_embeddings': 23,
+        'commitment_cost': 0.25}),
+      (snt.nets.VectorQuantizerEMA,
+       {'embedding_dim': 6, 'num_embeddings': 23,
+        'commitment_cost': 0.5, 'decay': 0.1})
+  )
+  def testChunkedSearch(self, constructor, kwargs):
+    vqvae = constructor(codebook_chunk_size=5, output_encodings=False,
+                        **kwargs)
+    inputs_np = np.random.randn(2, 8, kwargs['embedding_dim'])
+    vq_output = vqvae(tf.constant(inputs_np.astype(np.float32)),
+                      is_training=False)
+    self.assertNotIn('encodings', vq_output)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      vq_output_np, embeddings_np = session.run([vq_output, vqvae.embeddings])
+
+    flat_inputs_np = inputs_np.reshape([-1, kwargs['embedding_dim']])
+    distances = ((flat_inputs_np ** 2).sum(axis=1, keepdims=True)
+                 - 2 * np.dot(flat_inputs_np, embeddings_np)
+                 + (embeddings_np**2).sum(axis=0, keepdims=True))
+    closest_index = np.argmin(distances, axis=1)
+    self.assertAllEqual(closest_index.reshape([2, 8]),
+                        vq_output_np['encoding_indices'])
+
+    avg_probs = np.bincount(
+        closest_index, minlength=kwargs['num_embeddings']) / 16
+    perplexity = np.exp(-np.sum(avg_probs * np.log(avg_probs + 1e-10)))
+    self.assertAllClose(perplexity, vq_output_np['perplexity'])
+
+  @parameterized.parameters(1, 4)
+  def testIndexSearch(self, num_index_probes):
+    embedding_dim = 4
+    vqvae = snt.nets.VectorQuantizer(
+        embedding_dim=embedding_dim, num_embeddings=32, commitment_cost=0.25,
+        num_index_clusters=4, num_index_probes=num_index_probes,
+        index_refresh_interval=2)
+    input_ph = tf.placeholder(tf.float32, [16, embedding_dim])
+    train_output = vqvae(input_ph, is_training=True)
+    test_output = vqvae(input_ph, is_training=False)
+
+    # pylint: disable=protected-access
+    index_variables = [vqvae._index._centroids, vqvae._index._assignments]
+    # pylint: enable=protected-access
+
+    def squared_distances(x, w):
+      return ((x ** 2).sum(axis=1, keepdims=True) - 2 * np.dot(x, w)
+              + (w ** 2).sum(axis=0, keepdims=True))
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      embeddings_np = session.run(vqvae.embeddings)
+      for _ in range(3):
+        inputs_np = np.random.randn(16, embedding_dim)
+        train_indices = session.run(train_output['encoding_indices'],
+                                    {input_ph: inputs_np})
+        # The index is only refreshed by the training connection.
+        test_indices = session.run(test_output['encoding_indices'],
+                                   {input_ph: inputs_np})
+        self.assertAllEqual(train_indices, test_indices)
+
+        distances = squared_distances(inputs_np, embeddings_np)
+        if num_index_probes == 4:
+          # Probing every cluster is an exact search.
+          self.assertAllEqual(train_indices, np.argmin(distances, axis=1))
+          continue
+
+        # Each input is mapped to its closest member of the closest cluster.
+        centroids_np, assignments_np = session.run(index_variables)
+        centroid_distances = squared_distances(inputs_np, centroids_np)
+        empty_clusters = np.bincount(assignments_np, minlength=4) == 0
+        centroid_distances[:, empty_clusters] = np.inf
+        probes = np.argmin(centroid_distances, axis=1)
+        in_probed_cluster = assignments_np[None, :] == probes[:, None]
+        expected_indices = np.argmin(
+            np.where(in_probed_cluster, distances, np.inf), axis=1)
+        self.assertAllEqual(train_indices, expected_indices)
+
+  def testInvalidIndex(self):
+    with self.assertRaisesRegexp(ValueError, 'Expected 0 < num_index_probes'):
+      snt.nets.VectorQuantizer(
+          embedding_dim=4, num_embeddings=8, commitment_cost=0.25,
+          num_index_clusters=2, num_index_probes=3)
+
 
 if __name__ == '__main__':
   tf.test.main()
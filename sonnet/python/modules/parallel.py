@@ -0,0 +1,199 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Data parallel connection of modules across devices.
+
+A `DataParallel` module splits the batch of its inputs across a list of
+devices, e.g. the logical CPU devices of a session configured with
+`tf.ConfigProto(device_count={"CPU": N})`, and connects a module once per
+device. The towers share the variables of the module, which are placed on a
+single parameter device.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from sonnet.python.modules import base
+from sonnet.python.modules import util
+import tensorflow as tf
+
+nest = tf.contrib.framework.nest
+
+# Types of the ops holding the state of variables.
+_VARIABLE_OP_TYPES = frozenset([
+    "AutoReloadVariable", "VarHandleOp", "Variable", "VariableV2",
+])
+
+
+def _tower_device_fn(tower_device, parameter_device):
+  """Returns a device function placing variables on `parameter_device`."""
+  def device_fn(op):
+    if op.type in _VARIABLE_OP_TYPES:
+      return parameter_device
+    return tower_device
+  return device_fn
+
+
+def _average_gradients(gradients):
+  """Averages the gradients of a variable computed by each tower."""
+  if any(gradient is None for gradient in gradients):
+    return None
+  num_towers = len(gradients)
+  if isinstance(gradients[0], tf.IndexedSlices):
+    return tf.IndexedSlices(
+        tf.concat([g.values for g in gradients], axis=0) / num_towers,
+        tf.concat([g.indices for g in gradients], axis=0),
+        gradients[0].dense_shape)
+  return tf.add_n(gradients) / num_towers
+
+
+class DataParallel(base.AbstractModule):
+  """Connects a module once per device, on a split of the batch.
+
+  ```python
+  mlp = snt.nets.MLP([1024, 1024, 10])
+  parallel_mlp = snt.DataParallel(mlp, ["/cpu:0", "/cpu:1", "/cpu:2"])
+
+  # Inference: the outputs of the towers are concatenated.
+  logits = parallel_mlp(images)
+
+  # Training: the gradients of the towers are averaged.
+  def loss_fn(images, labels):
+    return tf.reduce_mean(tf.nn.sparse_softmax_cross_entropy_with_logits(
+        labels=labels, logits=mlp(images)))
+  loss, grads_and_vars = parallel_mlp.compute_gradients(loss_fn, images, labels)
+  train_op = optimizer.apply_gradients(grads_and_vars)
+  ```
+
+  All the `Tensor`s in the arguments are split along their first dimension,
+  whose size must be divisible by the number of devices; other arguments are
+  passed to every tower unchanged.
+  """
+
+  def __init__(self, module, devices, parameter_device="/cpu:0",
+               name="data_parallel"):
+    """Constructs a DataParallel module.
+
+    Args:
+      module: Callable to connect once per device, typically a Sonnet module,
+        whose variables are shared across the towers.
+      devices: Non-empty list of the devices of the towers.
+      parameter_device: Device on which the variables are created, if they are
+        created by the first connection of `module` in this module.
+      name: Name of the module.
+
+    Raises:
+      TypeError: If `module` is not callable.
+      ValueError: If `devices` is empty.
+    """
+    super(DataParallel, self).__init__(name=name)
+    if not callable(module):
+      raise TypeError("Input 'module' must be callable.")
+    self._devices = tuple(devices)
+    if not self._devices:
+      raise ValueError("At least one device is required.")
+    self._module = module
+    self._parameter_device = parameter_device
+
+  def _split(self, args, kwargs):
+    """Returns the arguments of each tower."""
+    num_towers = len(self._devices)
+    flat_inputs = nest.flatten((args, kwargs))
+    flat_splits = [tf.split(x, num_towers, axis=0)
+                   if isinstance(x, tf.Tensor) else [x] * num_towers
+                   for x in flat_inputs]
+    return [nest.pack_sequence_as((args, kwargs), tower_inputs)
+            for tower_inputs in zip(*flat_splits)]
+
+  def _towers(self, fn, args, kwargs):
+    """Calls `fn` on the split arguments under the device of each tower."""
+    tower_outputs = []
+    for i, (tower_args, tower_kwargs) in enumerate(self._split(args, kwargs)):
+      device_fn = _tower_device_fn(self._devices[i], self._parameter_device)
+      with tf.name_scope("tower_{}".format(i)), tf.device(device_fn):
+        tower_outputs.append(fn(*tower_args, **tower_kwargs))
+    return tower_outputs
+
+  def _build(self, *args, **kwargs):
+    """Connects the module on each device.
+
+    Args:
+      *args: Arguments of the module.
+      **kwargs: Keyword arguments of the module.
+
+    Returns:
+      The outputs of the towers, concatenated along their first dimension.
+    """
+    tower_outputs = self._towers(self._module, args, kwargs)
+    return nest.map_structure(lambda *outputs: tf.concat(outputs, axis=0),
+                              *tower_outputs)
+
+  @util.reuse_variables
+  def compute_gradients(self, loss_fn, *args, **kwargs):
+    """Computes the average of the gradients of a loss across the towers.
+
+    The gradients of each tower are computed on its device, and averaged on
+    the parameter device.
+
+    Args:
+      loss_fn: Callable returning a scalar loss, called for each tower with
+        its split of `args` and `kwargs`. It should connect the module.
+      *args: Arguments of `loss_fn`.
+      **kwargs: Keyword arguments of `loss_fn`. A `var_list` keyword argument
+        is not passed to `loss_fn`, but sets the variables to compute the
+        gradients of, by default the trainable variables of the module.
+
+    Returns:
+      The average loss across the towers, and a list of (gradient, variable)
+      pairs for `optimizer.apply_gradients`.
+    """
+    var_list = kwargs.pop("var_list", None)
+
+    def tower_gradients(*tower_args, **tower_kwargs):
+      loss = loss_fn(*tower_args, **tower_kwargs)
+      variables = var_list
+      if variables is None:
+        variables = getattr(self._module, "trainable_variables", None)
+      if variables is None:
+        variables = tf.trainable_variables()
+      variables = list(variables)
+      gradients = tf.gradients(loss, variables,
+                               colocate_gradients_with_ops=True)
+      return loss, list(zip(gradients, variables))
+
+    tower_results = self._towers(tower_gradients, args, kwargs)
+    with tf.device(self._parameter_device):
+      loss = tf.add_n([tower_loss for tower_loss, _ in tower_results])
+      loss /= len(self._devices)
+      grads_and_vars = []
+      for tower_grads_and_vars in zip(*[g for _, g in tower_results]):
+        variable = tower_grads_and_vars[0][1]
+        gradient = _average_gradients([g for g, _ in tower_grads_and_vars])
+        grads_and_vars.append((gradient, variable))
+    return loss, grads_and_vars
+
+  @property
+  def module(self):
+    return self._module
+
+  @property
+  def devices(self):
+    return self._devices
+
+  @property
+  def parameter_device(self):
+    return self._parameter_device
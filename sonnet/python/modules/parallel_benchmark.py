@@ -0,0 +1,98 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for the scaling of DataParallel across logical CPU devices.
+
+Run with:
+
+  python parallel_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+BATCH_SIZE = 256
+NUM_CLASSES = 10
+NUM_RUNS = 10
+MAX_DEVICES = 8
+
+
+class DataParallelBenchmark(tf.test.Benchmark):
+  """Measures the training step time of models split across CPU devices."""
+
+  def _benchmark_data_parallel(self, name, module_fn, input_shape,
+                               num_devices):
+    with tf.Graph().as_default():
+      module = module_fn()
+      inputs = tf.random_normal([BATCH_SIZE] + input_shape)
+      labels = tf.random_uniform([BATCH_SIZE], maxval=NUM_CLASSES,
+                                 dtype=tf.int32)
+
+      def loss_fn(inputs, labels):
+        logits = module(inputs)
+        if logits.get_shape().ndims == 4:
+          # Global average pooling of the ConvNet2D outputs.
+          logits = tf.reduce_mean(logits, axis=[1, 2])
+        return tf.reduce_mean(tf.nn.sparse_softmax_cross_entropy_with_logits(
+            labels=labels, logits=logits))
+
+      devices = ["/cpu:{}".format(i) for i in range(num_devices)]
+      parallel_module = snt.DataParallel(module, devices)
+      _, grads_and_vars = parallel_module.compute_gradients(
+          loss_fn, inputs, labels)
+      train_op = tf.train.GradientDescentOptimizer(0.1).apply_gradients(
+          grads_and_vars)
+
+      config = tf.ConfigProto(device_count={"CPU": MAX_DEVICES})
+      with tf.Session(config=config) as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        sess.run(train_op)
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(train_op)
+        step_time = (time.time() - start_time) / NUM_RUNS
+
+    self.report_benchmark(
+        name="{}_{}_devices".format(name, num_devices),
+        iters=NUM_RUNS,
+        wall_time=step_time,
+        extras={"examples_per_sec": BATCH_SIZE / step_time})
+
+  def benchmarkMLP(self):
+    for num_devices in (1, 2, 4, 8):
+      self._benchmark_data_parallel(
+          "mlp", lambda: snt.nets.MLP([1024, 1024, NUM_CLASSES]), [512],
+          num_devices)
+
+  def benchmarkConvNet2D(self):
+    for num_devices in (1, 2, 4, 8):
+      self._benchmark_data_parallel(
+          "conv_net_2d",
+          lambda: snt.nets.ConvNet2D(  # pylint: disable=g-long-lambda
+              output_channels=[32, 32, NUM_CLASSES], kernel_shapes=[3],
+              strides=[2], paddings=[snt.SAME]),
+          [32, 32, 3], num_devices)
+
+
+if __name__ == "__main__":
+  tf.test.main()
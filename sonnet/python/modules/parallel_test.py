@@ -0,0 +1,86 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.parallel."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+NUM_DEVICES = 2
+DEVICES = ["/cpu:{}".format(i) for i in range(NUM_DEVICES)]
+
+
+class DataParallelTest(tf.test.TestCase):
+
+  def _session(self):
+    config = tf.ConfigProto(device_count={"CPU": NUM_DEVICES})
+    return self.test_session(config=config)
+
+  def testOutputsAndVariables(self):
+    inputs = tf.constant(np.random.randn(6, 5).astype(np.float32))
+    mlp = snt.nets.MLP([4, 3])
+    parallel_mlp = snt.DataParallel(mlp, DEVICES, parameter_device="/cpu:1")
+    outputs = parallel_mlp(inputs)
+    expected_outputs = mlp(inputs)
+
+    self.assertEqual(outputs.get_shape().as_list(), [6, 3])
+    self.assertLen(mlp.variables, 4)
+    for variable in mlp.variables:
+      self.assertEqual(variable.device, "/device:CPU:1")
+    with self._session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self.assertAllClose(*sess.run([outputs, expected_outputs]))
+
+  def testComputeGradients(self):
+    inputs = tf.constant(np.random.randn(6, 5).astype(np.float32))
+    labels = tf.constant(np.random.randint(3, size=6))
+    mlp = snt.nets.MLP([4, 3])
+
+    def loss_fn(inputs, labels):
+      return tf.reduce_mean(tf.nn.sparse_softmax_cross_entropy_with_logits(
+          labels=labels, logits=mlp(inputs)))
+
+    parallel_mlp = snt.DataParallel(mlp, DEVICES)
+    loss, grads_and_vars = parallel_mlp.compute_gradients(
+        loss_fn, inputs, labels)
+    expected_loss = loss_fn(inputs, labels)
+    expected_gradients = tf.gradients(expected_loss,
+                                      [v for _, v in grads_and_vars])
+
+    self.assertLen(grads_and_vars, 4)
+    with self._session() as sess:
+      sess.run(tf.global_variables_initializer())
+      loss, expected_loss, gradients, expected_gradients = sess.run(
+          [loss, expected_loss, [g for g, _ in grads_and_vars],
+           expected_gradients])
+    self.assertAllClose(loss, expected_loss)
+    for gradient, expected_gradient in zip(gradients, expected_gradients):
+      self.assertAllClose(gradient, expected_gradient)
+
+  def testInvalidArguments(self):
+    with self.assertRaisesRegexp(TypeError, "callable"):
+      snt.DataParallel("mlp", DEVICES)
+    with self.assertRaisesRegexp(ValueError, "device"):
+      snt.DataParallel(snt.nets.MLP([4]), [])
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -68,10 +68,18 @@ class ACTCore(rnn_core.RNNCore):
     * `remainder` is the remainder as defined in the ACT paper;
     * `act_out` is the weighted average output of all pondering steps (see ACT
     paper for more info).
+
+  By default every pondering step runs `core` on the whole batch until all of
+  its elements have halted, and the halted elements simply stop contributing to
+  the output. If `compact_batch` is `True`, each pondering step instead gathers
+  the elements that are still running into a smaller batch, runs `core` on it
+  and scatters the results back, so that no computation is spent on halted
+  elements. The number of elements that were still running at each pondering
+  step of the last connection is available as `active_counts`.
   """
 
   def __init__(self, core, output_size, threshold, get_state_for_halting,
-               max_steps=0, name="act_core"):
+               max_steps=0, compact_batch=False, name="act_core"):
     """Constructor.
 
     Args:
@@ -84,6 +92,8 @@ class ACTCore(rnn_core.RNNCore):
           return the input to the halting function.
       max_steps: Integer >= 0, that controls the maximum number of ponder steps.
           If equal to 0, then this disables control.
+      compact_batch: Boolean that indicates whether each ponder step only runs
+          `core` on the batch elements that have not halted yet.
       name: A string. The name of this module.
 
     Raises:
@@ -97,6 +107,7 @@ class ACTCore(rnn_core.RNNCore):
     self._threshold = threshold
     self._get_state_for_halting = get_state_for_halting
     self._max_steps = max_steps
+    self._compact_batch = compact_batch
 
     if not isinstance(self._core.output_size, tf.TensorShape):
       raise ValueError("Output of core should be single Tensor.")
@@ -129,17 +140,36 @@ class ACTCore(rnn_core.RNNCore):
     self._ensure_is_connected()
     return self._dtype
 
+  @property
+  def active_counts(self):
+    """Number of batch elements still running at each ponder step.
+
+    This is an int32 `Tensor` of size `[num_ponder_steps]` for the last
+    connection of the module; its sum is the number of rows `core` was run on
+    when `compact_batch` is `True`, against `num_ponder_steps * batch_size`
+    otherwise. If the module is connected inside a `tf.while_loop` (e.g. by
+    `tf.nn.dynamic_rnn`), it can only be used within that loop. Outside of it,
+    the same counts can be obtained from the `iteration` output, since an
+    element is running at ponder step `k` if its `iteration` is greater than
+    `k`.
+
+    Returns:
+      The active counts of the last connection.
+    """
+    self._ensure_is_connected()
+    return self._active_counts
+
   def _cond(self, unused_x, unused_cumul_out, unused_prev_state,
             unused_cumul_state, cumul_halting, unused_iteration,
-            unused_remainder):
+            unused_remainder, unused_active_counts):
     """The `cond` of the `tf.while_loop`."""
     return tf.reduce_any(cumul_halting < 1)
 
-  def _body(self, x, cumul_out, prev_state, cumul_state,
-            cumul_halting, iteration, remainder, halting_linear, x_ones):
-    """The `body` of `tf.while_loop`."""
+  def _ponder_step(self, x, prev_state, cumul_halting, iteration, remainder,
+                   halting_linear):
+    """Runs the core once and updates the halting values."""
     # Increase iteration count only for those elements that are still running.
-    all_ones = tf.constant(1, shape=(self._batch_size, 1), dtype=self._dtype)
+    all_ones = tf.ones_like(cumul_halting)
     is_iteration_over = tf.equal(cumul_halting, all_ones)
     next_iteration = tf.where(is_iteration_over, iteration, iteration + 1)
     out, next_state = self._core(x, prev_state)
@@ -156,12 +186,59 @@ class ACTCore(rnn_core.RNNCore):
     next_remainder = tf.where(over_threshold, remainder,
                               1 - next_cumul_halting_raw)
     p = next_cumul_halting - cumul_halting
+    return (out, next_state, next_cumul_halting, next_iteration,
+            next_remainder, p)
+
+  def _body(self, x, cumul_out, prev_state, cumul_state,
+            cumul_halting, iteration, remainder, active_counts, halting_linear,
+            x_ones):
+    """The `body` of `tf.while_loop`."""
+    active_counts = active_counts.write(
+        active_counts.size(), tf.count_nonzero(cumul_halting < 1,
+                                               dtype=tf.int32))
+    (out, next_state, next_cumul_halting, next_iteration, next_remainder,
+     p) = self._ponder_step(x, prev_state, cumul_halting, iteration, remainder,
+                            halting_linear)
     next_cumul_state = _nested_add(cumul_state,
                                    _nested_unary_mul(next_state, p))
     next_cumul_out = cumul_out + p * out
 
     return (x_ones, next_cumul_out, next_state, next_cumul_state,
-            next_cumul_halting, next_iteration, next_remainder)
+            next_cumul_halting, next_iteration, next_remainder, active_counts)
+
+  def _compact_body(self, x, cumul_out, prev_state, cumul_state,
+                    cumul_halting, iteration, remainder, active_counts,
+                    halting_linear, x_ones):
+    """The `body` of `tf.while_loop`, only computing the running elements."""
+    is_running = tf.squeeze(cumul_halting < 1, axis=[1])
+    running_indices = tf.to_int32(tf.where(is_running))
+    active_counts = active_counts.write(active_counts.size(),
+                                        tf.shape(running_indices)[0])
+
+    def gather(tensor):
+      return tf.gather_nd(tensor, running_indices)
+
+    def scatter(tensor, running_values):
+      scattered = tf.scatter_nd(running_indices, running_values,
+                                tf.shape(tensor))
+      return tf.where(is_running, scattered, tensor)
+
+    (out, next_state, next_cumul_halting, next_iteration, next_remainder,
+     p) = self._ponder_step(gather(x), nest.map(gather, prev_state),
+                            gather(cumul_halting), gather(iteration),
+                            gather(remainder), halting_linear)
+    next_cumul_state = _nested_add(nest.map(gather, cumul_state),
+                                   _nested_unary_mul(next_state, p))
+    next_cumul_out = gather(cumul_out) + p * out
+
+    return (x_ones,
+            scatter(cumul_out, next_cumul_out),
+            nest.map(scatter, prev_state, next_state),
+            nest.map(scatter, cumul_state, next_cumul_state),
+            scatter(cumul_halting, next_cumul_halting),
+            scatter(iteration, next_iteration),
+            scatter(remainder, next_remainder),
+            active_counts)
 
   def _build(self, x, prev_state):
     """Connects the core to the graph.
@@ -191,7 +268,8 @@ class ACTCore(rnn_core.RNNCore):
     halting_linear = basic.Linear(name="halting_linear", output_size=1)
 
     body = functools.partial(
-        self._body, halting_linear=halting_linear, x_ones=x_ones)
+        self._compact_body if self._compact_batch else self._body,
+        halting_linear=halting_linear, x_ones=x_ones)
     cumul_halting_init = tf.zeros(shape=(self._batch_size, 1),
                                   dtype=self._dtype)
     iteration_init = tf.zeros(shape=(self._batch_size, 1), dtype=self._dtype)
@@ -200,10 +278,14 @@ class ACTCore(rnn_core.RNNCore):
                         dtype=self._dtype)
     cumul_state_init = _nested_zeros_like(prev_state)
     remainder_init = tf.zeros(shape=(self._batch_size, 1), dtype=self._dtype)
+    active_counts_init = tf.TensorArray(tf.int32, size=0, dynamic_size=True)
     (unused_final_x, final_out, unused_final_state, final_cumul_state,
-     unused_final_halting, final_iteration, final_remainder) = tf.while_loop(
+     unused_final_halting, final_iteration, final_remainder,
+     active_counts) = tf.while_loop(
          self._cond, body, [x_zeros, out_init, prev_state, cumul_state_init,
-                            cumul_halting_init, iteration_init, remainder_init])
+                            cumul_halting_init, iteration_init, remainder_init,
+                            active_counts_init])
+    self._active_counts = active_counts.stack()
 
     act_output = basic.Linear(
         name="act_output_linear", output_size=self._output_size)(final_out)
@@ -113,11 +113,11 @@ class ACTCoreTest(tf.test.TestCase, parameterized.TestCase):
     self._test_nested(tf_zeros, zeros)
 
   def _testACT(self, input_size, hidden_size, output_size, seq_len, batch_size,
-               core, get_state_for_halting, max_steps=0):
+               core, get_state_for_halting, max_steps=0, compact_batch=False):
     threshold = 0.99
     act = pondering_rnn.ACTCore(
         core, output_size, threshold, get_state_for_halting,
-        max_steps=max_steps)
+        max_steps=max_steps, compact_batch=compact_batch)
     seq_input = tf.random_uniform(shape=(seq_len, batch_size, input_size))
     initial_state = core.initial_state(batch_size)
     seq_output = tf.nn.dynamic_rnn(
@@ -167,6 +167,47 @@ class ACTCoreTest(tf.test.TestCase, parameterized.TestCase):
     self._testACT(input_size, hidden_size, output_size, seq_len, batch_size,
                   vanilla, get_state, max_steps)
 
+  @parameterized.parameters(0, 2)
+  def testACTCompactBatch(self, max_steps):
+    """Tests ACT with a compact batch inside `tf.nn.dynamic_rnn`."""
+    vanilla = basic_rnn.VanillaRNN(5)
+    self._testACT(3, 5, 4, 3, 6, vanilla, lambda state: state, max_steps,
+                  compact_batch=True)
+
+  def testCompactBatchMatchesFullBatch(self):
+    batch_size = 16
+    hidden_size = 5
+    lstm = gated_rnn.LSTM(hidden_size)
+    get_hidden_state = lambda state: state.hidden
+    full_act = pondering_rnn.ACTCore(
+        lstm, 4, 0.99, get_hidden_state, name="full_act")
+    compact_act = pondering_rnn.ACTCore(
+        lstm, 4, 0.99, get_hidden_state, compact_batch=True,
+        name="compact_act")
+    inputs = tf.random_normal([batch_size, 3])
+    initial_state = lstm.initial_state(batch_size)
+    full_output = full_act(inputs, initial_state)
+    compact_output = compact_act(inputs, initial_state)
+    # Use the same halting and output weights in both cores.
+    copy_weights = [
+        tf.assign(compact_var, full_var) for full_var, compact_var in zip(
+            full_act.get_variables(), compact_act.get_variables())]
+
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate(copy_weights)
+    (full_output, compact_output, full_counts, compact_counts) = self.evaluate(
+        (full_output, compact_output, full_act.active_counts,
+         compact_act.active_counts))
+    nest.map_structure(self.assertAllClose, full_output, compact_output)
+
+    (_, (iteration, _)), _ = compact_output
+    self.assertAllEqual(full_counts, compact_counts)
+    self.assertEqual(compact_counts[0], batch_size)
+    self.assertEqual(compact_counts.sum(), iteration.sum())
+    self.assertAllEqual(
+        compact_counts,
+        [np.sum(iteration > k) for k in range(len(compact_counts))])
+
   def testOutputTuple(self):
     core = OutputTupleCore(name="output_tuple_core")
     err = "Output of core should be single Tensor."
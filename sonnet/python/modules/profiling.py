@@ -0,0 +1,576 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Attribution of the cost of a graph to the Sonnet modules in it.
+
+Every time a module is connected, the name scope of the connection is recorded
+in its `connected_subgraphs`, and the `ModuleInfo` of all the modules of a
+graph is stored in the `SONNET_COLLECTION_NAME` collection. This is used to map
+the ops of a traced `tf.Session` step back to the module which created them:
+
+  output = snt.DeepRNN(...)(...)
+  with tf.Session() as sess:
+    ...
+    _, profiles = snt.profile_modules(sess, train_op)
+  print(snt.format_module_profiles(profiles))
+
+or, without running anything, to estimate the FLOPs and activation memory of
+each module from the static shapes of its ops:
+
+  print(snt.format_cost_estimates(snt.estimate_module_costs()))
+
+Connections which are not recorded, i.e. all the connections of modules with
+`track_connections="none"` and all but the last one with "last", are matched
+to their module by its scope name instead, and reported under a separate
+`UNTRACKED` entry.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import re
+
+# Dependency imports
+from sonnet.python.modules import base
+from sonnet.python.modules import base_info
+from sonnet.python.modules import util
+import tensorflow as tf
+
+
+ModuleProfile = collections.namedtuple(
+    "ModuleProfile",
+    ("module_path", "class_name", "self_time_micros", "total_time_micros",
+     "allocated_bytes", "peak_bytes", "op_count", "children"))
+
+
+CostEstimate = collections.namedtuple(
+    "CostEstimate",
+    ("module_path", "class_name", "forward_flops", "backward_flops",
+     "activation_bytes", "op_count", "unestimated_op_count", "children"))
+
+
+# Name of the entry collecting the ops which were not created by any module.
+UNATTRIBUTED = "(unattributed)"
+
+# Name of the entry collecting the ops of the connections which were not
+# recorded in the `connected_subgraphs` of their module.
+UNTRACKED = "(untracked)"
+
+_GRADIENTS_PREFIX = re.compile(r"^gradients(_\d+)?/")
+
+# Suffix added to the name scopes of the connections after the first one.
+_UNIQUIFIED_SUFFIX = re.compile(r"_\d+$")
+
+# pylint: disable=protected-access
+_format_table = util._format_table
+_human_readable = util._num_bytes_to_human_readable
+# pylint: enable=protected-access
+
+
+class _ModuleStats(object):
+  """Mutable accumulator of the cost of the ops of a module."""
+
+  def __init__(self, module_path, class_name):
+    self.module_path = module_path
+    self.class_name = class_name
+    self.time_micros = 0
+    self.allocated_bytes = 0
+    self.peak_bytes = 0
+    self.op_count = 0
+    self.children = []
+
+  def add(self, node_stats):
+    self.time_micros += node_stats.all_end_rel_micros
+    self.allocated_bytes += sum(
+        output.tensor_description.allocation_description.allocated_bytes
+        for output in node_stats.output)
+    for memory in node_stats.memory:
+      self.peak_bytes = max(self.peak_bytes, memory.peak_bytes)
+    self.op_count += 1
+
+  def to_profile(self):
+    """Returns the `ModuleProfile` of this module, including its children."""
+    children = tuple(child.to_profile() for child in
+                     sorted(self.children, key=lambda c: c.module_path))
+    return ModuleProfile(
+        module_path=self.module_path,
+        class_name=self.class_name,
+        self_time_micros=self.time_micros,
+        total_time_micros=(
+            self.time_micros + sum(c.total_time_micros for c in children)),
+        allocated_bytes=(
+            self.allocated_bytes + sum(c.allocated_bytes for c in children)),
+        peak_bytes=max([self.peak_bytes] + [c.peak_bytes for c in children]),
+        op_count=self.op_count + sum(c.op_count for c in children),
+        children=children)
+
+
+class _CostStats(object):
+  """Mutable accumulator of the estimated cost of the ops of a module."""
+
+  def __init__(self, module_path, class_name):
+    self.module_path = module_path
+    self.class_name = class_name
+    self.forward_flops = 0
+    self.backward_flops = 0
+    self.activation_bytes = 0
+    self.op_count = 0
+    self.unestimated_op_count = 0
+    self.children = []
+
+  def add(self, op):
+    """Adds the estimated cost of `op`."""
+    self.op_count += 1
+    flops = _estimate_flops(op)
+    if flops is None:
+      self.unestimated_op_count += 1
+    else:
+      self.forward_flops += flops
+      self.backward_flops += _BACKWARD_FLOPS_FACTOR.get(op.type, 1) * flops
+    self.activation_bytes += _activation_bytes(op)
+
+  def to_estimate(self):
+    """Returns the `CostEstimate` of this module, including its children."""
+    children = tuple(child.to_estimate() for child in
+                     sorted(self.children, key=lambda c: c.module_path))
+    def total(field):
+      return getattr(self, field) + sum(getattr(c, field) for c in children)
+    return CostEstimate(
+        module_path=self.module_path,
+        class_name=self.class_name,
+        forward_flops=total("forward_flops"),
+        backward_flops=total("backward_flops"),
+        activation_bytes=total("activation_bytes"),
+        op_count=total("op_count"),
+        unestimated_op_count=total("unestimated_op_count"),
+        children=children)
+
+
+# Ops computing one FLOP per output element.
+_ELEMENTWISE_OPS = frozenset([
+    "Abs", "Add", "AddN", "AddV2", "BiasAdd", "Ceil", "Cos", "Div",
+    "Elu", "Equal", "Exp", "Floor", "FloorDiv", "Greater", "GreaterEqual",
+    "Less", "LessEqual", "Log", "Log1p", "LogicalAnd", "LogicalNot",
+    "LogicalOr", "LogSoftmax", "Maximum", "Minimum", "Mul", "Neg", "NotEqual",
+    "Pow", "RealDiv", "Reciprocal", "Relu", "Relu6", "Round", "Rsqrt", "Select",
+    "Selu", "Sigmoid", "Sign", "Sin", "Softmax", "Softplus", "Softsign", "Sqrt",
+    "Square", "SquaredDifference", "Sub", "Tanh",
+])
+
+# Ops computing one FLOP per input element.
+_REDUCTION_OPS = frozenset(["Max", "Mean", "Min", "Prod", "Sum"])
+
+# Ops which only move or reshape data.
+_ZERO_FLOP_OPS = frozenset([
+    "Cast", "ConcatV2", "ExpandDims", "Fill", "Gather", "GatherV2",
+    "Identity", "OneHot", "Pack", "Pad", "Reshape", "Shape", "Slice", "Split",
+    "SplitV", "Squeeze", "StopGradient", "StridedSlice", "Tile", "Transpose",
+    "Unpack", "ZerosLike",
+])
+
+# Ops without a cost of their own, which do not produce activations.
+_NO_ACTIVATION_OPS = frozenset([
+    "Assign", "AssignVariableOp", "Const", "NoOp", "Placeholder",
+    "ReadVariableOp", "VarHandleOp", "VariableV2",
+])
+
+# Ratio of backward to forward FLOPs, for ops whose gradient needs more than
+# one pass: matrix products and convolutions need a product for the gradient
+# with respect to each of their two inputs.
+_BACKWARD_FLOPS_FACTOR = {
+    "BatchMatMul": 2,
+    "BatchMatMulV2": 2,
+    "Conv2D": 2,
+    "Conv3D": 2,
+    "DepthwiseConv2dNative": 2,
+    "MatMul": 2,
+}
+
+
+def _num_elements(tensor):
+  """Returns the number of elements of `tensor`, or None if it is unknown."""
+  shape = tensor.get_shape()
+  return shape.num_elements() if shape.is_fully_defined() else None
+
+
+def _estimate_flops(op):
+  """Returns the estimated FLOPs of `op`, or None if they are unknown.
+
+  A multiply-add counts as two FLOPs.
+
+  Args:
+    op: A `tf.Operation`.
+  """
+  if (op.type in _NO_ACTIVATION_OPS or op.type in _ZERO_FLOP_OPS or
+      not op.outputs):
+    return 0
+  output_size = _num_elements(op.outputs[0])
+  if op.type == "MatMul":
+    transpose_a = op.get_attr("transpose_a")
+    depth = op.inputs[0].get_shape()[0 if transpose_a else 1].value
+  elif op.type in ("BatchMatMul", "BatchMatMulV2"):
+    adj_x = op.get_attr("adj_x")
+    depth = op.inputs[0].get_shape()[-2 if adj_x else -1].value
+  elif op.type in ("Conv2D", "Conv3D"):
+    # The filter is [spatial..., input_channels, output_channels].
+    depth = op.inputs[1].get_shape()[:-1].num_elements()
+  elif op.type == "DepthwiseConv2dNative":
+    # The filter is [height, width, input_channels, channel_multiplier].
+    depth = op.inputs[1].get_shape()[:2].num_elements()
+  elif op.type in _ELEMENTWISE_OPS:
+    return output_size
+  elif op.type in _REDUCTION_OPS:
+    return _num_elements(op.inputs[0])
+  else:
+    return None
+  if output_size is None or depth is None:
+    return None
+  return 2 * output_size * depth
+
+
+def _activation_bytes(op):
+  """Returns the size in bytes of the outputs of `op` kept as activations."""
+  if op.type in _NO_ACTIVATION_OPS:
+    return 0
+  # Reads of legacy variables.
+  if op.type == "Identity":
+    input_dtype = op.inputs[0].dtype
+    if input_dtype != input_dtype.base_dtype:
+      return 0
+  num_bytes = 0
+  for output in op.outputs:
+    num_elements = _num_elements(output)
+    if num_elements is not None and output.dtype != tf.resource:
+      num_bytes += num_elements * output.dtype.size
+  return num_bytes
+
+
+def _name_scopes_to_modules(graph):
+  """Returns a dict mapping the connection name scopes to `ModuleInfo`s."""
+  name_scopes = {}
+  for module_info in graph.get_collection(base_info.SONNET_COLLECTION_NAME):
+    for subgraph in module_info.connected_subgraphs:
+      name_scopes[subgraph.name_scope] = module_info
+  return name_scopes
+
+
+def _find_module(name, name_scopes):
+  """Returns the `ModuleInfo` owning the innermost name scope of `name`."""
+  parts = name.split("/")
+  for i in range(len(parts) - 1, 0, -1):
+    module_info = name_scopes.get("/".join(parts[:i]))
+    if module_info is not None:
+      return module_info
+  return None
+
+
+def _scope_names_to_modules(graph):
+  """Returns a dict mapping the module scope names to `ModuleInfo`s."""
+  return {module_info.scope_name: module_info for module_info in
+          graph.get_collection(base_info.SONNET_COLLECTION_NAME)}
+
+
+def _find_module_or_untracked(name, name_scopes, scope_names):
+  """Returns the `ModuleInfo` owning `name` and whether it was tracked.
+
+  The innermost name scope of `name` which is either a recorded connection or
+  the scope name of a module, possibly uniquified with a `_N` suffix as for
+  its later connections, is used. The latter is only a best effort: ops of a
+  module connected in a name scope other than its scope name are not found.
+
+  Args:
+    name: Name of the op.
+    name_scopes: Dict returned by `_name_scopes_to_modules`.
+    scope_names: Dict returned by `_scope_names_to_modules`.
+
+  Returns:
+    A tuple `(module_info, tracked)`, with a None `module_info` if no module
+    owns `name`.
+  """
+  parts = name.split("/")
+  for i in range(len(parts) - 1, 0, -1):
+    prefix = "/".join(parts[:i])
+    module_info = name_scopes.get(prefix)
+    if module_info is not None:
+      return module_info, True
+    module_info = scope_names.get(
+        prefix, scope_names.get(_UNIQUIFIED_SUFFIX.sub("", prefix)))
+    if module_info is not None:
+      return module_info, False
+  return None, False
+
+
+class _UntrackedStats(object):
+  """Stats of the `UNTRACKED` entry, with one child per module."""
+
+  def __init__(self, stats_class):
+    self._stats_class = stats_class
+    self.bucket = stats_class(UNTRACKED, "")
+    self.module_stats = {}
+
+  def get(self, module_info):
+    """Returns the stats of the untracked connections of a module."""
+    scope_name = module_info.scope_name
+    if scope_name not in self.module_stats:
+      stats = self._stats_class(scope_name,
+                                module_info.class_name.split(".")[-1])
+      self.module_stats[scope_name] = stats
+      self.bucket.children.append(stats)
+    return self.module_stats[scope_name]
+
+
+def _module_tree(name_scopes, stats_class):
+  """Creates the stats of every module and nests them.
+
+  A module is the child of the module with the innermost name scope containing
+  the name scope of its first connection.
+
+  Args:
+    name_scopes: Dict returned by `_name_scopes_to_modules`.
+    stats_class: Class of the stats, constructed from the scope and class names
+      of the module and exposing a `children` list.
+
+  Returns:
+    A dict mapping module scope names to their stats and the list of the
+    stats of the outermost modules.
+  """
+  module_stats = {}
+  module_name_scopes = collections.defaultdict(list)
+  for name_scope, module_info in name_scopes.items():
+    if module_info.scope_name not in module_stats:
+      module_stats[module_info.scope_name] = stats_class(
+          module_info.scope_name, module_info.class_name.split(".")[-1])
+    module_name_scopes[module_info.scope_name].append(name_scope)
+
+  roots = []
+  for scope_name, stats in module_stats.items():
+    parent_info = _find_module(min(module_name_scopes[scope_name]),
+                               name_scopes)
+    if parent_info is None or parent_info.scope_name == scope_name:
+      roots.append(stats)
+    else:
+      module_stats[parent_info.scope_name].children.append(stats)
+  return module_stats, roots
+
+
+def profile_step_stats(step_stats, graph=None, include_gradients=True):
+  """Attributes the cost of the ops in `step_stats` to Sonnet modules.
+
+  Each op is attributed to the module with the innermost name scope containing
+  it. Modules are nested according to their name scopes, so e.g. the cores of
+  a `snt.DeepRNN` are children of the `DeepRNN`. Ops of connections which are
+  not recorded because of the `track_connections` policy of their module are
+  attributed to the children of an `UNTRACKED` entry instead.
+
+  Args:
+    step_stats: A `StepStats` proto, e.g. the `step_stats` of the
+      `tf.RunMetadata` of a step run with `trace_level=FULL_TRACE`.
+    graph: The graph the step was run on. Defaults to the default graph.
+    include_gradients: Whether to attribute the ops computing the gradients of
+      the ops of a module (in the `gradients` name scope) to that module.
+
+  Returns:
+    A list of `ModuleProfile`s for the outermost modules, sorted by name, a
+    `ModuleProfile` named `UNTRACKED` if any op was attributed to it, and a
+    final `ModuleProfile` named `UNATTRIBUTED` for all other ops. Times are
+    in microseconds; `allocated_bytes` is the size of the outputs of the ops and
+    `peak_bytes` the peak usage of the allocators while they were run. Both
+    `total_time_micros` and the byte and op counts include the children.
+  """
+  if graph is None:
+    graph = tf.get_default_graph()
+  name_scopes = _name_scopes_to_modules(graph)
+  scope_names = _scope_names_to_modules(graph)
+
+  module_stats, roots = _module_tree(name_scopes, _ModuleStats)
+
+  untracked = _UntrackedStats(_ModuleStats)
+  unattributed = _ModuleStats(UNATTRIBUTED, "")
+  for device_stats in step_stats.dev_stats:
+    # GPU tracing duplicates the ops of a device in per stream entries.
+    if "/stream:" in device_stats.device or "/memcpy" in device_stats.device:
+      continue
+    for node_stats in device_stats.node_stats:
+      name = node_stats.node_name.split(":")[0]
+      if include_gradients:
+        name = _GRADIENTS_PREFIX.sub("", name)
+      module_info, tracked = _find_module_or_untracked(
+          name, name_scopes, scope_names)
+      if module_info is None:
+        unattributed.add(node_stats)
+      elif tracked:
+        module_stats[module_info.scope_name].add(node_stats)
+      else:
+        untracked.get(module_info).add(node_stats)
+
+  profiles = [stats.to_profile()
+              for stats in sorted(roots, key=lambda s: s.module_path)]
+  if untracked.module_stats:
+    profiles.append(untracked.bucket.to_profile())
+  profiles.append(unattributed.to_profile())
+  return profiles
+
+
+def profile_modules(session, fetches, feed_dict=None, include_gradients=True):
+  """Runs a traced session step and attributes its cost to Sonnet modules.
+
+  Args:
+    session: A `tf.Session`.
+    fetches: Fetches to pass to `session.run`.
+    feed_dict: Optional feed dict to pass to `session.run`.
+    include_gradients: Whether to attribute the ops computing the gradients of
+      the ops of a module to that module. See `profile_step_stats`.
+
+  Returns:
+    A tuple `(results, profiles)` where `results` are the fetched values and
+    `profiles` the list of `ModuleProfile`s returned by `profile_step_stats`.
+  """
+  run_metadata = tf.RunMetadata()
+  results = session.run(
+      fetches, feed_dict=feed_dict,
+      options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+      run_metadata=run_metadata)
+  profiles = profile_step_stats(run_metadata.step_stats, graph=session.graph,
+                                include_gradients=include_gradients)
+  return results, profiles
+
+
+def estimate_module_costs(modules=None, graph=None):
+  """Estimates the FLOPs and activation memory of connected modules.
+
+  The forward FLOPs of matrix products, convolutions, elementwise ops and
+  reductions are computed from the static shapes of their inputs and outputs,
+  counting a multiply-add as two FLOPs. The backward FLOPs assume two products
+  per matrix product or convolution and one op per elementwise op. The
+  activation bytes are the size of the outputs of the ops, excluding constants
+  and variables. Ops of other types, or with shapes which are not fully
+  defined, are counted in `unestimated_op_count`.
+
+  Ops inside a `tf.while_loop`, e.g. the cores of a `tf.nn.dynamic_rnn`, are
+  counted once: their cost is the cost of a single iteration. Ops in the
+  `gradients` name scope are ignored.
+
+  Ops of connections which are not recorded because of the `track_connections`
+  policy of their module are attributed to the children of an `UNTRACKED`
+  entry instead. A module without any recorded connection is estimated from
+  these ops.
+
+  Args:
+    modules: Optional module or iterable of modules to return the estimates
+      of. Defaults to all the outermost modules of the graph, followed by the
+      `UNTRACKED` entry if any op was attributed to it.
+    graph: Graph the modules are connected to. Defaults to the default graph.
+
+  Returns:
+    A list of `CostEstimate`s, with the estimates of their submodules as
+    children. All the counts include the children. The estimate of a module
+    without any op in `graph`, e.g. which was never connected, is empty.
+  """
+  if graph is None:
+    graph = tf.get_default_graph()
+  name_scopes = _name_scopes_to_modules(graph)
+  scope_names = _scope_names_to_modules(graph)
+  module_stats, roots = _module_tree(name_scopes, _CostStats)
+  untracked = _UntrackedStats(_CostStats)
+
+  for op in graph.get_operations():
+    if _GRADIENTS_PREFIX.match(op.name) or "/Initializer/" in op.name:
+      continue
+    module_info, tracked = _find_module_or_untracked(
+        op.name, name_scopes, scope_names)
+    if module_info is None:
+      continue
+    elif tracked:
+      module_stats[module_info.scope_name].add(op)
+    else:
+      untracked.get(module_info).add(op)
+
+  if modules is None:
+    estimates = [stats.to_estimate()
+                 for stats in sorted(roots, key=lambda s: s.module_path)]
+    if untracked.module_stats:
+      estimates.append(untracked.bucket.to_estimate())
+    return estimates
+  if isinstance(modules, base.AbstractModule):
+    modules = [modules]
+  selected = []
+  for module in modules:
+    if module.scope_name in module_stats:
+      selected.append(module_stats[module.scope_name])
+    elif module.scope_name in untracked.module_stats:
+      selected.append(untracked.module_stats[module.scope_name])
+    else:
+      selected.append(_CostStats(module.scope_name, type(module).__name__))
+  return [stats.to_estimate()
+          for stats in sorted(selected, key=lambda s: s.module_path)]
+
+
+def _flatten_profiles(profiles, depth=0):
+  for profile in profiles:
+    yield depth, profile
+    for child in _flatten_profiles(profile.children, depth + 1):
+      yield child
+
+
+def format_module_profiles(profiles, join_lines=True):
+  """Formats a list of `ModuleProfile`s as a table, indenting the children."""
+  rows = [("Module", "Class", "Self time (ms)", "Total time (ms)",
+           "Allocated", "Peak", "Ops")]
+  for depth, profile in _flatten_profiles(profiles):
+    rows.append(("  " * depth + profile.module_path.split("/")[-1],
+                 profile.class_name,
+                 "%.3f" % (profile.self_time_micros / 1000.),
+                 "%.3f" % (profile.total_time_micros / 1000.),
+                 _human_readable(profile.allocated_bytes),
+                 _human_readable(profile.peak_bytes),
+                 str(profile.op_count)))
+  return _format_table(rows, join_lines)
+
+
+def _flops_to_human_readable(flops):
+  """Returns a human readable string of a number of FLOPs."""
+  for unit, scale in (("G", 1e9), ("M", 1e6), ("K", 1e3)):
+    if flops >= scale:
+      return "%.3f %sFLOPs" % (flops / scale, unit)
+  return "%d FLOPs" % flops
+
+
+def format_cost_estimates(estimates, join_lines=True):
+  """Formats a list of `CostEstimate`s as a table, indenting the children."""
+  rows = [("Module", "Class", "Forward", "Backward", "Activations", "Ops",
+           "Unestimated ops")]
+  for depth, estimate in _flatten_profiles(estimates):
+    rows.append(("  " * depth + estimate.module_path.split("/")[-1],
+                 estimate.class_name,
+                 _flops_to_human_readable(estimate.forward_flops),
+                 _flops_to_human_readable(estimate.backward_flops),
+                 _human_readable(estimate.activation_bytes),
+                 str(estimate.op_count),
+                 str(estimate.unestimated_op_count)))
+  return _format_table(rows, join_lines)
+
+
+def _profile_to_dict(profile):
+  profile_dict = profile._asdict()
+  profile_dict["children"] = [_profile_to_dict(c) for c in profile.children]
+  return profile_dict
+
+
+def module_profiles_to_json(profiles, indent=2):
+  """Returns a list of `ModuleProfile`s and their children as JSON."""
+  return json.dumps([_profile_to_dict(p) for p in profiles], indent=indent)
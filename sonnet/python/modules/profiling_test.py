@@ -0,0 +1,215 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.profiling."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+# Dependency imports
+from absl.testing import parameterized
+import sonnet as snt
+from sonnet.python.modules import profiling
+import tensorflow as tf
+from tensorflow.core.framework import step_stats_pb2  # pylint: disable=g-direct-tensorflow-import
+
+
+def _node_stats(node_name, micros, allocated_bytes=0, peak_bytes=0):
+  node_stats = step_stats_pb2.NodeExecStats(
+      node_name=node_name, all_end_rel_micros=micros)
+  output = node_stats.output.add()
+  output.tensor_description.allocation_description.allocated_bytes = (
+      allocated_bytes)
+  node_stats.memory.add(peak_bytes=peak_bytes)
+  return node_stats
+
+
+class ProfilingTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _build_mlp(self):
+    mlp = snt.nets.MLP([4, 3], name="mlp")
+    return mlp(tf.ones([2, 5]))
+
+  @parameterized.parameters(True, False)
+  def testProfileStepStats(self, include_gradients):
+    self._build_mlp()
+    step_stats = step_stats_pb2.StepStats()
+    device_stats = step_stats.dev_stats.add(device="/device:CPU:0")
+    device_stats.node_stats.extend([
+        _node_stats("mlp/linear_0/MatMul", 10, allocated_bytes=32,
+                    peak_bytes=100),
+        _node_stats("mlp/Relu", 5, allocated_bytes=32, peak_bytes=120),
+        _node_stats("mlp/linear_1/MatMul", 4, allocated_bytes=24,
+                    peak_bytes=90),
+        _node_stats("gradients/mlp/linear_1/MatMul_grad/MatMul", 7,
+                    allocated_bytes=40, peak_bytes=200),
+        _node_stats("init", 3),
+    ])
+    # Duplicated GPU stream entries are ignored.
+    stream_stats = step_stats.dev_stats.add(device="/device:GPU:0/stream:all")
+    stream_stats.node_stats.extend([_node_stats("mlp/Relu", 1000)])
+
+    profiles = snt.profile_step_stats(step_stats,
+                                      include_gradients=include_gradients)
+    self.assertEqual([p.module_path for p in profiles],
+                     ["mlp", profiling.UNATTRIBUTED])
+    mlp, unattributed = profiles
+    linear_0, linear_1 = mlp.children
+    self.assertEqual(mlp.class_name, "MLP")
+    self.assertEqual(linear_0.module_path, "mlp/linear_0")
+    self.assertEqual(linear_0.class_name, "Linear")
+
+    gradient_micros = 7 if include_gradients else 0
+    self.assertEqual(linear_0.self_time_micros, 10)
+    self.assertEqual(linear_1.self_time_micros, 4 + gradient_micros)
+    self.assertEqual(mlp.self_time_micros, 5)
+    self.assertEqual(mlp.total_time_micros, 19 + gradient_micros)
+    self.assertEqual(mlp.allocated_bytes,
+                     88 + (40 if include_gradients else 0))
+    self.assertEqual(mlp.peak_bytes, 200 if include_gradients else 120)
+    self.assertEqual(mlp.op_count, 4 if include_gradients else 3)
+    self.assertEqual(unattributed.self_time_micros, 10 - gradient_micros)
+
+  def testProfileStepStatsUntrackedConnections(self):
+    linear = snt.Linear(3, name="linear")
+    with snt.track_connections("last"):
+      linear(tf.ones([2, 5]))
+      linear(tf.ones([2, 5]))
+    step_stats = step_stats_pb2.StepStats()
+    device_stats = step_stats.dev_stats.add(device="/device:CPU:0")
+    device_stats.node_stats.extend([
+        _node_stats("linear/MatMul", 3),
+        _node_stats("linear_1/MatMul", 4),
+        _node_stats("init", 1),
+    ])
+
+    profiles = snt.profile_step_stats(step_stats)
+    self.assertEqual([p.module_path for p in profiles],
+                     ["linear", profiling.UNTRACKED, profiling.UNATTRIBUTED])
+    tracked, untracked, unattributed = profiles
+    self.assertEqual(tracked.self_time_micros, 4)
+    untracked_linear, = untracked.children
+    self.assertEqual(untracked_linear.module_path, "linear")
+    self.assertEqual(untracked_linear.class_name, "Linear")
+    self.assertEqual(untracked_linear.self_time_micros, 3)
+    self.assertEqual(untracked.total_time_micros, 3)
+    self.assertEqual(unattributed.self_time_micros, 1)
+
+  def testProfileModules(self):
+    output = self._build_mlp()
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      expected_output = sess.run(output)
+      actual_output, profiles = snt.profile_modules(sess, output)
+    self.assertAllClose(expected_output, actual_output)
+
+    mlp = profiles[0]
+    self.assertEqual(mlp.module_path, "mlp")
+    self.assertEqual([c.module_path for c in mlp.children],
+                     ["mlp/linear_0", "mlp/linear_1"])
+    self.assertGreater(mlp.op_count, 0)
+    self.assertGreaterEqual(mlp.total_time_micros, mlp.self_time_micros)
+
+    table = snt.format_module_profiles(profiles)
+    self.assertIn("  linear_0", table)
+    self.assertIn("MLP", table)
+    profiles_json = json.loads(snt.module_profiles_to_json(profiles))
+    self.assertEqual(profiles_json[0]["module_path"], "mlp")
+    self.assertEqual(profiles_json[0]["children"][1]["module_path"],
+                     "mlp/linear_1")
+
+  def testEstimateModuleCosts(self):
+    self._build_mlp()
+    estimates = snt.estimate_module_costs()
+    self.assertEqual([e.module_path for e in estimates], ["mlp"])
+    mlp = estimates[0]
+    linear_0, linear_1 = mlp.children
+    self.assertEqual(mlp.class_name, "MLP")
+    self.assertEqual(linear_0.class_name, "Linear")
+
+    # [2, 5] x [5, 4] MatMul and bias Add.
+    self.assertEqual(linear_0.forward_flops, 2 * 2 * 5 * 4 + 2 * 4)
+    self.assertEqual(linear_0.backward_flops, 2 * 2 * 2 * 5 * 4 + 2 * 4)
+    # [2, 4] x [4, 3] MatMul and bias Add.
+    self.assertEqual(linear_1.forward_flops, 2 * 2 * 4 * 3 + 2 * 3)
+    # Plus the Relu between the layers.
+    self.assertEqual(mlp.forward_flops, linear_0.forward_flops +
+                     linear_1.forward_flops + 2 * 4)
+    # The outputs of the MatMul, Add and Relu, excluding the variables.
+    self.assertEqual(linear_0.activation_bytes, 2 * (2 * 4 * 4))
+    self.assertEqual(mlp.activation_bytes, 3 * (2 * 4 * 4) + 2 * (2 * 3 * 4))
+    self.assertEqual(mlp.unestimated_op_count, 0)
+
+  def testEstimateModuleCostsUntrackedConnections(self):
+    self._build_mlp()
+    linear = snt.Linear(3, name="linear")
+    linear.track_connections = "none"
+    linear(tf.ones([2, 5]))
+    linear(tf.ones([2, 5]))
+
+    estimates = snt.estimate_module_costs()
+    self.assertEqual([e.module_path for e in estimates],
+                     ["mlp", profiling.UNTRACKED])
+    untracked_linear, = estimates[1].children
+    self.assertEqual(untracked_linear.module_path, "linear")
+    # Two [2, 5] x [5, 3] MatMuls and bias Adds.
+    self.assertEqual(untracked_linear.forward_flops,
+                     2 * (2 * 2 * 5 * 3 + 2 * 3))
+
+    estimate, = snt.estimate_module_costs(linear)
+    self.assertEqual(estimate, untracked_linear)
+
+  def testEstimateModuleCostsConv2D(self):
+    conv = snt.Conv2D(output_channels=4, kernel_shape=3, name="conv")
+    conv(tf.ones([1, 8, 8, 2]))
+    estimate, = snt.estimate_module_costs(conv)
+    self.assertEqual(estimate.module_path, "conv")
+    # Every output element is a 3 x 3 x 2 dot product, plus the bias.
+    self.assertEqual(estimate.forward_flops, 8 * 8 * 4 * (2 * 3 * 3 * 2 + 1))
+    self.assertEqual(estimate.activation_bytes, 2 * (8 * 8 * 4 * 4))
+
+  def testEstimateModuleCostsSelectedModules(self):
+    self._build_mlp()
+    conv = snt.Conv2D(output_channels=4, kernel_shape=3, name="conv")
+    conv(tf.ones([1, 8, 8, 2]))
+    unconnected = snt.Linear(3, name="unconnected")
+    modules = set([conv, unconnected])
+    estimates = snt.estimate_module_costs(module for module in modules)
+    self.assertEqual([e.module_path for e in estimates],
+                     ["conv", "unconnected"])
+    conv_estimate, unconnected_estimate = estimates
+    self.assertGreater(conv_estimate.forward_flops, 0)
+    self.assertEqual(unconnected_estimate, profiling.CostEstimate(
+        module_path="unconnected", class_name="Linear", forward_flops=0,
+        backward_flops=0, activation_bytes=0, op_count=0,
+        unestimated_op_count=0, children=()))
+
+  def testEstimateModuleCostsUnknownShapes(self):
+    linear = snt.Linear(3, name="linear")
+    linear(tf.placeholder(tf.float32, [None, 5]))
+    estimate, = snt.estimate_module_costs(linear)
+    self.assertEqual(estimate.forward_flops, 0)
+    self.assertEqual(estimate.unestimated_op_count, 2)
+
+    table = snt.format_cost_estimates([estimate])
+    self.assertIn("linear", table)
+    self.assertIn("Linear", table)
+
+
+if __name__ == "__main__":
+  tf.test.main()
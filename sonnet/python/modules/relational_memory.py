@@ -26,16 +26,88 @@ from __future__ import print_function
 from sonnet.python.modules import basic
 from sonnet.python.modules import layer_norm
 from sonnet.python.modules import rnn_core
+from sonnet.python.modules import util
 from sonnet.python.modules.nets import mlp
 import tensorflow as tf
 
 
+def _split_sizes(size, chunk_size):
+  """Returns the sizes of the chunks of at most `chunk_size` covering `size`."""
+  sizes = [chunk_size] * (size // chunk_size)
+  if size % chunk_size:
+    sizes.append(size % chunk_size)
+  return sizes
+
+
+def _chunked_attention(q, k, v, chunk_size, recompute=False):
+  """Computes `softmax(q k^T) v` one block of queries and keys at a time.
+
+  For every block of queries the softmax is accumulated over blocks of keys,
+  keeping a running maximum and sum of the exponentiated scores, so at most a
+  `[B, H, chunk_size, chunk_size]` block of the attention matrix exists at any
+  time.
+
+  Args:
+    q: Tensor of size `[B, N, H, K]` with the (scaled) queries.
+    k: Tensor of size `[B, N, H, K]` with the keys.
+    v: Tensor of size `[B, N, H, V]` with the values.
+    chunk_size: Number of queries and keys in each block.
+    recompute: Whether to recompute the attention of each block of queries on
+      the backward pass rather than keeping its activations in memory.
+
+  Returns:
+    A Tensor of size `[B, N, H, V]`.
+  """
+  sizes = _split_sizes(q.get_shape()[1].value, chunk_size)
+  k_chunks = tf.split(k, sizes, axis=1)
+  v_chunks = tf.split(v, sizes, axis=1)
+
+  def attend(q_chunk, *kv_chunks):
+    """Attends from `q_chunk` over all the blocks of keys and values."""
+    running_max = None
+    for k_chunk, v_chunk in zip(kv_chunks[:len(sizes)], kv_chunks[len(sizes):]):
+      scores = tf.einsum('bnhk,bmhk->bhnm', q_chunk, k_chunk)
+      chunk_max = tf.reduce_max(scores, axis=-1, keepdims=True)
+      if running_max is None:
+        new_max = chunk_max
+      else:
+        new_max = tf.maximum(running_max, chunk_max)
+      exp_scores = tf.exp(scores - new_max)
+      chunk_sum = tf.reduce_sum(exp_scores, axis=-1, keepdims=True)
+      chunk_output = tf.einsum('bhnm,bmhv->bhnv', exp_scores, v_chunk)
+      if running_max is None:
+        running_sum = chunk_sum
+        output = chunk_output
+      else:
+        correction = tf.exp(running_max - new_max)
+        running_sum = running_sum * correction + chunk_sum
+        output = output * correction + chunk_output
+      running_max = new_max
+    # [B, H, C, V] -> [B, C, H, V]
+    return tf.transpose(output / running_sum, [0, 2, 1, 3])
+
+  if recompute:
+    attend = tf.contrib.layers.recompute_grad(attend)
+
+  outputs = [attend(q_chunk, *(k_chunks + v_chunks))
+             for q_chunk in tf.split(q, sizes, axis=1)]
+  return tf.concat(outputs, axis=1)
+
+
 class RelationalMemory(rnn_core.RNNCore):
-  """Relational Memory Core."""
+  """Relational Memory Core.
+
+  All the sub-modules are constructed once, in the constructor, and shared by
+  every connection of the core. Besides being connected one step at a time,
+  the core can process a whole sequence with `unroll_sequence`, which projects
+  the inputs of all time steps at once and runs the memory update in a
+  `tf.while_loop`.
+  """
 
   def __init__(self, mem_slots, head_size, num_heads=1, num_blocks=1,
                forget_bias=1.0, input_bias=0.0, gate_style='unit',
-               attention_mlp_layers=2, key_size=None, name='relational_memory'):
+               attention_mlp_layers=2, key_size=None, attention_chunk_size=None,
+               recompute_attention=False, name='relational_memory'):
     """Constructs a `RelationalMemory` object.
 
     Args:
@@ -55,12 +127,22 @@ class RelationalMemory(rnn_core.RNNCore):
         MLP. Defaults to 2.
       key_size: Size of vector to use for key & query vectors in the attention
         computation. Defaults to None, in which case we use `head_size`.
+      attention_chunk_size: Optional number of memory slots attended from and
+        over at once. If set, the attention softmax is accumulated over blocks
+        of slots and the full `[N, N]` attention matrix is never
+        materialized, which reduces the memory needed for large numbers of
+        slots. Defaults to None, which computes the attention in one go.
+      recompute_attention: Whether to recompute the chunked attention on the
+        backward pass instead of keeping its activations. Requires
+        `attention_chunk_size`. Defaults to False.
       name: Name of the module.
 
     Raises:
       ValueError: gate_style not one of [None, 'memory', 'unit'].
       ValueError: num_blocks is < 1.
       ValueError: attention_mlp_layers is < 1.
+      ValueError: attention_chunk_size is < 1.
+      ValueError: recompute_attention is True without attention_chunk_size.
     """
     super(RelationalMemory, self).__init__(name=name)
 
@@ -89,6 +171,36 @@ class RelationalMemory(rnn_core.RNNCore):
 
     self._key_size = key_size if key_size else self._head_size
 
+    if attention_chunk_size is not None and attention_chunk_size < 1:
+      raise ValueError('attention_chunk_size must be >= 1. Got: {}.'.format(
+          attention_chunk_size))
+    if recompute_attention and attention_chunk_size is None:
+      raise ValueError('recompute_attention requires attention_chunk_size.')
+    self._attention_chunk_size = attention_chunk_size
+    self._recompute_attention = recompute_attention
+
+    # The sub-modules are created in the order in which they used to be created
+    # in `_build`, so that the names of their variables do not change.
+    with self._enter_variable_scope():
+      self._input_linear = basic.Linear(self._mem_size)
+      self._attention_mlp = basic.BatchApply(
+          mlp.MLP([self._mem_size] * self._attention_mlp_layers))
+      qkv_size = 2 * self._key_size + self._head_size
+      self._qkv_linears = []
+      self._qkv_layer_norms = []
+      self._attention_layer_norms = []
+      self._mlp_layer_norms = []
+      for _ in range(self._num_blocks):
+        self._qkv_linears.append(
+            basic.BatchApply(basic.Linear(qkv_size * self._num_heads)))
+        self._qkv_layer_norms.append(layer_norm.LayerNorm(axis=-1))
+        self._attention_layer_norms.append(layer_norm.LayerNorm(axis=-1))
+        self._mlp_layer_norms.append(layer_norm.LayerNorm(axis=-1))
+      if self._gate_style in ('unit', 'memory'):
+        num_gates = 2 * self._calculate_gate_size()
+        self._gate_inputs_linear = basic.Linear(num_gates)
+        self._gate_memory_linear = basic.BatchApply(basic.Linear(num_gates))
+
   def initial_state(self, batch_size, trainable=False):
     """Creates the initial memory.
 
@@ -117,7 +229,7 @@ class RelationalMemory(rnn_core.RNNCore):
       init_state = init_state[:, :, :self._mem_size]
     return init_state
 
-  def _multihead_attention(self, memory):
+  def _multihead_attention(self, memory, block):
     """Perform multi-head attention from 'Attention is All You Need'.
 
     Implementation of the attention mechanism from
@@ -125,6 +237,7 @@ class RelationalMemory(rnn_core.RNNCore):
 
     Args:
       memory: Memory tensor to perform attention on.
+      block: Index of the attention block, selecting its sub-modules.
 
     Returns:
       new_memory: New memory tensor.
@@ -133,31 +246,27 @@ class RelationalMemory(rnn_core.RNNCore):
     value_size = self._head_size
 
     qkv_size = 2 * key_size + value_size
-    total_size = qkv_size * self._num_heads  # Denote as F.
-    qkv = basic.BatchApply(basic.Linear(total_size))(memory)
-    qkv = basic.BatchApply(layer_norm.LayerNorm())(qkv)
-
-    mem_slots = memory.get_shape().as_list()[1]  # Denoted as N.
+    qkv = self._qkv_linears[block](memory)  # [B, N, H * F/H]
+    qkv = self._qkv_layer_norms[block](qkv)
 
     # [B, N, F] -> [B, N, H, F/H]
-    qkv_reshape = basic.BatchReshape([mem_slots, self._num_heads,
-                                      qkv_size])(qkv)
-
-    # [B, N, H, F/H] -> [B, H, N, F/H]
-    qkv_transpose = tf.transpose(qkv_reshape, [0, 2, 1, 3])
-    q, k, v = tf.split(qkv_transpose, [key_size, key_size, value_size], -1)
+    mem_slots = memory.get_shape().as_list()[1]  # Denoted as N.
+    qkv = tf.reshape(qkv, [-1, mem_slots, self._num_heads, qkv_size])
+    q, k, v = tf.split(qkv, [key_size, key_size, value_size], -1)
 
     q *= key_size ** -0.5
-    dot_product = tf.matmul(q, k, transpose_b=True)  # [B, H, N, N]
-    weights = tf.nn.softmax(dot_product)
-
-    output = tf.matmul(weights, v)  # [B, H, N, V]
+    if self._attention_chunk_size is None:
+      dot_product = tf.einsum('bnhk,bmhk->bhnm', q, k)  # [B, H, N, N]
+      weights = tf.nn.softmax(dot_product)
 
-    # [B, H, N, V] -> [B, N, H, V]
-    output_transpose = tf.transpose(output, [0, 2, 1, 3])
+      output = tf.einsum('bhnm,bmhv->bnhv', weights, v)  # [B, N, H, V]
+    else:
+      output = _chunked_attention(q, k, v, self._attention_chunk_size,
+                                  recompute=self._recompute_attention)
 
     # [B, N, H, V] -> [B, N, H * V]
-    new_memory = basic.BatchFlatten(preserve_dims=2)(output_transpose)
+    new_memory = tf.reshape(
+        output, [-1, mem_slots, self._num_heads * value_size])
     return new_memory
 
   @property
@@ -181,26 +290,56 @@ class RelationalMemory(rnn_core.RNNCore):
     else:  # self._gate_style == None
       return 0
 
-  def _create_gates(self, inputs, memory):
+  def _project_inputs(self, inputs, treat_input_as_matrix, num_batch_dims=1):
+    """Projects `inputs` to the size of the memory slots.
+
+    Args:
+      inputs: Tensor input, with `num_batch_dims` leading batch dimensions.
+      treat_input_as_matrix: Whether to treat `input` as a sequence of
+        matrices rather than flattening it into a vector.
+      num_batch_dims: Number of leading batch dimensions of `inputs`.
+
+    Returns:
+      A Tensor of size `[batch_dims..., num_inputs, mem_size]`, where
+      `num_inputs` is 1 unless the input is treated as a matrix.
+    """
+    if treat_input_as_matrix:
+      inputs = basic.BatchFlatten(preserve_dims=num_batch_dims + 1)(inputs)
+      return basic.BatchApply(
+          self._input_linear, n_dims=num_batch_dims + 1)(inputs)
+    else:
+      inputs = basic.BatchFlatten(preserve_dims=num_batch_dims)(inputs)
+      if num_batch_dims > 1:
+        inputs = basic.BatchApply(
+            self._input_linear, n_dims=num_batch_dims)(inputs)
+      else:
+        inputs = self._input_linear(inputs)
+      return tf.expand_dims(inputs, num_batch_dims)
+
+  def _gate_inputs(self, inputs, num_batch_dims=1):
+    """Computes the contribution of the projected `inputs` to the gates."""
+    inputs = basic.BatchFlatten(preserve_dims=num_batch_dims)(inputs)
+    if num_batch_dims > 1:
+      return basic.BatchApply(
+          self._gate_inputs_linear, n_dims=num_batch_dims)(inputs)
+    return self._gate_inputs_linear(inputs)
+
+  def _create_gates(self, gate_inputs, memory):
     """Create input and forget gates for this step using `inputs` and `memory`.
 
     Args:
-      inputs: Tensor input.
+      gate_inputs: Contribution of the input to the gates, as computed by
+        `_gate_inputs`.
       memory: The current state of memory.
 
     Returns:
       input_gate: A LSTM-like insert gate.
       forget_gate: A LSTM-like forget gate.
     """
-    # We'll create the input and forget gates at once. Hence, calculate double
-    # the gate size.
-    num_gates = 2 * self._calculate_gate_size()
-
+    # The input and forget gates are created at once.
     memory = tf.tanh(memory)
-    inputs = basic.BatchFlatten()(inputs)
-    gate_inputs = basic.BatchApply(basic.Linear(num_gates), n_dims=1)(inputs)
     gate_inputs = tf.expand_dims(gate_inputs, axis=1)
-    gate_memory = basic.BatchApply(basic.Linear(num_gates))(memory)
+    gate_memory = self._gate_memory_linear(memory)
     gates = tf.split(gate_memory + gate_inputs, num_or_size_splits=2, axis=2)
     input_gate, forget_gate = gates
 
@@ -218,21 +357,48 @@ class RelationalMemory(rnn_core.RNNCore):
     Returns:
       The attended-over memory.
     """
-    attention_mlp = basic.BatchApply(
-        mlp.MLP([self._mem_size] * self._attention_mlp_layers))
-    for _ in range(self._num_blocks):
-      attended_memory = self._multihead_attention(memory)
+    for block in range(self._num_blocks):
+      attended_memory = self._multihead_attention(memory, block)
 
       # Add a skip connection to the multiheaded attention's input.
-      memory = basic.BatchApply(layer_norm.LayerNorm())(
-          memory + attended_memory)
+      memory = self._attention_layer_norms[block](memory + attended_memory)
 
       # Add a skip connection to the attention_mlp's input.
-      memory = basic.BatchApply(layer_norm.LayerNorm())(
-          attention_mlp(memory) + memory)
+      memory = self._mlp_layer_norms[block](
+          self._attention_mlp(memory) + memory)
 
     return memory
 
+  def _projected_step(self, inputs_reshape, gate_inputs, memory):
+    """Updates the memory given the projected inputs of this time step.
+
+    Args:
+      inputs_reshape: Projected inputs, as computed by `_project_inputs`.
+      gate_inputs: Contribution of the input to the gates, or None if the core
+        is not gated.
+      memory: Memory output from the previous time step.
+
+    Returns:
+      output: This time step's output.
+      next_memory: The next version of memory to use.
+      gates: A tuple `(input_gate, forget_gate)`, or None.
+    """
+    memory_plus_input = tf.concat([memory, inputs_reshape], axis=1)
+    next_memory = self._attend_over_memory(memory_plus_input)
+
+    n = inputs_reshape.get_shape().as_list()[1]
+    next_memory = next_memory[:, :-n, :]
+
+    gates = None
+    if gate_inputs is not None:
+      gates = self._create_gates(gate_inputs, memory)
+      input_gate, forget_gate = gates
+      next_memory = input_gate * tf.tanh(next_memory)
+      next_memory += forget_gate * memory
+
+    output = basic.BatchFlatten()(next_memory)
+    return output, next_memory, gates
+
   def _build(self, inputs, memory, treat_input_as_matrix=False):
     """Adds relational memory to the TensorFlow graph.
 
@@ -247,29 +413,56 @@ class RelationalMemory(rnn_core.RNNCore):
       output: This time step's output.
       next_memory: The next version of memory to use.
     """
-    if treat_input_as_matrix:
-      inputs = basic.BatchFlatten(preserve_dims=2)(inputs)
-      inputs_reshape = basic.BatchApply(
-          basic.Linear(self._mem_size), n_dims=2)(inputs)
-    else:
-      inputs = basic.BatchFlatten()(inputs)
-      inputs = basic.Linear(self._mem_size)(inputs)
-      inputs_reshape = tf.expand_dims(inputs, 1)
+    inputs_reshape = self._project_inputs(inputs, treat_input_as_matrix)
+    gate_inputs = None
+    if self._gate_style == 'unit' or self._gate_style == 'memory':
+      gate_inputs = self._gate_inputs(inputs_reshape)
 
-    memory_plus_input = tf.concat([memory, inputs_reshape], axis=1)
-    next_memory = self._attend_over_memory(memory_plus_input)
+    output, next_memory, gates = self._projected_step(
+        inputs_reshape, gate_inputs, memory)
+    if gates is not None:
+      self._input_gate, self._forget_gate = gates
+    return output, next_memory
 
-    n = inputs_reshape.get_shape().as_list()[1]
-    next_memory = next_memory[:, :-n, :]
+  @util.reuse_variables
+  def unroll_sequence(self, input_sequence, initial_state,
+                      sequence_length=None, treat_input_as_matrix=False):
+    """Runs the relational memory over a whole time-major input sequence.
 
-    if self._gate_style == 'unit' or self._gate_style == 'memory':
-      self._input_gate, self._forget_gate = self._create_gates(
-          inputs_reshape, memory)
-      next_memory = self._input_gate * tf.tanh(next_memory)
-      next_memory += self._forget_gate * memory
+    The input projections of all time steps, including their contribution to
+    the gates, are computed before the recurrence, which runs inside a
+    `tf.while_loop`.
 
-    output = basic.BatchFlatten()(next_memory)
-    return output, next_memory
+    Args:
+      input_sequence: Tensor of size `[time_steps, batch_size, ...]`.
+      initial_state: Initial memory, of size `[batch_size, mem_slots,
+        mem_size]`.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. See `RNNCore.unroll`.
+      treat_input_as_matrix: Optional, whether to treat each input as a
+        sequence of matrices. See `_build`.
+
+    Returns:
+      A tuple (output_sequence, final_memory) where `output_sequence` is a
+      Tensor of size `[time_steps, batch_size, mem_slots * mem_size]` and
+      `final_memory` the memory after the last step of each sequence.
+    """
+    inputs_reshape = self._project_inputs(
+        input_sequence, treat_input_as_matrix, num_batch_dims=2)
+    step_inputs = (inputs_reshape,)
+    if self._gate_style == 'unit' or self._gate_style == 'memory':
+      step_inputs += (self._gate_inputs(inputs_reshape, num_batch_dims=2),)
+
+    def step(step_inputs_t, memory):
+      inputs_t = step_inputs_t[0]
+      gate_inputs_t = step_inputs_t[1] if len(step_inputs_t) > 1 else None
+      output, next_memory, _ = self._projected_step(
+          inputs_t, gate_inputs_t, memory)
+      return output, next_memory
+
+    return rnn_core.dynamic_unroll(
+        step, step_inputs, initial_state, self.output_size,
+        sequence_length=sequence_length)
 
   @property
   def input_gate(self):
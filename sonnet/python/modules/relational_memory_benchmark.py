@@ -0,0 +1,157 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for the RelationalMemory core.
+
+The sequence configurations follow the `rmc_nth_farthest` and
+`rmc_learn_to_execute` examples, with smaller heads and batches so that they
+run on a single CPU. The attention benchmarks compare the peak memory and time
+of a training step with and without chunked attention as the number of memory
+slots grows.
+
+Run with:
+
+  python relational_memory_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import time
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+NUM_RUNS = 10
+ATTENTION_CHUNK_SIZE = 32
+
+Config = collections.namedtuple(
+    "Config", ("num_steps", "batch_size", "input_size", "mem_slots",
+               "head_size", "num_heads", "num_blocks"))
+
+CONFIGS = {
+    "nth_farthest": Config(num_steps=4, batch_size=32, input_size=12,
+                           mem_slots=4, head_size=64, num_heads=4,
+                           num_blocks=4),
+    "learn_to_execute": Config(num_steps=50, batch_size=32, input_size=20,
+                               mem_slots=4, head_size=64, num_heads=4,
+                               num_blocks=4),
+}
+
+
+class RelationalMemoryBenchmark(tf.test.Benchmark):
+  """Compares per-step connection with `unroll_sequence`."""
+
+  def _benchmark(self, config_name, mode):
+    config = CONFIGS[config_name]
+    with tf.Graph().as_default() as graph:
+      core = snt.RelationalMemory(config.mem_slots, config.head_size,
+                                  num_heads=config.num_heads,
+                                  num_blocks=config.num_blocks,
+                                  gate_style="unit")
+      inputs = tf.random_normal(
+          [config.num_steps, config.batch_size, config.input_size])
+      initial_state = core.initial_state(config.batch_size)
+
+      start_time = time.time()
+      if mode == "unroll_sequence":
+        output_sequence, _ = core.unroll_sequence(inputs, initial_state)
+      else:
+        output_sequence, _ = tf.nn.dynamic_rnn(
+            core, inputs, initial_state=initial_state, time_major=True)
+      loss = tf.reduce_mean(output_sequence)
+      train_op = tf.train.AdamOptimizer(1e-4).minimize(loss)
+      build_time = time.time() - start_time
+      graph_def_bytes = graph.as_graph_def().ByteSize()
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        sess.run(train_op)
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(train_op)
+        step_time = (time.time() - start_time) / NUM_RUNS
+
+    self.report_benchmark(
+        name="relational_memory_{}_{}".format(config_name, mode),
+        iters=NUM_RUNS,
+        wall_time=step_time,
+        extras={"build_time": build_time,
+                "graph_def_bytes": graph_def_bytes})
+
+  def _benchmark_attention(self, mem_slots, attention_chunk_size,
+                           recompute_attention):
+    batch_size = 8
+    with tf.Graph().as_default():
+      core = snt.RelationalMemory(mem_slots, head_size=32, num_heads=4,
+                                  attention_chunk_size=attention_chunk_size,
+                                  recompute_attention=recompute_attention)
+      inputs = tf.random_normal([batch_size, 16])
+      output, _ = core(inputs, core.initial_state(batch_size))
+      loss = tf.reduce_mean(output)
+      train_op = tf.train.GradientDescentOptimizer(0.1).minimize(loss)
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        sess.run(train_op)
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(train_op)
+        step_time = (time.time() - start_time) / NUM_RUNS
+
+        run_metadata = tf.RunMetadata()
+        sess.run(train_op,
+                 options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+                 run_metadata=run_metadata)
+        peak_bytes = max(
+            memory.peak_bytes
+            for dev_stats in run_metadata.step_stats.dev_stats
+            for node_stats in dev_stats.node_stats
+            for memory in node_stats.memory)
+
+    if attention_chunk_size is None:
+      mode = "full"
+    elif recompute_attention:
+      mode = "chunked_recompute"
+    else:
+      mode = "chunked"
+    self.report_benchmark(
+        name="relational_memory_attention_{}_{}_slots".format(mode, mem_slots),
+        iters=NUM_RUNS,
+        wall_time=step_time,
+        extras={"peak_bytes": peak_bytes})
+
+  def benchmarkAttention(self):
+    for mem_slots in (64, 256, 1024):
+      self._benchmark_attention(mem_slots, None, False)
+      self._benchmark_attention(mem_slots, ATTENTION_CHUNK_SIZE, False)
+      self._benchmark_attention(mem_slots, ATTENTION_CHUNK_SIZE, True)
+
+  def benchmarkNthFarthest(self):
+    for mode in ("dynamic_rnn", "unroll_sequence"):
+      self._benchmark("nth_farthest", mode)
+
+  def benchmarkLearnToExecute(self):
+    for mode in ("dynamic_rnn", "unroll_sequence"):
+      self._benchmark("learn_to_execute", mode)
+
+
+if __name__ == "__main__":
+  tf.test.main()
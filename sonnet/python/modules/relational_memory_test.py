@@ -214,5 +214,102 @@ class RelationalMemoryTest(parameterized.TestCase, tf.test.TestCase):
     self.assertTrue(np.any(np.not_equal(results["memory_0"],
                                         results["memory_1"])))
 
+  @parameterized.parameters(
+      (False, "unit"), (False, "memory"), (False, None), (True, "unit"))
+  def testUnrollSequence(self, treat_input_as_matrix, gate_style):
+    """Checks `unroll_sequence` matches connecting the core at every step."""
+    mem_slots = 2
+    head_size = 8
+    num_heads = 2
+    num_blocks = 2
+    batch_size = 3
+    time_steps = 4
+    input_shape = (time_steps, batch_size, 3, 3)
+    mem = relational_memory.RelationalMemory(mem_slots, head_size, num_heads,
+                                             num_blocks=num_blocks,
+                                             gate_style=gate_style)
+    inputs = tf.constant(
+        np.random.randn(*input_shape).astype(np.float32))
+    initial_memory = mem.initial_state(batch_size)
+
+    outputs, memory = [], initial_memory
+    for t in range(time_steps):
+      output, memory = mem(inputs[t], memory,
+                           treat_input_as_matrix=treat_input_as_matrix)
+      outputs.append(output)
+    num_variables = len(tf.trainable_variables())
+
+    unrolled_outputs, unrolled_memory = mem.unroll_sequence(
+        inputs, initial_memory, treat_input_as_matrix=treat_input_as_matrix)
+    self.assertEqual(num_variables, len(tf.trainable_variables()))
+
+    self.evaluate(tf.global_variables_initializer())
+    outputs, memory, unrolled_outputs, unrolled_memory = self.evaluate(
+        (tf.stack(outputs), memory, unrolled_outputs, unrolled_memory))
+    self.assertAllClose(outputs, unrolled_outputs, atol=1e-5)
+    self.assertAllClose(memory, unrolled_memory, atol=1e-5)
+
+  def testVariablesCreatedOnce(self):
+    """Checks the sub-modules are shared across connections."""
+    mem_slots = 2
+    head_size = 8
+    num_heads = 2
+    num_blocks = 3
+    batch_size = 3
+    mem = relational_memory.RelationalMemory(mem_slots, head_size, num_heads,
+                                             num_blocks=num_blocks)
+    inputs = tf.placeholder(tf.float32, (batch_size, 5))
+    memory = mem.initial_state(batch_size)
+    _, memory = mem(inputs, memory)
+    variables = mem.get_variables()
+    _, memory = mem(inputs, memory)
+    self.assertEqual(variables, mem.get_variables())
+
+    # Input projection, attention MLP, per-block QKV projection and layer norms
+    # and the two gate projections.
+    num_mlp_variables = 2 * mem._attention_mlp_layers
+    self.assertLen(variables,
+                   2 + num_mlp_variables + num_blocks * (2 + 3 * 2) + 2 * 2)
+    names = set(v.op.name for v in variables)
+    self.assertIn("relational_memory/linear/w", names)
+    self.assertIn("relational_memory/layer_norm_{}/gamma".format(
+        3 * num_blocks - 1), names)
+
+  @parameterized.parameters((1, False), (4, False), (4, True), (16, False))
+  def testChunkedAttention(self, attention_chunk_size, recompute_attention):
+    """Checks chunked attention matches attending over all slots at once."""
+    mem_slots = 7
+    head_size = 8
+    num_heads = 2
+    batch_size = 3
+    input_shape = (batch_size, 3, 3)
+    kwargs = dict(num_heads=num_heads, num_blocks=2, gate_style="unit")
+    mem = relational_memory.RelationalMemory(
+        mem_slots, head_size, name="mem", **kwargs)
+    chunked_mem = relational_memory.RelationalMemory(
+        mem_slots, head_size, attention_chunk_size=attention_chunk_size,
+        recompute_attention=recompute_attention, name="chunked_mem", **kwargs)
+    inputs = tf.constant(np.random.randn(*input_shape).astype(np.float32))
+    memory_0 = mem.initial_state(batch_size)
+    results = []
+    for core in (mem, chunked_mem):
+      output, memory_1 = core(inputs, memory_0, treat_input_as_matrix=True)
+      loss = tf.reduce_sum(tf.square(output))
+      gradients = tf.gradients(loss, [inputs] + list(core.get_variables()))
+      results.append((output, memory_1, gradients))
+
+    self.evaluate(tf.global_variables_initializer())
+    self.evaluate([tf.assign(chunked_v, v) for v, chunked_v in zip(
+        mem.get_variables(), chunked_mem.get_variables())])
+    expected, actual = self.evaluate(results)
+    self.assertAllClose(expected, actual, rtol=1e-4, atol=1e-5)
+
+  def testChunkedAttentionBadArguments(self):
+    with self.assertRaisesRegexp(ValueError, "attention_chunk_size"):
+      relational_memory.RelationalMemory(2, 4, attention_chunk_size=0)
+    with self.assertRaisesRegexp(ValueError, "recompute_attention"):
+      relational_memory.RelationalMemory(2, 4, recompute_attention=True)
+
+
 if __name__ == "__main__":
   tf.test.main()
@@ -165,6 +165,206 @@ def trainable_initial_state(batch_size, state_size, dtype, initializers=None,
                                flat_sequence=flat_initial_state)
 
 
+UNROLL_DYNAMIC = "dynamic"
+UNROLL_STATIC = "static"
+UNROLL_MODES = (UNROLL_DYNAMIC, UNROLL_STATIC)
+
+
+def _copy_through_finished(still_running, next_values, prev_values):
+  """Keeps `prev_values` for the batch entries that are not running anymore.
+
+  Args:
+    still_running: boolean Tensor of size `[batch_size]`.
+    next_values: nested structure of Tensors with a leading batch dimension.
+    prev_values: nested structure of Tensors with the same structure and
+      shapes as `next_values`.
+
+  Returns:
+    A nested structure with the same structure as `next_values`. Scalar
+    elements (which have no batch dimension) are taken from `next_values`.
+  """
+  def copy_through(next_value, prev_value):
+    if next_value.get_shape().ndims == 0:
+      return next_value
+    return tf.where(still_running, next_value, prev_value)
+  return nest.map_structure(copy_through, next_values, prev_values)
+
+
+def _zero_finished(still_running, values):
+  """Zeroes `values` for the batch entries that are not running anymore."""
+  return _copy_through_finished(
+      still_running, values, nest.map_structure(tf.zeros_like, values))
+
+
+def _check_unroll_inputs(inputs):
+  """Returns the flattened inputs, checking that they are time major."""
+  flat_inputs = [tf.convert_to_tensor(input_) for input_ in nest.flatten(inputs)]
+  if not flat_inputs:
+    raise ValueError("At least one input sequence is required to unroll.")
+  for input_ in flat_inputs:
+    if input_.get_shape().ndims is not None and input_.get_shape().ndims < 2:
+      raise ValueError("Input sequences must have at least rank 2 "
+                       "(`[time_steps, batch_size, ...]`), got shape {}.".format(
+                           input_.get_shape()))
+  return flat_inputs
+
+
+def static_unroll(step_fn, inputs, initial_state, sequence_length=None):
+  """Unrolls `step_fn` over a time-major sequence with a Python loop.
+
+  Each time step is added to the graph separately, so the size of the graph
+  grows linearly with the number of time steps. This is mostly useful for short
+  sequences, or when the individual time steps need to be inspected.
+
+  Args:
+    step_fn: Callable with the interface of an `RNNCore`, i.e. taking
+      `(input, prev_state)` and returning `(output, next_state)`.
+    inputs: Tensor or nested structure of Tensors of size
+      `[time_steps, batch_size, ...]`. The number of time steps must be
+      statically known.
+    initial_state: Initial state of the recurrence.
+    sequence_length: Optional Tensor of size `[batch_size]` with the length of
+      each sequence in the batch. Outputs past the end of a sequence are zero
+      and its state is copied through.
+
+  Returns:
+    A tuple `(output_sequence, final_state)`, where `output_sequence` has the
+    structure of the output of `step_fn` with an extra leading time dimension.
+
+  Raises:
+    ValueError: If the number of time steps is not statically known.
+  """
+  flat_inputs = _check_unroll_inputs(inputs)
+  num_steps = flat_inputs[0].get_shape()[0].value
+  if num_steps is None:
+    raise ValueError("Static unrolling requires the time dimension (dim 0) of "
+                     "the inputs to be statically known.")
+
+  unstacked_inputs = [tf.unstack(input_, num=num_steps)
+                      for input_ in flat_inputs]
+  state = initial_state
+  outputs = []
+  for time in xrange(num_steps):
+    input_t = nest.pack_sequence_as(
+        inputs, [unstacked[time] for unstacked in unstacked_inputs])
+    output_t, next_state = step_fn(input_t, state)
+    if sequence_length is not None:
+      still_running = tf.less(time, sequence_length)
+      output_t = _zero_finished(still_running, output_t)
+      next_state = _copy_through_finished(still_running, next_state, state)
+    outputs.append(output_t)
+    state = next_state
+
+  output_sequence = nest.map_structure(lambda *steps: tf.stack(steps), *outputs)
+  return output_sequence, state
+
+
+def dynamic_unroll(step_fn, inputs, initial_state, output_size,
+                   sequence_length=None, dtype=None, parallel_iterations=32,
+                   swap_memory=False):
+  """Unrolls `step_fn` over a time-major sequence with a `tf.while_loop`.
+
+  The body of the recurrence is added to the graph only once, so the size of
+  the graph and the time needed to build it do not depend on the number of
+  time steps. Inputs are read from, and outputs written to, `tf.TensorArray`s.
+
+  When `sequence_length` is given, the loop stops after the longest sequence
+  in the batch and the remaining outputs are zero-padded.
+
+  Args:
+    step_fn: Callable with the interface of an `RNNCore`, i.e. taking
+      `(input, prev_state)` and returning `(output, next_state)`.
+    inputs: Tensor or nested structure of Tensors of size
+      `[time_steps, batch_size, ...]`.
+    initial_state: Initial state of the recurrence.
+    output_size: Size or nested structure of sizes (excluding the batch
+      dimension) of the outputs of `step_fn`.
+    sequence_length: Optional Tensor of size `[batch_size]` with the length of
+      each sequence in the batch. Outputs past the end of a sequence are zero
+      and its state is copied through.
+    dtype: The data type of the outputs, or a nested structure of data types
+      with the structure of `output_size`. Defaults to the data type of the
+      first element of `initial_state`.
+    parallel_iterations: The number of iterations allowed to run in parallel.
+    swap_memory: Whether GPU-CPU memory swapping is enabled for this loop.
+
+  Returns:
+    A tuple `(output_sequence, final_state)`, where `output_sequence` has the
+    structure of `output_size` with two extra leading dimensions (time and
+    batch).
+  """
+  flat_inputs = _check_unroll_inputs(inputs)
+  static_num_steps = flat_inputs[0].get_shape()[0].value
+  static_batch_size = flat_inputs[0].get_shape()[1].value
+  num_steps = tf.shape(flat_inputs[0])[0]
+  flat_output_size = nest.flatten(output_size)
+  if dtype is None:
+    dtype = nest.flatten(initial_state)[0].dtype
+  if isinstance(dtype, tf.DType):
+    flat_dtypes = [dtype] * len(flat_output_size)
+  else:
+    nest.assert_same_structure(output_size, dtype)
+    flat_dtypes = nest.flatten(dtype)
+
+  if sequence_length is not None:
+    sequence_length = tf.to_int32(sequence_length, name="sequence_length")
+    # Run at least one step, as in `tf.nn.dynamic_rnn`: stacking the outputs
+    # of an empty loop fails if the batch size is not statically known.
+    max_steps = tf.minimum(
+        num_steps, tf.maximum(1, tf.reduce_max(sequence_length)))
+  else:
+    max_steps = num_steps
+
+  input_tas = [
+      tf.TensorArray(dtype=input_.dtype, size=num_steps,
+                     element_shape=input_.get_shape()[1:],
+                     name="input_ta_{}".format(i)).unstack(input_)
+      for i, input_ in enumerate(flat_inputs)]
+  output_tas = tuple(
+      tf.TensorArray(dtype=output_dtype, size=max_steps,
+                     element_shape=tf.TensorShape([static_batch_size])
+                     .concatenate(size),
+                     name="output_ta_{}".format(i))
+      for i, (size, output_dtype) in enumerate(zip(flat_output_size,
+                                                   flat_dtypes)))
+
+  def body(time, prev_state, output_tas):
+    """Runs a single step of the recurrence."""
+    input_t = nest.pack_sequence_as(
+        inputs, [input_ta.read(time) for input_ta in input_tas])
+    output_t, next_state = step_fn(input_t, prev_state)
+    if sequence_length is not None:
+      still_running = tf.less(time, sequence_length)
+      output_t = _zero_finished(still_running, output_t)
+      next_state = _copy_through_finished(still_running, next_state,
+                                          prev_state)
+    output_tas = tuple(
+        output_ta.write(time, output)
+        for output_ta, output in zip(output_tas, nest.flatten(output_t)))
+    return time + 1, next_state, output_tas
+
+  _, final_state, output_tas = tf.while_loop(
+      cond=lambda time, *_: time < max_steps,
+      body=body,
+      loop_vars=(tf.constant(0, name="time"), initial_state, output_tas),
+      parallel_iterations=parallel_iterations,
+      swap_memory=swap_memory)
+
+  flat_outputs = []
+  for output_ta in output_tas:
+    output = output_ta.stack()
+    if sequence_length is not None:
+      padding = [[0, num_steps - max_steps]]
+      padding += [[0, 0]] * (output.get_shape().ndims - 1)
+      output = tf.pad(output, padding)
+    output.set_shape(
+        tf.TensorShape([static_num_steps]).concatenate(output.get_shape()[1:]))
+    flat_outputs.append(output)
+
+  output_sequence = nest.pack_sequence_as(output_size, flat_outputs)
+  return output_sequence, final_state
+
+
 @six.add_metaclass(abc.ABCMeta)
 class RNNCore(base.AbstractModule):
   """Superclass for Recurrent Neural Network Cores.
@@ -240,6 +440,69 @@ class RNNCore(base.AbstractModule):
             regularizers=trainable_regularizers,
             name=self._initial_state_scope(name))
 
+  def _unroll_scope(self, name):
+    """Defines the name scope of the unroll ops."""
+    return name if name else "%s_unroll" % self.scope_name
+
+  def unroll(self, inputs, initial_state, sequence_length=None,
+             mode=UNROLL_DYNAMIC, dtype=None, parallel_iterations=32,
+             swap_memory=False, name=None):
+    """Unrolls the core over a time-major input sequence.
+
+    In `"dynamic"` mode the core is connected once inside a `tf.while_loop`,
+    so the size of the graph does not grow with the number of time steps. In
+    `"static"` mode the core is connected once per time step, which requires
+    the number of time steps to be statically known.
+
+    Example usage:
+
+      lstm = snt.LSTM(hidden_size=256)
+      deep_rnn = snt.DeepRNN([lstm, snt.LSTM(hidden_size=256)])
+      output_sequence, final_state = deep_rnn.unroll(
+          input_sequence, deep_rnn.initial_state(batch_size),
+          sequence_length=lengths)
+
+    Args:
+      inputs: Tensor or nested structure of Tensors of size
+        `[time_steps, batch_size, ...]`.
+      initial_state: Initial state of the core, e.g. as returned by
+        `initial_state`. It may be arbitrarily nested.
+      sequence_length: Optional Tensor of size `[batch_size]` with the length of
+        each sequence in the batch. Outputs past the end of a sequence are zero
+        and its state is copied through, so the returned final state is the
+        state at the end of each sequence.
+      mode: Either `"dynamic"` or `"static"`.
+      dtype: The data type of the outputs in `"dynamic"` mode. Defaults to the
+        data type of the first element of `initial_state`.
+      parallel_iterations: The number of iterations allowed to run in parallel
+        in `"dynamic"` mode.
+      swap_memory: Whether GPU-CPU memory swapping is enabled in `"dynamic"`
+        mode.
+      name: Optional name scope for the unroll ops. Defaults to the name of the
+        module followed by `_unroll`.
+
+    Returns:
+      A tuple `(output_sequence, final_state)`, where `output_sequence` has the
+      structure of `output_size` with leading time and batch dimensions, and
+      `final_state` has the structure of `initial_state`.
+
+    Raises:
+      ValueError: If `mode` is not one of `"dynamic"` or `"static"`.
+      ValueError: If `mode` is `"static"` and the number of time steps is not
+        statically known.
+    """
+    if mode not in UNROLL_MODES:
+      raise ValueError("Invalid unroll mode '{}', must be one of {}.".format(
+          mode, UNROLL_MODES))
+    with tf.name_scope(self._unroll_scope(name)):
+      if mode == UNROLL_STATIC:
+        return static_unroll(self, inputs, initial_state,
+                             sequence_length=sequence_length)
+      return dynamic_unroll(self, inputs, initial_state, self.output_size,
+                            sequence_length=sequence_length, dtype=dtype,
+                            parallel_iterations=parallel_iterations,
+                            swap_memory=swap_memory)
+
   @property
   def state_size(self):
     """size(s) of state(s) used by this cell.
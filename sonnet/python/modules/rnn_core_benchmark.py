@@ -0,0 +1,91 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks for static, dynamic and layer-major unrolling of recurrent cores.
+
+Run with:
+
+  python rnn_core_benchmark.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+BATCH_SIZE = 32
+INPUT_SIZE = 64
+HIDDEN_SIZE = 256
+NUM_RUNS = 10
+
+
+class UnrollBenchmark(tf.test.Benchmark):
+  """Compares graph build time, GraphDef size and step time of unroll modes."""
+
+  def _benchmark_unroll(self, mode, num_steps):
+    with tf.Graph().as_default() as graph:
+      core = snt.DeepRNN([snt.LSTM(HIDDEN_SIZE, name="lstm_0"),
+                          snt.LSTM(HIDDEN_SIZE, name="lstm_1")],
+                         name="deep_lstm")
+      inputs = tf.random_normal([num_steps, BATCH_SIZE, INPUT_SIZE])
+
+      start_time = time.time()
+      if mode == "layer_major":
+        output_sequence, _ = core.unroll_sequence(
+            inputs, core.initial_state(BATCH_SIZE))
+      else:
+        output_sequence, _ = core.unroll(
+            inputs, core.initial_state(BATCH_SIZE), mode=mode)
+      loss = tf.reduce_mean(output_sequence)
+      train_op = tf.train.GradientDescentOptimizer(0.1).minimize(loss)
+      build_time = time.time() - start_time
+      graph_def_bytes = graph.as_graph_def().ByteSize()
+
+      with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        # Warm up.
+        sess.run(train_op)
+        start_time = time.time()
+        for _ in range(NUM_RUNS):
+          sess.run(train_op)
+        step_time = (time.time() - start_time) / NUM_RUNS
+
+    self.report_benchmark(
+        name="unroll_{}_{}_steps".format(mode, num_steps),
+        iters=NUM_RUNS,
+        wall_time=step_time,
+        extras={"build_time": build_time,
+                "graph_def_bytes": graph_def_bytes})
+
+  def benchmarkStaticUnroll(self):
+    for num_steps in (10, 100, 1000):
+      self._benchmark_unroll("static", num_steps)
+
+  def benchmarkDynamicUnroll(self):
+    for num_steps in (10, 100, 1000):
+      self._benchmark_unroll("dynamic", num_steps)
+
+  def benchmarkLayerMajorUnroll(self):
+    for num_steps in (10, 100, 1000):
+      self._benchmark_unroll("layer_major", num_steps)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -24,6 +24,7 @@ from absl.testing import parameterized
 import mock
 import numpy as np
 import sonnet as snt
+from sonnet.python.modules import rnn_core
 import tensorflow as tf
 
 nest = tf.contrib.framework.nest
@@ -187,5 +188,101 @@ class TrainableInitialState(tf.test.TestCase, parameterized.TestCase):
       self.evaluate(tf.global_variables_initializer())
 
 
+class UnrollTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _deep_lstm(self):
+    return snt.DeepRNN([snt.LSTM(4, name="lstm_0"), snt.LSTM(5, name="lstm_1")],
+                       name="deep_lstm")
+
+  @parameterized.parameters(
+      ("dynamic", False), ("dynamic", True), ("static", False),
+      ("static", True))
+  def testMatchesDynamicRNN(self, mode, use_sequence_length):
+    seq_len, batch_size, input_size = 6, BATCH_SIZE, 3
+    inputs = tf.random_normal([seq_len, batch_size, input_size])
+    sequence_length = (tf.constant([6, 2, 0, 5, 3])
+                       if use_sequence_length else None)
+    core = self._deep_lstm()
+    initial_state = core.initial_state(batch_size)
+
+    output_sequence, final_state = core.unroll(
+        inputs, initial_state, sequence_length=sequence_length, mode=mode)
+    expected_output, expected_state = tf.nn.dynamic_rnn(
+        core, inputs, initial_state=initial_state,
+        sequence_length=sequence_length, time_major=True)
+
+    nest.assert_same_structure(final_state, initial_state)
+    self.assertEqual(output_sequence.get_shape().as_list(),
+                     [seq_len, batch_size, 9])
+
+    self.evaluate(tf.global_variables_initializer())
+    outputs_v, expected_v = self.evaluate(
+        [(output_sequence, final_state), (expected_output, expected_state)])
+    for actual, expected in zip(nest.flatten(outputs_v),
+                                nest.flatten(expected_v)):
+      self.assertAllClose(actual, expected)
+
+  def testNestedInputs(self):
+    seq_len, batch_size = 4, BATCH_SIZE
+    inputs = (tf.random_normal([seq_len, batch_size, 2]),
+              tf.random_normal([seq_len, batch_size, 3]))
+    core = snt.LSTM(4)
+
+    def step(inputs_t, prev_state):
+      return core(tf.concat(inputs_t, axis=1), prev_state)
+
+    output_sequence, _ = rnn_core.dynamic_unroll(
+        step, inputs, core.initial_state(batch_size), core.output_size)
+    self.assertEqual(output_sequence.get_shape().as_list(),
+                     [seq_len, batch_size, 4])
+
+  def testGraphSizeIndependentOfLength(self):
+    num_ops = []
+    for seq_len in (10, 100):
+      with tf.Graph().as_default() as graph:
+        core = snt.LSTM(4)
+        inputs = tf.zeros([seq_len, BATCH_SIZE, 3])
+        core.unroll(inputs, core.initial_state(BATCH_SIZE))
+        num_ops.append(len(graph.get_operations()))
+    self.assertEqual(num_ops[0], num_ops[1])
+
+  def testAllZeroSequenceLengthUnknownBatchSize(self):
+    if tf.executing_eagerly():
+      self.skipTest("Placeholders are not supported in eager mode.")
+    seq_len, input_size = 4, 3
+    inputs = tf.placeholder(tf.float32, [seq_len, None, input_size])
+    sequence_length = tf.placeholder(tf.int32, [None])
+    core = snt.LSTM(4)
+    initial_state = core.initial_state(tf.shape(inputs)[1])
+
+    output_sequence, final_state = core.unroll(
+        inputs, initial_state, sequence_length=sequence_length)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      output_v, final_state_v, initial_state_v = sess.run(
+          [output_sequence, final_state, initial_state],
+          feed_dict={inputs: np.ones([seq_len, BATCH_SIZE, input_size]),
+                     sequence_length: np.zeros([BATCH_SIZE])})
+    self.assertAllEqual(output_v, np.zeros([seq_len, BATCH_SIZE, 4]))
+    for actual, expected in zip(nest.flatten(final_state_v),
+                                nest.flatten(initial_state_v)):
+      self.assertAllClose(actual, expected)
+
+  def testInvalidMode(self):
+    core = snt.LSTM(4)
+    with self.assertRaisesRegexp(ValueError, "Invalid unroll mode"):
+      core.unroll(tf.zeros([3, BATCH_SIZE, 2]), core.initial_state(BATCH_SIZE),
+                  mode="bogus")
+
+  def testStaticRequiresKnownLength(self):
+    if tf.executing_eagerly():
+      self.skipTest("Placeholders are not supported in eager mode.")
+    core = snt.LSTM(4)
+    inputs = tf.placeholder(tf.float32, [None, BATCH_SIZE, 2])
+    with self.assertRaisesRegexp(ValueError, "statically known"):
+      core.unroll(inputs, core.initial_state(BATCH_SIZE), mode="static")
+
+
 if __name__ == "__main__":
   tf.test.main()
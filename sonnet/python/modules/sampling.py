@@ -0,0 +1,397 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Modules for autoregressive decoding from recurrent cores.
+
+This file contains implementations for:
+  * Sampler (temperature, top-k and nucleus sampling)
+  * BeamSearch
+
+Both modules feed their own predictions back into an `RNNCore` inside a single
+`tf.while_loop`, so the size of the graph does not depend on the number of
+decoded steps.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+import tensorflow as tf
+
+nest = tf.contrib.framework.nest
+
+
+# Result of Sampler._build(). See docstring therein for details.
+SampleOutput = collections.namedtuple(
+    "SampleOutput", ["tokens", "lengths", "final_state"])
+
+# Result of BeamSearch._build(). See docstring therein for details.
+BeamSearchOutput = collections.namedtuple(
+    "BeamSearchOutput", ["predicted_ids", "scores", "lengths"])
+
+
+def _restore_shapes(loop_vars, next_loop_vars):
+  """Sets the static shapes of the loop variables the loop body has lost."""
+  def restore_shape(loop_var, next_loop_var):
+    if isinstance(next_loop_var, tf.Tensor):
+      next_loop_var.set_shape(loop_var.get_shape())
+    return next_loop_var
+  return nest.map_structure(restore_shape, loop_vars, next_loop_vars)
+
+
+def _mask_logits(logits, mask):
+  """Sets the logits where `mask` is True to the lowest representable value."""
+  return tf.where(mask, tf.fill(tf.shape(logits), logits.dtype.min), logits)
+
+
+def _top_k_logits(logits, k):
+  """Masks all but the `k` largest logits of each row."""
+  values, _ = tf.nn.top_k(logits, k=k)
+  return _mask_logits(logits, logits < values[:, -1:])
+
+
+def _top_p_logits(logits, p):
+  """Masks all but the smallest set of logits with a probability of `p`."""
+  sorted_logits, _ = tf.nn.top_k(logits, k=tf.shape(logits)[-1])
+  # The most probable token is always kept, as its exclusive sum is zero.
+  exclusive_probs = tf.cumsum(
+      tf.nn.softmax(sorted_logits), axis=-1, exclusive=True)
+  threshold = tf.reduce_min(
+      tf.where(exclusive_probs < p, sorted_logits,
+               tf.fill(tf.shape(sorted_logits), logits.dtype.max)),
+      axis=-1, keepdims=True)
+  return _mask_logits(logits, logits < threshold)
+
+
+class Sampler(base.AbstractModule):
+  """Samples sequences from a recurrent core, one token at a time.
+
+  At each step a token is sampled from the current logits, embedded and fed
+  back into the core, whose output is mapped to the logits of the next step:
+
+  ```python
+  sampler = snt.Sampler(core, embed=snt.Embed(vocab_size, 32),
+                        output=snt.Linear(vocab_size), top_p=0.9)
+  samples = sampler(initial_logits, initial_state, num_steps=1000)
+  ```
+
+  The logits may be divided by a `temperature` and restricted to the `top_k`
+  most likely tokens and/or to the smallest set of tokens with a total
+  probability of at least `top_p` (nucleus sampling). All the steps run inside
+  a single `tf.while_loop`. If an `end_token` is given, sampling stops early
+  once every sequence in the batch has produced it.
+  """
+
+  def __init__(self, core, embed, output, temperature=1.0, top_k=None,
+               top_p=None, end_token=None, parallel_iterations=32,
+               name="sampler"):
+    """Constructs a `Sampler`.
+
+    Args:
+      core: `RNNCore` to sample from.
+      embed: Callable mapping a Tensor of token ids of size `[batch_size]` to
+        the input of `core`.
+      output: Callable mapping the output of `core` to logits of size
+        `[batch_size, vocab_size]`.
+      temperature: Positive number the logits are divided by before sampling.
+      top_k: Optional integer; if set, tokens are only sampled from the `top_k`
+        most likely ones.
+      top_p: Optional number in `(0, 1]`; if set, tokens are only sampled from
+        the smallest set of most likely tokens whose probability adds up to at
+        least `top_p`.
+      end_token: Optional integer id of the token that ends a sequence.
+      parallel_iterations: The number of iterations allowed to run in parallel.
+      name: Name of the module.
+
+    Raises:
+      ValueError: if `temperature` is not positive, `top_k` is not positive or
+        `top_p` is not in `(0, 1]`.
+    """
+    super(Sampler, self).__init__(name=name)
+    if temperature <= 0:
+      raise ValueError("temperature must be positive, got {}.".format(
+          temperature))
+    if top_k is not None and top_k < 1:
+      raise ValueError("top_k must be positive, got {}.".format(top_k))
+    if top_p is not None and not 0 < top_p <= 1:
+      raise ValueError("top_p must be in (0, 1], got {}.".format(top_p))
+    self._core = core
+    self._embed = embed
+    self._output = output
+    self._temperature = temperature
+    self._top_k = top_k
+    self._top_p = top_p
+    self._end_token = end_token
+    self._parallel_iterations = parallel_iterations
+
+  def _sample(self, logits):
+    """Samples a token id for each row of `logits`."""
+    if self._temperature != 1.0:
+      logits /= self._temperature
+    if self._top_k is not None:
+      logits = _top_k_logits(logits, self._top_k)
+    if self._top_p is not None:
+      logits = _top_p_logits(logits, self._top_p)
+    return tf.squeeze(tf.multinomial(logits, 1, output_dtype=tf.int32), [1])
+
+  def _build(self, initial_logits, initial_state, num_steps):
+    """Samples a batch of sequences.
+
+    Args:
+      initial_logits: Tensor of size `[batch_size, vocab_size]` with the logits
+        of the first token.
+      initial_state: Initial state of the core.
+      num_steps: Integer or scalar int32 Tensor with the maximum number of
+        tokens to sample.
+
+    Returns:
+      A `SampleOutput` namedtuple containing:
+        tokens: int32 Tensor of size `[time_steps, batch_size]` with the sampled
+          token ids. `time_steps` is `num_steps` unless every sequence ended
+          before. Sequences that ended are padded with `end_token`.
+        lengths: int32 Tensor of size `[batch_size]` with the length of each
+          sequence, including its `end_token`.
+        final_state: The state of the core after the last sampled token was
+          fed back into it or, for sequences that ended, the state from which
+          they produced the `end_token`.
+    """
+    batch_size = tf.shape(initial_logits)[0]
+    tokens_ta = tf.TensorArray(
+        tf.int32, size=0, dynamic_size=True,
+        element_shape=initial_logits.get_shape()[:1])
+
+    def cond(time, unused_logits, unused_state, finished, unused_lengths,
+             unused_tokens_ta):
+      return tf.logical_and(time < num_steps,
+                            tf.logical_not(tf.reduce_all(finished)))
+
+    def body(time, logits, state, finished, lengths, tokens_ta):
+      """Samples one token and feeds it back into the core."""
+      tokens = self._sample(logits)
+      lengths += tf.to_int32(tf.logical_not(finished))
+      if self._end_token is not None:
+        tokens = tf.where(finished, tf.fill([batch_size], self._end_token),
+                          tokens)
+        finished = tf.logical_or(finished, tf.equal(tokens, self._end_token))
+      tokens_ta = tokens_ta.write(time, tokens)
+
+      core_output, next_state = self._core(self._embed(tokens), state)
+      next_logits = self._output(core_output)
+      if self._end_token is not None:
+        # Sequences keep the state from which they produced the end token.
+        next_state = nest.map_structure(
+            lambda prev, new: tf.where(finished, prev, new), state, next_state)
+      return _restore_shapes(
+          (time, logits, state, finished, lengths, tokens_ta),
+          (time + 1, next_logits, next_state, finished, lengths, tokens_ta))
+
+    _, _, final_state, _, lengths, tokens_ta = tf.while_loop(
+        cond, body,
+        loop_vars=(tf.constant(0), initial_logits, initial_state,
+                   tf.zeros([batch_size], dtype=tf.bool),
+                   tf.zeros([batch_size], dtype=tf.int32), tokens_ta),
+        parallel_iterations=self._parallel_iterations)
+
+    return SampleOutput(tokens=tokens_ta.stack(), lengths=lengths,
+                        final_state=final_state)
+
+
+class BeamSearch(base.AbstractModule):
+  """Batched beam search over the predictions of a recurrent core.
+
+  For every example in the batch, `beam_width` hypotheses are kept. At each
+  step every hypothesis is extended with every token and the `beam_width`
+  extensions with the highest (length normalized) log probability are kept.
+  All the steps run inside a single `tf.while_loop`, which stops early once
+  every hypothesis has produced the `end_token`.
+
+  Internally the hypotheses are batched beam-major, i.e. the core is run on a
+  batch of size `beam_width * batch_size` in which hypothesis `k` of example
+  `b` is at index `k * batch_size + b`. After each step the state of the core
+  is gathered from the parent of every surviving hypothesis, and the final
+  sequences are recovered by following the parent indices back in time.
+
+  Length normalization follows https://arxiv.org/abs/1609.08144: log
+  probabilities are divided by `((5 + length) / 6) ** length_penalty_weight`.
+  """
+
+  def __init__(self, core, embed, output, beam_width, end_token=None,
+               length_penalty_weight=0.0, parallel_iterations=32,
+               name="beam_search"):
+    """Constructs a `BeamSearch`.
+
+    Args:
+      core: `RNNCore` to decode from.
+      embed: Callable mapping a Tensor of token ids of size `[batch_size]` to
+        the input of `core`.
+      output: Callable mapping the output of `core` to logits of size
+        `[batch_size, vocab_size]`.
+      beam_width: Number of hypotheses kept for each example.
+      end_token: Optional integer id of the token that ends a sequence.
+      length_penalty_weight: Non-negative number; the weight of the length
+        normalization of the scores. Zero disables it.
+      parallel_iterations: The number of iterations allowed to run in parallel.
+      name: Name of the module.
+
+    Raises:
+      ValueError: if `beam_width` is not positive or `length_penalty_weight` is
+        negative.
+    """
+    super(BeamSearch, self).__init__(name=name)
+    if beam_width < 1:
+      raise ValueError("beam_width must be positive, got {}.".format(
+          beam_width))
+    if length_penalty_weight < 0:
+      raise ValueError("length_penalty_weight must be non-negative, got "
+                       "{}.".format(length_penalty_weight))
+    self._core = core
+    self._embed = embed
+    self._output = output
+    self._beam_width = beam_width
+    self._end_token = end_token
+    self._length_penalty_weight = length_penalty_weight
+    self._parallel_iterations = parallel_iterations
+
+  def _length_penalty(self, lengths, dtype):
+    return tf.pow((5. + tf.cast(lengths, dtype)) / 6.,
+                  self._length_penalty_weight)
+
+  def _build(self, initial_logits, initial_state, num_steps):
+    """Searches for the most likely sequences.
+
+    Args:
+      initial_logits: Tensor of size `[batch_size, vocab_size]` with the logits
+        of the first token.
+      initial_state: Initial state of the core, for a batch of size
+        `batch_size`.
+      num_steps: Integer or scalar int32 Tensor with the maximum length of the
+        sequences.
+
+    Returns:
+      A `BeamSearchOutput` namedtuple containing:
+        predicted_ids: int32 Tensor of size
+          `[time_steps, batch_size, beam_width]` with the token ids of each
+          hypothesis, best first. Hypotheses are padded with `end_token` after
+          they end.
+        scores: Tensor of size `[batch_size, beam_width]` with the (length
+          normalized) log probability of each hypothesis.
+        lengths: int32 Tensor of size `[batch_size, beam_width]` with the
+          length of each hypothesis, including its `end_token`.
+    """
+    beam_width = self._beam_width
+    dtype = initial_logits.dtype
+    batch_size = tf.shape(initial_logits)[0]
+    vocab_size = tf.shape(initial_logits)[1]
+
+    def tile_beams(tensor):
+      multiples = [beam_width] + [1] * (tensor.get_shape().ndims - 1)
+      return tf.tile(tensor, multiples)
+
+    def to_beam_major(tensor):
+      """Flattens a `[batch_size, beam_width]` Tensor in beam-major order."""
+      return tf.reshape(tf.transpose(tensor), [-1])
+
+    def gather_beams(tensor, indices):
+      """Gathers `indices` of size `[batch_size, beam_width]` from `tensor`."""
+      batch_indices = tf.tile(tf.expand_dims(tf.range(batch_size), 1),
+                              [1, beam_width])
+      return tf.gather_nd(tensor, tf.stack([batch_indices, indices], axis=2))
+
+    # All the hypotheses start identical, so only the first one is expanded.
+    initial_log_probs = tf.tile(
+        tf.constant([[0.] + [-np.inf] * (beam_width - 1)], dtype=dtype),
+        [batch_size, 1])
+    if self._end_token is not None:
+      # Finished hypotheses can only be extended with the end token, for free.
+      finished_log_probs = tf.one_hot(
+          self._end_token, vocab_size, on_value=0., off_value=dtype.min,
+          dtype=dtype)
+    ids_ta = tf.TensorArray(tf.int32, size=0, dynamic_size=True)
+    parents_ta = tf.TensorArray(tf.int32, size=0, dynamic_size=True)
+
+    def cond(time, unused_logits, unused_state, unused_log_probs, unused_scores,
+             finished, unused_lengths, unused_ids_ta, unused_parents_ta):
+      return tf.logical_and(time < num_steps,
+                            tf.logical_not(tf.reduce_all(finished)))
+
+    def body(time, logits, state, log_probs, unused_scores, finished, lengths,
+             ids_ta, parents_ta):
+      """Extends every hypothesis by one token and keeps the best ones."""
+      loop_finished, loop_lengths = finished, lengths
+      step_log_probs = tf.transpose(
+          tf.reshape(tf.nn.log_softmax(logits),
+                     [beam_width, batch_size, vocab_size]), [1, 0, 2])
+      if self._end_token is not None:
+        finished_mask = tf.expand_dims(tf.cast(finished, dtype), 2)
+        step_log_probs = (step_log_probs * (1. - finished_mask) +
+                          finished_log_probs * finished_mask)
+      total_log_probs = tf.expand_dims(log_probs, 2) + step_log_probs
+      new_lengths = lengths + tf.to_int32(tf.logical_not(finished))
+
+      scores = total_log_probs
+      if self._length_penalty_weight:
+        scores /= tf.expand_dims(self._length_penalty(new_lengths, dtype), 2)
+      scores, indices = tf.nn.top_k(
+          tf.reshape(scores, [batch_size, -1]), k=beam_width)
+      parents = indices // vocab_size
+      ids = indices % vocab_size
+
+      log_probs = gather_beams(
+          tf.reshape(total_log_probs, [batch_size, -1]), indices)
+      lengths = gather_beams(new_lengths, parents)
+      finished = gather_beams(finished, parents)
+      if self._end_token is not None:
+        finished = tf.logical_or(finished, tf.equal(ids, self._end_token))
+      ids_ta = ids_ta.write(time, ids)
+      parents_ta = parents_ta.write(time, parents)
+
+      # Hypothesis `k` of example `b` continues from the state of its parent.
+      state_indices = to_beam_major(
+          parents * batch_size + tf.expand_dims(tf.range(batch_size), 1))
+      gathered_state = nest.map_structure(
+          lambda tensor: tf.gather(tensor, state_indices), state)
+
+      core_output, next_state = self._core(
+          self._embed(to_beam_major(ids)), gathered_state)
+      next_logits = self._output(core_output)
+      return _restore_shapes(
+          (time, logits, state, initial_log_probs, initial_log_probs,
+           loop_finished, loop_lengths, ids_ta, parents_ta),
+          (time + 1, next_logits, next_state, log_probs, scores, finished,
+           lengths, ids_ta, parents_ta))
+
+    loop_vars = (tf.constant(0), tile_beams(initial_logits),
+                 nest.map_structure(tile_beams, initial_state),
+                 initial_log_probs, initial_log_probs,
+                 tf.zeros([batch_size, beam_width], dtype=tf.bool),
+                 tf.zeros([batch_size, beam_width], dtype=tf.int32),
+                 ids_ta, parents_ta)
+    (num_decoded_steps, _, _, _, scores, _, lengths, ids_ta,
+     parents_ta) = tf.while_loop(
+         cond, body, loop_vars=loop_vars,
+         parallel_iterations=self._parallel_iterations)
+
+    end_token = -1 if self._end_token is None else self._end_token
+    predicted_ids = tf.contrib.seq2seq.gather_tree(
+        ids_ta.stack(), parents_ta.stack(),
+        max_sequence_lengths=tf.fill([batch_size], num_decoded_steps),
+        end_token=end_token)
+    return BeamSearchOutput(predicted_ids=predicted_ids, scores=scores,
+                            lengths=lengths)
@@ -0,0 +1,188 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.sampling."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import itertools
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+class MarkovCore(snt.RNNCore):
+  """Core that outputs its (one-hot) input, so logits only depend on it."""
+
+  def __init__(self, vocab_size, name="markov_core"):
+    super(MarkovCore, self).__init__(name=name)
+    self._vocab_size = vocab_size
+
+  def _build(self, inputs, prev_state):
+    return inputs, inputs
+
+  @property
+  def state_size(self):
+    return tf.TensorShape([self._vocab_size])
+
+  @property
+  def output_size(self):
+    return tf.TensorShape([self._vocab_size])
+
+
+class SamplingTestBase(tf.test.TestCase):
+
+  def setUp(self):
+    super(SamplingTestBase, self).setUp()
+    self.batch_size = 3
+    self.vocab_size = 5
+    rng = np.random.RandomState(0)
+    self.initial_probs = rng.dirichlet(
+        np.ones(self.vocab_size), size=self.batch_size).astype(np.float32)
+    self.transitions = rng.dirichlet(
+        np.ones(self.vocab_size), size=self.vocab_size).astype(np.float32)
+
+  def build_modules(self):
+    core = MarkovCore(self.vocab_size)
+    embed = lambda ids: tf.one_hot(ids, self.vocab_size)
+    output = lambda x: tf.matmul(x, tf.log(self.transitions))
+    initial_state = core.initial_state(self.batch_size)
+    return core, embed, output, tf.log(self.initial_probs), initial_state
+
+
+class SamplerTest(SamplingTestBase, parameterized.TestCase):
+
+  @parameterized.parameters({"top_k": 1}, {"top_p": 1e-3})
+  def testGreedy(self, **kwargs):
+    num_steps = 6
+    core, embed, output, initial_logits, initial_state = self.build_modules()
+    sampler = snt.Sampler(core, embed, output, **kwargs)
+    samples = sampler(initial_logits, initial_state, num_steps)
+    tokens, lengths = self.evaluate((samples.tokens, samples.lengths))
+
+    expected = [np.argmax(self.initial_probs, axis=1)]
+    for _ in range(num_steps - 1):
+      expected.append(np.argmax(self.transitions[expected[-1]], axis=1))
+    self.assertAllEqual(tokens, np.stack(expected))
+    self.assertAllEqual(lengths, [num_steps] * self.batch_size)
+
+  def testTopK(self):
+    core, embed, output, initial_logits, initial_state = self.build_modules()
+    sampler = snt.Sampler(core, embed, output, temperature=10., top_k=2)
+    samples = sampler(tf.tile(initial_logits[:1], [1000, 1]),
+                      tf.tile(initial_state[:1], [1000, 1]), num_steps=1)
+    tokens = self.evaluate(samples.tokens)
+    self.assertAllEqual(set(tokens.flatten()),
+                        set(np.argsort(self.initial_probs[0])[-2:]))
+
+  def testEndToken(self):
+    num_steps = 10
+    end_token = 0
+    core, embed, output, _, initial_state = self.build_modules()
+    # The first token of the first sequence is the end token, the others
+    # produce it after some steps.
+    self.transitions[:] = 0.01
+    self.transitions[np.arange(self.vocab_size), [0, 0, 1, 2, 3]] = 0.96
+    initial_probs = 0.01 + 0.95 * np.eye(self.vocab_size)[[0, 2, 4]]
+    initial_logits = tf.log(initial_probs.astype(np.float32))
+    sampler = snt.Sampler(core, embed, output, top_k=1, end_token=end_token)
+    samples = sampler(initial_logits, initial_state, num_steps)
+    tokens, lengths = self.evaluate((samples.tokens, samples.lengths))
+
+    self.assertAllEqual(tokens, [[0, 2, 4], [0, 1, 3], [0, 0, 2], [0, 0, 1],
+                                 [0, 0, 0]])
+    self.assertAllEqual(lengths, [1, 3, 5])
+
+  def testUnknownNumSteps(self):
+    core, embed, output, initial_logits, initial_state = self.build_modules()
+    num_steps = tf.placeholder(tf.int32, [])
+    sampler = snt.Sampler(core, embed, output)
+    samples = sampler(initial_logits, initial_state, num_steps)
+    with self.test_session() as sess:
+      tokens = sess.run(samples.tokens, feed_dict={num_steps: 7})
+    self.assertEqual(tokens.shape, (7, self.batch_size))
+
+  def testInvalidArguments(self):
+    core, embed, output, _, _ = self.build_modules()
+    with self.assertRaisesRegexp(ValueError, "temperature"):
+      snt.Sampler(core, embed, output, temperature=0.)
+    with self.assertRaisesRegexp(ValueError, "top_k"):
+      snt.Sampler(core, embed, output, top_k=0)
+    with self.assertRaisesRegexp(ValueError, "top_p"):
+      snt.Sampler(core, embed, output, top_p=1.5)
+
+
+class BeamSearchTest(SamplingTestBase):
+
+  def testMatchesExhaustiveSearch(self):
+    num_steps = 3
+    # Wide enough to never prune a prefix, so the search is exhaustive.
+    beam_width = self.vocab_size ** (num_steps - 1)
+    core, embed, output, initial_logits, initial_state = self.build_modules()
+    beam_search = snt.BeamSearch(core, embed, output, beam_width)
+    result = beam_search(initial_logits, initial_state, num_steps)
+    predicted_ids, scores = self.evaluate((result.predicted_ids, result.scores))
+
+    for b in range(self.batch_size):
+      candidates = []
+      for sequence in itertools.product(range(self.vocab_size),
+                                        repeat=num_steps):
+        log_prob = np.log(self.initial_probs[b, sequence[0]])
+        for prev, token in zip(sequence[:-1], sequence[1:]):
+          log_prob += np.log(self.transitions[prev, token])
+        candidates.append((log_prob, sequence))
+      candidates.sort(reverse=True)
+      expected_scores, expected_ids = zip(*candidates[:beam_width])
+      self.assertAllClose(scores[b], expected_scores, rtol=1e-5)
+      self.assertAllEqual(predicted_ids[:, b, :].T, expected_ids)
+
+  def testEndToken(self):
+    num_steps = 10
+    end_token = 0
+    core, embed, output, _, initial_state = self.build_modules()
+    self.transitions[:] = 0.01
+    self.transitions[np.arange(self.vocab_size), [0, 0, 1, 2, 3]] = 0.96
+    initial_probs = 0.01 + 0.95 * np.eye(self.vocab_size)[[1, 2, 4]]
+    initial_logits = tf.log(initial_probs.astype(np.float32))
+    beam_search = snt.BeamSearch(core, embed, output, beam_width=2,
+                                 end_token=end_token)
+    result = beam_search(initial_logits, initial_state, num_steps)
+    predicted_ids, lengths = self.evaluate(
+        (result.predicted_ids, result.lengths))
+
+    # The best hypotheses end with the end token and are padded with it.
+    self.assertAllEqual(predicted_ids[:5, :, 0].T, [[1, 0, 0, 0, 0],
+                                                    [2, 1, 0, 0, 0],
+                                                    [4, 3, 2, 1, 0]])
+    self.assertAllEqual(predicted_ids[5:, :, 0],
+                        np.zeros_like(predicted_ids[5:, :, 0]))
+    self.assertAllEqual(lengths[:, 0], [2, 3, 5])
+
+  def testInvalidArguments(self):
+    core, embed, output, _, _ = self.build_modules()
+    with self.assertRaisesRegexp(ValueError, "beam_width"):
+      snt.BeamSearch(core, embed, output, beam_width=0)
+    with self.assertRaisesRegexp(ValueError, "length_penalty_weight"):
+      snt.BeamSearch(core, embed, output, beam_width=2,
+                     length_penalty_weight=-1.)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -13,76 +13,298 @@
 # limitations under the License.
 # ============================================================================
 
-"""Removes the ":0" suffix from names in a checkpoint."""
+"""Migrates the names, dtypes and partitioning of tensors in a checkpoint.
+
+By default, removes the ":0" suffix from names in a checkpoint.
+
+Tensors are streamed from the source checkpoint to the target one in batches
+of at most `--max_batch_bytes` (or a single tensor, if it is larger). Each
+batch is fed to a `SaveV2` op writing a shard of the target checkpoint, and the
+shards are merged at the end, so neither the graph nor the memory of the
+process hold the whole checkpoint.
+"""
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+from multiprocessing import pool
+import os
+import re
+import threading
+
 # Dependency imports
+import numpy as np
 import tensorflow as tf
 
+from tensorflow.python.ops import gen_io_ops
+from tensorflow.python.ops import io_ops
+
 
 tf.app.flags.DEFINE_string("source", None, "Source checkpoint")
 tf.app.flags.DEFINE_string("target", None, "Target checkpoint")
 tf.app.flags.DEFINE_boolean("dry_run", False, "Whether to do a dry run")
+tf.app.flags.DEFINE_boolean("remove_colon_zero", True,
+                            "Whether to remove the ':0' suffix from names")
+tf.app.flags.DEFINE_multi_string(
+    "rename", [],
+    "PATTERN=REPLACEMENT rule, applied with re.sub to the tensor names in "
+    "order. Tensors renamed to an empty name are dropped.")
+tf.app.flags.DEFINE_multi_string(
+    "cast", [], "PATTERN=DTYPE rule, casting the tensors whose new name "
+    "matches PATTERN to DTYPE, e.g. 'bfloat16'. The first match applies.")
+tf.app.flags.DEFINE_multi_string(
+    "partition", [], "PATTERN=NUM_PARTITIONS rule, saving the tensors whose "
+    "new name matches PATTERN as slices along their first dimension. The "
+    "first match applies.")
+tf.app.flags.DEFINE_integer("max_batch_bytes", 256 * 1024 * 1024,
+                            "Maximum size of the tensors written at once")
+tf.app.flags.DEFINE_integer("num_threads", 4,
+                            "Number of threads reading the source checkpoint")
 
 FLAGS = tf.app.flags.FLAGS
 
 
-def _build_migrated_variables(checkpoint_reader, name_value_fn):
-  """Builds the TensorFlow variables of the migrated checkpoint.
+_Tensor = collections.namedtuple(
+    "_Tensor", ("name", "new_name", "shape", "dtype", "new_dtype",
+                "num_partitions"))
+
+
+def remove_colon_zero(name):
+  return name[:-2] if name.endswith(":0") else name
+
+
+def _first_match(rules, name, default):
+  """Returns the value of the first (pattern, value) rule matching `name`."""
+  for pattern, value in rules:
+    if re.search(pattern, name):
+      return value
+  return default
+
+
+def _plan_migration(checkpoint_reader, name_fn, cast_rules, partition_rules):
+  """Returns the `_Tensor`s to migrate, without reading their values.
 
   Args:
-    checkpoint_reader: A `tf.train.NewCheckPointReader` of the checkpoint to
+    checkpoint_reader: A `tf.train.NewCheckpointReader` of the checkpoint to
       be read from.
-    name_value_fn: Function taking two arguments, `name` and `value`, which
-      returns the pair of new name and value for that a variable of that name.
+    name_fn: Function mapping the name of a tensor to its new name, or to
+      `None` if it should be dropped.
+    cast_rules: List of (pattern, `tf.DType`) pairs.
+    partition_rules: List of (pattern, number of partitions) pairs.
 
   Returns:
-    Tuple of a dictionary with new variable names as keys and `tf.Variable`s as
-    values, and a dictionary that maps the old variable names to the new
-    variable names.
-  """
+    List of `_Tensor`s, sorted by name.
 
+  Raises:
+    ValueError: If two tensors are given the same new name.
+  """
   names_to_shapes = checkpoint_reader.get_variable_to_shape_map()
+  names_to_dtypes = checkpoint_reader.get_variable_to_dtype_map()
 
-  new_name_to_variable = {}
-  name_to_new_name = {}
-
-  for name in names_to_shapes:
-    value = checkpoint_reader.get_tensor(name)
-    new_name, new_value = name_value_fn(name, value)
-    if new_name is None:
+  tensors = []
+  new_names_to_names = {}
+  for name in sorted(names_to_shapes):
+    new_name = name_fn(name)
+    if not new_name:
       continue
+    if new_name in new_names_to_names:
+      raise ValueError("Tensors '{}' and '{}' are both renamed to '{}'.".format(
+          new_names_to_names[new_name], name, new_name))
+    new_names_to_names[new_name] = name
+    dtype = tf.as_dtype(names_to_dtypes[name])
+    tensors.append(_Tensor(
+        name=name,
+        new_name=new_name,
+        shape=names_to_shapes[name],
+        dtype=dtype,
+        new_dtype=tf.as_dtype(_first_match(cast_rules, new_name, dtype)),
+        num_partitions=_first_match(partition_rules, new_name, 1)))
+  return tensors
 
-    name_to_new_name[name] = new_name
-    new_name_to_variable[new_name] = tf.Variable(new_value)
 
-  return new_name_to_variable, name_to_new_name
+def _num_bytes(tensor):
+  element_size = max(tensor.dtype.size, tensor.new_dtype.size, 1)
+  return int(np.prod(tensor.shape, dtype=np.int64)) * element_size
 
 
-def remove_colon_zero(name):
-  return name[:-2] if name.endswith(":0") else name
+def _batch_tensors(tensors, max_batch_bytes):
+  """Splits `tensors` in lists of at most `max_batch_bytes` bytes."""
+  batches = []
+  batch = []
+  batch_bytes = 0
+  for tensor in tensors:
+    num_bytes = _num_bytes(tensor)
+    if batch and batch_bytes + num_bytes > max_batch_bytes:
+      batches.append(batch)
+      batch = []
+      batch_bytes = 0
+    batch.append(tensor)
+    batch_bytes += num_bytes
+  if batch:
+    batches.append(batch)
+  return batches
 
 
-def main(unused_args):
-  with tf.Graph().as_default():
-    reader = tf.train.NewCheckpointReader(FLAGS.source)
-    name_value_fn = lambda name, value: (remove_colon_zero(name), value)
-    variables, name_to_new_name = _build_migrated_variables(
-        reader, name_value_fn=name_value_fn)
+def _slices(tensor):
+  """Returns the (slice spec, slice index) pairs of the partitions of `tensor`.
+
+  The slices split the first dimension as evenly as possible, the first ones
+  being larger, like `tf.fixed_size_partitioner`.
+
+  Args:
+    tensor: A `_Tensor`.
+  """
+  if tensor.num_partitions == 1 or not tensor.shape:
+    return [("", None)]
+  num_partitions = min(tensor.num_partitions, tensor.shape[0])
+  sizes = [len(s) for s in np.array_split(np.arange(tensor.shape[0]),
+                                          num_partitions)]
+  slices = []
+  offset = 0
+  for size in sizes:
+    var_offset = [offset] + [0] * (len(tensor.shape) - 1)
+    var_shape = [size] + list(tensor.shape[1:])
+    spec = tf.Variable.SaveSliceInfo(
+        full_name=tensor.new_name,
+        full_shape=tensor.shape,
+        var_offset=var_offset,
+        var_shape=var_shape).spec
+    slices.append((spec, slice(offset, offset + size)))
+    offset += size
+  return slices
+
+
+class _ShardWriter(object):
+  """Writes batches of tensors as the shards of a checkpoint."""
+
+  def __init__(self, tensors):
+    self._shard_prefix = tf.placeholder(tf.string, [])
+    self._placeholders = []
+    names = []
+    specs = []
+    for tensor in tensors:
+      for spec, _ in _slices(tensor):
+        names.append(tensor.new_name)
+        specs.append(spec)
+        self._placeholders.append(tf.placeholder(tensor.new_dtype))
+    self._save = io_ops.save_v2(self._shard_prefix, names, specs,
+                                self._placeholders)
+    self._tensors = tensors
+
+  def write(self, session, shard_prefix, values):
+    """Writes the `values` of the tensors of this writer to a shard."""
+    feed_dict = {self._shard_prefix: shard_prefix}
+    placeholders = iter(self._placeholders)
+    for tensor, value in zip(self._tensors, values):
+      value = np.asarray(value).astype(tensor.new_dtype.as_numpy_dtype)
+      for _, index in _slices(tensor):
+        feed_dict[next(placeholders)] = value if index is None else value[index]
+    session.run(self._save, feed_dict=feed_dict)
+
 
-    if not FLAGS.dry_run:
-      init = tf.global_variables_initializer()
-      saver = tf.train.Saver(variables)
+def migrate_checkpoint(source, target, name_fn=remove_colon_zero,
+                       cast_rules=(), partition_rules=(),
+                       max_batch_bytes=256 * 1024 * 1024, num_threads=1,
+                       dry_run=False):
+  """Migrates the tensors of a checkpoint, streaming them in bounded batches.
 
-      with tf.Session() as sess:
-        sess.run(init)
-        saver.save(sess, FLAGS.target)
+  Args:
+    source: Prefix of the checkpoint to read from.
+    target: Prefix of the checkpoint to write.
+    name_fn: Function mapping the name of a tensor to its new name, or to
+      `None` if it should be dropped.
+    cast_rules: List of (pattern, dtype) pairs. Tensors whose new name matches
+      a pattern are cast to the dtype of the first such pair.
+    partition_rules: List of (pattern, number of partitions) pairs. Tensors
+      whose new name matches a pattern are saved as slices along their first
+      dimension, which can be restored into partitioned variables.
+    max_batch_bytes: Maximum number of bytes of the tensors read and written
+      at once. Larger tensors are written on their own.
+    num_threads: Number of threads reading the tensors of a batch.
+    dry_run: If true, only returns the new names of the tensors.
+
+  Returns:
+    A dictionary mapping the names of the migrated tensors to their new names.
+
+  Raises:
+    ValueError: If two tensors are given the same new name. This is checked
+      before anything is written.
+  """
+  reader = tf.train.NewCheckpointReader(source)
+  tensors = _plan_migration(reader, name_fn, cast_rules, partition_rules)
+  name_to_new_name = {tensor.name: tensor.new_name for tensor in tensors}
+  if dry_run:
+    return name_to_new_name
 
+  readers = threading.local()
+  def read(tensor):
+    if not hasattr(readers, "reader"):
+      readers.reader = tf.train.NewCheckpointReader(source)
+    return readers.reader.get_tensor(tensor.name)
+
+  batches = _batch_tensors(tensors, max_batch_bytes)
+  shard_prefixes = [
+      "{}_temp_migrate/part-{:05d}-of-{:05d}".format(target, i, len(batches))
+      for i in range(len(batches))]
+  thread_pool = pool.ThreadPool(num_threads) if num_threads > 1 else None
+  try:
+    for batch, shard_prefix in zip(batches, shard_prefixes):
+      # A separate graph per batch keeps the size of the graph bounded.
+      with tf.Graph().as_default():
+        writer = _ShardWriter(batch)
+        with tf.Session() as session:
+          if thread_pool is None:
+            values = [read(tensor) for tensor in batch]
+          else:
+            values = thread_pool.map(read, batch)
+          writer.write(session, shard_prefix, values)
+          del values
+
+    with tf.Graph().as_default():
+      merge = gen_io_ops.merge_v2_checkpoints(
+          shard_prefixes, target, delete_old_dirs=True)
+      with tf.Session() as session:
+        session.run(merge)
+  finally:
+    if thread_pool is not None:
+      thread_pool.close()
+
+  tf.train.update_checkpoint_state(os.path.dirname(os.path.abspath(target)),
+                                   target)
   return name_to_new_name
 
 
+def _parse_rules(rules, value_fn):
+  """Parses PATTERN=VALUE flags into (pattern, value) pairs."""
+  parsed_rules = []
+  for rule in rules:
+    pattern, value = rule.rsplit("=", 1)
+    parsed_rules.append((pattern, value_fn(value)))
+  return parsed_rules
+
+
+def main(unused_args):
+  rename_rules = _parse_rules(FLAGS.rename, str)
+
+  def name_fn(name):
+    if FLAGS.remove_colon_zero:
+      name = remove_colon_zero(name)
+    for pattern, replacement in rename_rules:
+      name = re.sub(pattern, replacement, name)
+    return name
+
+  return migrate_checkpoint(
+      FLAGS.source,
+      FLAGS.target,
+      name_fn=name_fn,
+      cast_rules=_parse_rules(FLAGS.cast, tf.as_dtype),
+      partition_rules=_parse_rules(FLAGS.partition, int),
+      max_batch_bytes=FLAGS.max_batch_bytes,
+      num_threads=FLAGS.num_threads,
+      dry_run=FLAGS.dry_run)
+
+
 if __name__ == "__main__":
   tf.app.run()
@@ -0,0 +1,115 @@
+# Copyright 2019 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.util.migrate_checkpoint."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import re
+
+# Dependency imports
+import numpy as np
+from sonnet.util import migrate_checkpoint
+import tensorflow as tf
+
+
+class MigrateCheckpointTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(MigrateCheckpointTest, self).setUp()
+    self._source = os.path.join(self.get_temp_dir(), "source", "model.ckpt")
+    self._target = os.path.join(self.get_temp_dir(), "target", "model.ckpt")
+    self._w = np.arange(18, dtype=np.float32).reshape([6, 3])
+    self._b = np.array([1., 2., 3.], dtype=np.float32)
+    self._step = np.array(42, dtype=np.int64)
+
+    with tf.Graph().as_default():
+      variables = [
+          tf.get_variable("old/w", initializer=self._w),
+          tf.get_variable("old/b", initializer=self._b),
+          tf.get_variable("old/step", initializer=self._step),
+          tf.get_variable("dropped", initializer=np.zeros([100], np.float32)),
+      ]
+      saver = tf.train.Saver(variables)
+      with tf.Session() as session:
+        session.run(tf.global_variables_initializer())
+        saver.save(session, self._source)
+
+  def _name_fn(self, name):
+    if name.startswith("dropped"):
+      return None
+    return re.sub("^old/", "new/", name)
+
+  def testMigrateCheckpoint(self):
+    cast_rules = [("new/w", tf.float64)]
+    partition_rules = [("new/w", 2)]
+    # Each tensor is written in its own batch.
+    max_batch_bytes = 16
+    # pylint: disable=protected-access
+    tensors = migrate_checkpoint._plan_migration(
+        tf.train.NewCheckpointReader(self._source), self._name_fn,
+        cast_rules, partition_rules)
+    self.assertLen(
+        migrate_checkpoint._batch_tensors(tensors, max_batch_bytes), 3)
+    # pylint: enable=protected-access
+
+    name_to_new_name = migrate_checkpoint.migrate_checkpoint(
+        self._source, self._target, name_fn=self._name_fn,
+        cast_rules=cast_rules, partition_rules=partition_rules,
+        max_batch_bytes=max_batch_bytes, num_threads=2)
+    self.assertEqual(name_to_new_name, {"old/w": "new/w",
+                                        "old/b": "new/b",
+                                        "old/step": "new/step"})
+    self.assertEqual(
+        tf.train.latest_checkpoint(os.path.dirname(self._target)),
+        self._target)
+
+    with tf.Graph().as_default():
+      w = tf.get_variable("new/w", shape=[6, 3], dtype=tf.float64,
+                          partitioner=tf.fixed_size_partitioner(2))
+      b = tf.get_variable("new/b", shape=[3])
+      step = tf.get_variable("new/step", shape=[], dtype=tf.int64)
+      saver = tf.train.Saver([w, b, step])
+      with tf.Session() as session:
+        saver.restore(session, self._target)
+        w_value, b_value, step_value = session.run([w.as_tensor(), b, step])
+
+    self.assertEqual(w_value.dtype, np.float64)
+    self.assertAllClose(w_value, self._w)
+    self.assertAllClose(b_value, self._b)
+    self.assertEqual(step_value, self._step)
+
+  def testDryRun(self):
+    name_to_new_name = migrate_checkpoint.migrate_checkpoint(
+        self._source, self._target, name_fn=self._name_fn, dry_run=True)
+    self.assertEqual(sorted(name_to_new_name.values()),
+                     ["new/b", "new/step", "new/w"])
+    self.assertFalse(tf.gfile.Exists(os.path.dirname(self._target)))
+
+  def testDuplicateNewNames(self):
+    with self.assertRaisesRegexp(
+        ValueError, "'old/b' and 'old/step' are both renamed to 'new'"):
+      migrate_checkpoint.migrate_checkpoint(
+          self._source, self._target,
+          name_fn=lambda name: "new" if name.startswith("old/") else None)
+    # Nothing was written.
+    self.assertFalse(tf.gfile.Exists(os.path.dirname(self._target)))
+
+
+if __name__ == "__main__":
+  tf.test.main()